@@ -0,0 +1,76 @@
+#benchmarks/bench_import.py
+"""
+Import-time benchmark for `import chatlab`.
+
+Runs `import chatlab` in fresh interpreters, reports the fastest time, and
+fails if it exceeds a budget or if a heavy dependency was loaded eagerly.
+
+Usage:
+------
+python benchmarks/bench_import.py
+python benchmarks/bench_import.py --repeat 20 --max-seconds 0.05
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+# Dependencies that must only be loaded on first use of a chatlab function
+HEAVY_MODULES = ['pandas', 'numpy', 'pyarrow', 'markdown', 'IPython']
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import chatlab
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed,
+                  'loaded': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure_import_time(repeat: int = 10) -> dict:
+    """
+    Time `import chatlab` in `repeat` fresh interpreters.
+
+    Returns:
+    --------
+    dict
+        'best' and 'median' import time in seconds, plus 'loaded', the heavy
+        modules found in sys.modules right after the import.
+    """
+    timings = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE], check=True,
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings.append(result['seconds'])
+        loaded.update(result['loaded'])
+
+    timings.sort()
+    return {'best': timings[0], 'median': timings[len(timings) // 2], 'loaded': sorted(loaded)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=10, help='number of fresh interpreters to time')
+    parser.add_argument('--max-seconds', type=float, default=0.05,
+                        help='fail if the best import time exceeds this budget')
+    args = parser.parse_args(argv)
+
+    result = measure_import_time(args.repeat)
+    print(f"import chatlab: best {result['best'] * 1000:.1f} ms, "
+          f"median {result['median'] * 1000:.1f} ms over {args.repeat} runs")
+
+    failed = False
+    if result['loaded']:
+        print(f"FAIL: heavy modules loaded at import time: {', '.join(result['loaded'])}")
+        failed = True
+    if result['best'] > args.max_seconds:
+        print(f"FAIL: import time exceeds budget of {args.max_seconds * 1000:.1f} ms")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
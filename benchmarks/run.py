@@ -0,0 +1,165 @@
+#benchmarks/run.py
+"""
+Run the chatlab benchmark suite over synthetic corpora of increasing size.
+
+Every benchmark in suite.py is timed (best of --repeat runs) and profiled for
+peak Python memory with tracemalloc (one separate run, since tracing slows
+execution down). Results can be saved as JSON and compared against a saved
+baseline to catch regressions between releases.
+
+Usage:
+------
+python benchmarks/run.py                                   # 1k, 10k, 100k turns
+python benchmarks/run.py --scales 1k,1m,10m --only filter_subset,unpack_turns
+python benchmarks/run.py --save baseline.json              # record a baseline
+python benchmarks/run.py --compare baseline.json           # exit 1 on regression
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import chatlab  # noqa: E402
+from bench_import import measure_import_time  # noqa: E402
+from suite import BENCHMARKS, Corpus  # noqa: E402
+
+_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_scale(text: str) -> int:
+    """Parse '1k', '10M' or '5000' into a number of turns."""
+    text = text.strip().lower()
+    if text and text[-1] in _SUFFIXES:
+        return int(float(text[:-1]) * _SUFFIXES[text[-1]])
+    return int(text)
+
+
+def format_scale(n: int) -> str:
+    for suffix, factor in (('m', 1_000_000), ('k', 1_000)):
+        if n >= factor and n % factor == 0:
+            return f'{n // factor}{suffix}'
+    return str(n)
+
+
+def measure(fn, repeat: int) -> dict:
+    """Best-of-repeat wall time plus tracemalloc peak of one extra run."""
+    timings = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {'seconds': min(timings), 'peak_bytes': peak}
+
+
+def run_suite(scales, names, repeat: int) -> dict:
+    results = {}
+    for n_turns in scales:
+        scale = format_scale(n_turns)
+        corpus = Corpus(n_turns)
+        try:
+            print(f"\n== {scale} turns ({len(corpus.df)} conversations) ==")
+            for name in names:
+                fn = BENCHMARKS[name](corpus)
+                result = measure(fn, repeat)
+                results.setdefault(name, {})[scale] = result
+                print(f"{name:<24} {result['seconds'] * 1000:>12.2f} ms {result['peak_bytes'] / 2**20:>10.1f} MiB")
+        finally:
+            corpus.cleanup()
+    return results
+
+
+def compare(results: dict, baseline: dict, max_ratio: float, min_seconds: float) -> bool:
+    """Print current/baseline ratios. Returns True if any benchmark regressed."""
+    regressed = False
+    print(f"\n== comparison against baseline ({baseline['meta'].get('chatlab_version')}, "
+          f"{baseline['meta'].get('date')}) ==")
+    for name, by_scale in results.items():
+        for scale, current in by_scale.items():
+            previous = baseline['results'].get(name, {}).get(scale)
+            if previous is None:
+                continue
+            time_ratio = current['seconds'] / max(previous['seconds'], 1e-9)
+            memory_ratio = current['peak_bytes'] / max(previous['peak_bytes'], 1)
+            # Ignore ratios on timings too short to measure reliably
+            slow = time_ratio > max_ratio and current['seconds'] - previous['seconds'] > min_seconds
+            heavy = memory_ratio > max_ratio and current['peak_bytes'] - previous['peak_bytes'] > 2**20
+            flag = 'REGRESSION' if slow or heavy else ''
+            regressed = regressed or bool(flag)
+            print(f"{name:<24} {scale:>5}  time x{time_ratio:5.2f}  memory x{memory_ratio:5.2f}  {flag}")
+    return regressed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', default='1k,10k,100k', help='comma-separated corpus sizes in turns')
+    parser.add_argument('--only', default=None, help='comma-separated benchmark names to run')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per benchmark (best is kept)')
+    parser.add_argument('--save', default=None, help='write results to this JSON file')
+    parser.add_argument('--compare', default=None, help='baseline JSON file to compare against')
+    parser.add_argument('--max-ratio', type=float, default=1.25,
+                        help='slowdown or memory growth factor counted as a regression')
+    parser.add_argument('--min-seconds', type=float, default=0.005,
+                        help='ignore time regressions smaller than this many seconds')
+    parser.add_argument('--list', action='store_true', help='list benchmark names and exit')
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print('\n'.join(['import_chatlab', *BENCHMARKS]))
+        return 0
+
+    names = list(BENCHMARKS) if args.only is None else [n.strip() for n in args.only.split(',')]
+    unknown = [n for n in names if n not in BENCHMARKS and n != 'import_chatlab']
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    if 'import_chatlab' in names or args.only is None:
+        import_time = measure_import_time(repeat=max(args.repeat, 5))
+        results['import_chatlab'] = {'-': {'seconds': import_time['best'], 'peak_bytes': 0}}
+        print(f"{'import_chatlab':<24} {import_time['best'] * 1000:>12.2f} ms")
+    names = [n for n in names if n != 'import_chatlab']
+
+    scales = [parse_scale(s) for s in args.scales.split(',')]
+    results.update(run_suite(scales, names, args.repeat))
+
+    output = {
+        'meta': {
+            'chatlab_version': chatlab.__version__,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'repeat': args.repeat,
+        },
+        'results': results,
+    }
+
+    if args.save:
+        Path(args.save).write_text(json.dumps(output, indent=2), encoding='utf-8')
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        if compare(results, baseline, args.max_ratio, args.min_seconds):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#benchmarks/suite.py
+"""
+Benchmark definitions for chatlab's public entry points.
+
+Each benchmark is a setup function registered with @benchmark. It receives a
+Corpus of a given size and returns a zero-argument callable, which the runner
+(benchmarks/run.py) times and profiles. Setup work (building corpora, writing
+shards) is never included in the measurement.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict
+
+import chatlab as clb
+from chatlab.colnames import colnames
+from chatlab.sample_data import make_synthetic_data
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+N_SHARDS = 4
+BATCH_SIZE = 50
+
+
+def benchmark(name: str):
+    """Register a benchmark setup function under name."""
+    def register(setup: Callable) -> Callable:
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+class Corpus:
+    """A synthetic corpus of roughly n_turns turns, with derived inputs built on first use."""
+
+    def __init__(self, n_turns: int, seed: int = 0):
+        self.n_turns = n_turns
+        self.seed = seed
+        self.workdir = Path(tempfile.mkdtemp(prefix=f'chatlab_bench_{n_turns}_'))
+        self._df = None
+        self._turns = None
+        self._shard_dir = None
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = make_synthetic_data(n_turns=self.n_turns, seed=self.seed)
+        return self._df
+
+    @property
+    def turns(self):
+        if self._turns is None:
+            self._turns = clb.unpack_turns(self.df)
+        return self._turns
+
+    @property
+    def shard_dir(self) -> Path:
+        if self._shard_dir is None:
+            self._shard_dir = self.workdir / 'shards'
+            self._shard_dir.mkdir()
+            step = -(-len(self.df) // N_SHARDS)
+            for i in range(N_SHARDS):
+                self.df.iloc[i * step:(i + 1) * step].to_parquet(self._shard_dir / f'shard_{i}.parquet')
+        return self._shard_dir
+
+    def conv_ids(self, n: int):
+        return self.df[colnames['conv']['conv_id']].iloc[:n].tolist()
+
+    def output_dir(self, name: str) -> Path:
+        path = self.workdir / name
+        path.mkdir(exist_ok=True)
+        return path
+
+    def cleanup(self) -> None:
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+@benchmark('concat_files')
+def bench_concat_files(corpus: Corpus):
+    shard_dir = corpus.shard_dir
+    return lambda: clb.concat_files(str(shard_dir), file_type='parquet')
+
+
+@benchmark('unpack_turns')
+def bench_unpack_turns(corpus: Corpus):
+    df = corpus.df
+    return lambda: clb.unpack_turns(df)
+
+
+@benchmark('filter_subset')
+def bench_filter_subset(corpus: Corpus):
+    df = corpus.df
+    return lambda: clb.filter_subset(df, return_all=True, source='wc', turns=(5, None), n_code=(1, None))
+
+
+@benchmark('search_text_matches')
+def bench_search_text_matches(corpus: Corpus):
+    turns = corpus.turns
+    return lambda: clb.search_text_matches(turns, 'python', case_sensitive=False,
+                                           return_all=True, verbose=False, role='assistant')
+
+
+@benchmark('visualize_single')
+def bench_visualize_single(corpus: Corpus):
+    df = corpus.df
+    conv_id = corpus.conv_ids(1)[0]
+    return lambda: clb.visualize_conversation(df, conv_id, display=False)
+
+
+@benchmark('visualize_batch')
+def bench_visualize_batch(corpus: Corpus):
+    df = corpus.df
+    conv_ids = corpus.conv_ids(BATCH_SIZE)
+    save_dir = corpus.output_dir('visualize_batch')
+    return lambda: clb.visualize_conversation(df, conv_ids, display=False, save=True,
+                                              save_dir=save_dir, save_mode='annotation')
+
+
+@benchmark('find_duplicates')
+def bench_find_duplicates(corpus: Corpus):
+    df = corpus.df
+    return lambda: clb.find_duplicates(df, threshold=0.8)
+
+
+@benchmark('add_user_features')
+def bench_add_user_features(corpus: Corpus):
+    df = corpus.df
+    return lambda: clb.add_user_features(df, session_gap='30min')
+
+
+@benchmark('scan_turns')
+def bench_scan_turns(corpus: Corpus):
+    turns = corpus.turns
+    rules = clb.DEFAULT_RULES + [clb.keyword_rule('insult', ['idiot', 'stupid'])]
+    return lambda: clb.scan_turns(turns, rules=rules, executor='thread')
+
+
+@benchmark('time_series')
+def bench_time_series(corpus: Corpus):
+    df = corpus.df
+    conv_cols = colnames['conv']
+    return lambda: clb.time_series(df, freq='D', by=[conv_cols['model'], conv_cols['source'], conv_cols['language']],
+                                   sums=[conv_cols['turns'], conv_cols['n_words']])
+
+
+@benchmark('facet_counts')
+def bench_facet_counts(corpus: Corpus):
+    df = corpus.df
+    return lambda: clb.facet_counts(df, source='wc', turns=(5, None))
+
+
+@benchmark('search_text_matches_arrow')
+def bench_search_text_matches_arrow(corpus: Corpus):
+    turns = corpus.turns
+    return lambda: clb.search_text_matches(turns, 'python', case_sensitive=False, return_all=True,
+                                           verbose=False, backend='arrow', role='assistant')
@@ -1,27 +1,94 @@
 #chatlab/__init__.py
 """ChatDataLab - blablabla"""
 
+import importlib as _importlib
+import sys as _sys
+import types as _types
+
 __version__ = "0.1.4"
 
-from .concat_files import concat_files, hello
+# Public name -> (submodule, attribute). Submodules are imported on first
+# attribute access, so `import chatlab` does not load pandas, pyarrow,
+# markdown or IPython until a function that needs them is used.
+_LAZY_ATTRIBUTES = {
+    'concat_files': ('concat_files', 'concat_files'),
+    'hello': ('concat_files', 'hello'),
+    'unpack_turns': ('unpack_turns', 'unpack_turns'),
+    'add_turn_features': ('turn_features', 'add_turn_features'),
+    'summarize_turn_features': ('turn_features', 'summarize_turn_features'),
+    'filter_subset': ('filter_subset', 'filter_subset'),
+    'search_text_matches': ('text_search', 'search_text_matches'),
+    'ConversationStore': ('store', 'ConversationStore'),
+    'open_store': ('store', 'open_store'),
+    'write_store': ('store', 'write_store'),
+    'ConversationLookup': ('lookup', 'ConversationLookup'),
+    'visualize_conversation': ('visualization', 'visualize_conversation'),
+    'export_browser': ('visualization.browser', 'export_browser'),
+    'export_conversations': ('visualization.export', 'export_conversations'),
+    'serve': ('server', 'serve'),
+    'ConversationServer': ('server', 'ConversationServer'),
+    'sample_data': ('sample_data', 'load_sample_data'),
+    'make_synthetic_data': ('sample_data', 'make_synthetic_data'),
+    'profile': ('profiling', 'profile'),
+    'ProfileStats': ('profiling', 'ProfileStats'),
+    'configure_logging': ('log_utils', 'configure_logging'),
+    'normalize_conversations': ('decoding', 'normalize_conversations'),
+    'set_decoder': ('decoding', 'set_decoder'),
+    'normalize_timestamps': ('timestamps', 'normalize_timestamps'),
+    'find_duplicates': ('dedup', 'find_duplicates'),
+    'deduplicate': ('dedup', 'deduplicate'),
+    'hash_conversations': ('dedup', 'hash_conversations'),
+    'ingest_files': ('ingest', 'ingest_files'),
+    'watch_files': ('ingest', 'watch_files'),
+    'compact': ('compact', 'compact'),
+    'add_user_features': ('users', 'add_user_features'),
+    'update_user_features': ('users', 'update_user_features'),
+    'summarize_users': ('users', 'summarize_users'),
+    'user_sessions': ('users', 'user_sessions'),
+    'scan_turns': ('markers', 'scan_turns'),
+    'scan_conversations': ('markers', 'scan_conversations'),
+    'summarize_markers': ('markers', 'summarize_markers'),
+    'keyword_rule': ('markers', 'keyword_rule'),
+    'Rule': ('markers', 'Rule'),
+    'DEFAULT_RULES': ('markers', 'DEFAULT_RULES'),
+    'time_series': ('timeseries', 'time_series'),
+    'FacetIndex': ('facets', 'FacetIndex'),
+    'facet_counts': ('facets', 'facet_counts'),
+    'enable_query_cache': ('query_cache', 'enable_query_cache'),
+    'disable_query_cache': ('query_cache', 'disable_query_cache'),
+    'clear_query_cache': ('query_cache', 'clear_query_cache'),
+    'query_cache_info': ('query_cache', 'query_cache_info'),
+    'bump_version': ('query_cache', 'bump_version'),
+    'set_engine': ('engines', 'set_engine'),
+    'get_engine': ('engines', 'get_engine'),
+}
+
+__all__ = sorted(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    try:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    value = getattr(_importlib.import_module(f'.{module_name}', __name__), attribute)
+    globals()[name] = value  # Cache so later lookups skip __getattr__
+    return value
 
-try:
-    from .unpack_turns import unpack_turns
-except Exception as e:
-    print(f"Error importing unpack_turns: {e}")
 
-try:
-    from .filter_subset import filter_subset
-except Exception as e:
-    print(f"Error importing filter_subset: {e}")
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
 
-try:
-    from .text_search import search_text_matches
-except Exception as e:
-    print(f"Error importing text_search: {e}")
 
+class _LazyModule(_types.ModuleType):
+    def __setattr__(self, name, value):
+        # Importing a submodule binds it on the package. Several submodules share
+        # their name with the function they export (e.g. chatlab.concat_files),
+        # so keep resolving those names to the function instead of the module.
+        if isinstance(value, _types.ModuleType) and name in _LAZY_ATTRIBUTES:
+            return
+        super().__setattr__(name, value)
 
-from .visualization import visualize_conversation
 
-# Alternative approach for main chatlab/__init__.py
-from .sample_data import load_sample_data as sample_data
\ No newline at end of file
+_sys.modules[__name__].__class__ = _LazyModule
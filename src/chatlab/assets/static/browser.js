@@ -0,0 +1,192 @@
+// Multi-conversation browser written by chatlab's export_browser().
+//
+// The page ships only the index of conversations. Rendered conversations live
+// in data chunks (data/chunk-NNNNN.js) that are loaded with <script> tags when
+// a conversation is opened, so the viewer also works from file:// URLs. Each
+// data file calls window.chatlabData(name, payload, compressed); compressed
+// payloads are base64-encoded gzip JSON, decoded with DecompressionStream.
+(function () {
+    const config = JSON.parse(document.getElementById('browser-config').textContent);
+    const ROW_HEIGHT = 30;
+    const OVERSCAN = 10;
+    const MAX_CACHED_CHUNKS = 8;
+
+    const list = document.getElementById('browser-list');
+    const spacer = document.getElementById('browser-list-spacer');
+    const items = document.getElementById('browser-list-items');
+    const search = document.getElementById('browser-search');
+    const counter = document.getElementById('browser-count');
+    const main = document.getElementById('browser-main');
+
+    // --- Data loading ---
+    const pending = {};
+    const cache = new Map();  // file name -> Promise of decoded payload, in load order
+
+    window.chatlabData = function (name, payload, compressed) {
+        const resolve = pending[name];
+        delete pending[name];
+        if (resolve) {
+            resolve(compressed ? decode(payload) : payload);
+        }
+    };
+
+    async function decode(payload) {
+        const bytes = Uint8Array.from(atob(payload), c => c.charCodeAt(0));
+        const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+        return JSON.parse(await new Response(stream).text());
+    }
+
+    function load(name) {
+        if (cache.has(name)) {
+            return cache.get(name);
+        }
+        const promise = new Promise((resolve, reject) => {
+            pending[name] = resolve;
+            const script = document.createElement('script');
+            script.src = `${config.dataDir}/${name}.js`;
+            script.onload = () => script.remove();
+            script.onerror = () => {
+                delete pending[name];
+                cache.delete(name);
+                reject(new Error(`Could not load ${script.src}`));
+            };
+            document.head.appendChild(script);
+        });
+        cache.set(name, promise);
+        // Keep memory bounded: forget the oldest chunks
+        while (cache.size > MAX_CACHED_CHUNKS) {
+            cache.delete(cache.keys().next().value);
+        }
+        return promise;
+    }
+
+    function chunkName(chunk) {
+        return `chunk-${String(chunk).padStart(5, '0')}`;
+    }
+
+    // --- Index list with virtual scrolling ---
+    let index = null;
+    let filtered = [];
+    let selected = -1;
+    let scheduled = false;
+
+    function escapeHtml(value) {
+        return String(value).replace(/[&<>"']/g, c => ({
+            '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+        }[c]));
+    }
+
+    function itemHtml(row, position) {
+        const details = index.columns
+            .map((column, i) => [column, row[i]])
+            .filter(([column, value]) => column !== 'conv_id' && column !== 'chunk' && value !== null && value !== '')
+            .map(([column, value]) => `${column}: ${value}`)
+            .join(', ');
+        const cls = position === selected ? 'browser-item selected' : 'browser-item';
+        return `<div class="${cls}" data-position="${position}" title="${escapeHtml(details)}">` +
+            `${escapeHtml(row[index.convIdColumn])}<span class="browser-item-details">${escapeHtml(details)}</span></div>`;
+    }
+
+    function renderList() {
+        scheduled = false;
+        const first = Math.max(0, Math.floor(list.scrollTop / ROW_HEIGHT) - OVERSCAN);
+        const last = Math.min(filtered.length, Math.ceil((list.scrollTop + list.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+        let html = '';
+        for (let position = first; position < last; position++) {
+            html += itemHtml(index.rows[filtered[position]], position);
+        }
+        items.style.transform = `translateY(${first * ROW_HEIGHT}px)`;
+        items.innerHTML = html;
+    }
+
+    function scheduleRender() {
+        if (!scheduled) {
+            scheduled = true;
+            requestAnimationFrame(renderList);
+        }
+    }
+
+    function applyFilter() {
+        const query = search.value.trim().toLowerCase();
+        filtered = [];
+        for (let i = 0; i < index.rows.length; i++) {
+            if (!query || index.rows[i].some((value, c) => c !== index.chunkColumn && value !== null &&
+                    String(value).toLowerCase().includes(query))) {
+                filtered.push(i);
+            }
+        }
+        selected = -1;
+        spacer.style.height = `${filtered.length * ROW_HEIGHT}px`;
+        counter.textContent = `${filtered.length} of ${index.rows.length} conversations`;
+        list.scrollTop = 0;
+        scheduleRender();
+    }
+
+    // --- Conversation pane ---
+    async function show(position) {
+        if (position < 0 || position >= filtered.length) return;
+        selected = position;
+        const row = index.rows[filtered[position]];
+        const convId = row[index.convIdColumn];
+
+        // Keep the selection in view
+        const top = position * ROW_HEIGHT;
+        if (top < list.scrollTop || top + ROW_HEIGHT > list.scrollTop + list.clientHeight) {
+            list.scrollTop = top - list.clientHeight / 2;
+        }
+        scheduleRender();
+
+        main.innerHTML = '<div class="browser-placeholder">Loading…</div>';
+        try {
+            const chunk = await load(chunkName(row[index.chunkColumn]));
+            if (selected !== position) return;  // Another conversation was selected meanwhile
+            const record = chunk[convId];
+            main.innerHTML =
+                '<div class="conversation-block"><div class="grid-col-message"><div class="metadata-wrapper">' +
+                record.metadata + '</div></div></div>' +
+                '<div class="conversation-block">' + record.rows + '</div>';
+            main.scrollTop = 0;
+            history.replaceState(null, '', `#${encodeURIComponent(convId)}`);
+        } catch (e) {
+            main.innerHTML = `<div class="browser-placeholder">${escapeHtml(e.message)}</div>`;
+        }
+    }
+
+    items.addEventListener('click', event => {
+        const item = event.target.closest('.browser-item');
+        if (item) show(Number(item.dataset.position));
+    });
+    list.addEventListener('scroll', scheduleRender);
+    window.addEventListener('resize', scheduleRender);
+
+    let filterTimer = null;
+    search.addEventListener('input', () => {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(applyFilter, 150);
+    });
+
+    document.addEventListener('keydown', event => {
+        if (event.target === search && event.key !== 'ArrowDown' && event.key !== 'ArrowUp') return;
+        if (event.key === 'ArrowDown' || event.key === 'j') {
+            show(Math.min(selected + 1, filtered.length - 1));
+            event.preventDefault();
+        } else if (event.key === 'ArrowUp' || event.key === 'k') {
+            show(Math.max(selected - 1, 0));
+            event.preventDefault();
+        }
+    });
+
+    load('index').then(data => {
+        cache.delete('index');
+        index = data;
+        index.convIdColumn = index.columns.indexOf('conv_id');
+        index.chunkColumn = index.columns.indexOf('chunk');
+        applyFilter();
+        // Open the conversation named in the URL, or the first one
+        const wanted = decodeURIComponent(location.hash.slice(1));
+        const position = wanted ? filtered.findIndex(i => index.rows[i][index.convIdColumn] === wanted) : 0;
+        show(Math.max(position, 0));
+    }).catch(e => {
+        main.innerHTML = `<div class="browser-placeholder">${escapeHtml(e.message)}</div>`;
+    });
+})();
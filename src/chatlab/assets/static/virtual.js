@@ -0,0 +1,193 @@
+// Virtualized annotation view for very long conversations.
+//
+// The page embeds each turn's rendered message once (JSON in #virtual-turns)
+// and only the rows near the viewport exist in the DOM. Annotations live in a
+// plain object keyed by turn index and are saved to localStorage; annotation
+// cells are rebuilt from it whenever a row is materialized again.
+(function () {
+    const container = document.getElementById('virtual-chat');
+    if (!container) return;
+
+    const data = JSON.parse(document.getElementById('virtual-turns').textContent);
+    const rows = data.rows;
+    const storageKey = `chatlab-annotations:${data.id}`;
+    const OVERSCAN_PX = 1000;
+    const DEFAULT_ROW_HEIGHT = 150;
+
+    // --- Annotation model ---
+    let annotations = {};
+    try {
+        annotations = JSON.parse(localStorage.getItem(storageKey) || '{}');
+    } catch (e) {
+        console.warn('Could not load saved annotations:', e);
+    }
+
+    let saveTimer = null;
+    function saveAnnotations() {
+        clearTimeout(saveTimer);
+        saveTimer = setTimeout(() => {
+            try {
+                localStorage.setItem(storageKey, JSON.stringify(annotations));
+            } catch (e) {
+                console.warn('Could not save annotations:', e);
+            }
+        }, 300);
+    }
+
+    // Read-only access for scripts or the console, e.g. to export annotations
+    window.chatlabAnnotations = () => Object.assign({}, annotations);
+
+    // --- Row heights: measured once rendered, estimated before ---
+    const heights = new Float64Array(rows.length);
+    let measuredSum = 0;
+    let measuredCount = 0;
+
+    function height(i) {
+        return heights[i] || (measuredCount ? measuredSum / measuredCount : DEFAULT_ROW_HEIGHT);
+    }
+
+    // --- Row materialization ---
+    const topSpacer = document.createElement('div');
+    const bottomSpacer = document.createElement('div');
+    topSpacer.className = bottomSpacer.className = 'virtual-spacer';
+    container.appendChild(topSpacer);
+    container.appendChild(bottomSpacer);
+
+    const rendered = new Map();  // turn index -> [message cell, resizer cell, annotation cell]
+    const template = document.createElement('template');
+
+    function annotationHtml(i) {
+        let html = '<div class="annotation-container' + (i in annotations ? ' editing' : '') + '">' +
+            '<button class="add-annotation-btn" title="Add annotation">+</button>';
+        if (i in annotations) {
+            html += `<div class="annotation-textbox" contenteditable="true">${annotations[i]}</div>` +
+                '<button class="delete-annotation-btn" title="Delete annotation">&times;</button>';
+        }
+        return html + '</div>';
+    }
+
+    function createRow(i) {
+        template.innerHTML = rows[i] + '<div class="grid-col-resizer"></div>' +
+            `<div class="grid-col-annotation" data-turn="${i}">${annotationHtml(i)}</div>`;
+        const cells = Array.from(template.content.children);
+        cells[0].dataset.turn = i;
+        return cells;
+    }
+
+    let scheduled = false;
+    function scheduleRender() {
+        if (!scheduled) {
+            scheduled = true;
+            requestAnimationFrame(render);
+        }
+    }
+
+    function render() {
+        scheduled = false;
+        const containerTop = container.getBoundingClientRect().top;
+        const viewTop = -containerTop - OVERSCAN_PX;
+        const viewBottom = -containerTop + window.innerHeight + OVERSCAN_PX;
+
+        let offset = 0;
+        let i = 0;
+        while (i < rows.length && offset + height(i) < viewTop) {
+            offset += height(i++);
+        }
+        const first = i;
+        const topHeight = offset;
+        while (i < rows.length && offset < viewBottom) {
+            offset += height(i++);
+        }
+        const last = i;
+
+        // Remove rows that left the window, keeping the ones still in it (and any focused editor)
+        for (const [turn, cells] of rendered) {
+            if (turn < first || turn >= last) {
+                cells.forEach(cell => cell.remove());
+                rendered.delete(turn);
+            }
+        }
+        // Insert new rows in order, before the next row already present
+        let next = bottomSpacer;
+        for (let turn = last - 1; turn >= first; turn--) {
+            if (rendered.has(turn)) {
+                next = rendered.get(turn)[0];
+                continue;
+            }
+            const cells = createRow(turn);
+            cells.forEach(cell => container.insertBefore(cell, next));
+            rendered.set(turn, cells);
+            next = cells[0];
+        }
+
+        measure(first);
+        let bottomHeight = 0;
+        for (let turn = last; turn < rows.length; turn++) {
+            bottomHeight += height(turn);
+        }
+        topSpacer.style.height = `${topHeight}px`;
+        bottomSpacer.style.height = `${bottomHeight}px`;
+    }
+
+    function measure(first) {
+        let scrollCorrection = 0;
+        const viewportTop = -container.getBoundingClientRect().top;
+        let offset = 0;
+        for (let turn = 0; turn < first; turn++) offset += height(turn);
+        for (const turn of Array.from(rendered.keys()).sort((a, b) => a - b)) {
+            const measured = rendered.get(turn)[0].getBoundingClientRect().height;
+            if (!measured) continue;
+            const previous = heights[turn];
+            if (previous) {
+                measuredSum += measured - previous;
+            } else {
+                measuredSum += measured;
+                measuredCount += 1;
+            }
+            // Rows above the viewport that change size would shift the visible content
+            if (offset + height(turn) <= viewportTop) {
+                scrollCorrection += measured - height(turn);
+            }
+            heights[turn] = measured;
+            offset += measured;
+        }
+        if (scrollCorrection) {
+            window.scrollBy(0, scrollCorrection);
+        }
+    }
+
+    // --- Annotation events (delegated; rows come and go) ---
+    container.addEventListener('click', event => {
+        const cell = event.target.closest('.grid-col-annotation');
+        if (!cell) return;
+        const turn = Number(cell.dataset.turn);
+        if (event.target.closest('.add-annotation-btn')) {
+            if (!(turn in annotations)) annotations[turn] = '';
+            cell.innerHTML = annotationHtml(turn);
+            cell.querySelector('.annotation-textbox').focus();
+            event.stopPropagation();
+        } else if (event.target.closest('.delete-annotation-btn')) {
+            delete annotations[turn];
+            saveAnnotations();
+            cell.innerHTML = annotationHtml(turn);
+        }
+        scheduleRender();
+    });
+
+    container.addEventListener('input', event => {
+        const textbox = event.target.closest('.annotation-textbox');
+        if (!textbox) return;
+        annotations[Number(textbox.closest('.grid-col-annotation').dataset.turn)] = textbox.innerHTML;
+        saveAnnotations();
+        scheduleRender();
+    });
+
+    window.addEventListener('scroll', scheduleRender, { passive: true });
+    window.addEventListener('resize', scheduleRender);
+    // Dragging the column resizer changes row heights
+    if (window.ResizeObserver) {
+        new ResizeObserver(scheduleRender).observe(container);
+    }
+
+    render();
+})();
@@ -0,0 +1,74 @@
+#chatlab/cli.py
+import argparse
+import sys
+from typing import List, Optional
+
+from .log_utils import configure_logging
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from .server import serve
+    serve(args.corpus, host=args.host, port=args.port, theme=args.theme, save_mode=args.mode,
+          cache_size=args.cache_size, custom_css_path=args.css, max_workers=args.workers)
+    return 0
+
+
+def _ingest(args: argparse.Namespace) -> int:
+    from .ingest import ingest_files, watch_files
+    kwargs = dict(file_type=args.type, remove_missing=args.remove_missing, min_age=args.min_age,
+                  lookup=True if args.lookup else None, seed_manifest=args.seed_manifest)
+    if args.watch:
+        watch_files(args.directory, args.store, interval=args.interval, **kwargs)
+    else:
+        ingest_files(args.directory, args.store, **kwargs)
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the `chatlab` command."""
+    parser = argparse.ArgumentParser(prog='chatlab', description='ChatDataLab command line tools')
+    parser.add_argument('--log-level', default='INFO', help='Logging level (default: INFO)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = commands.add_parser(
+        'serve', help='Serve conversations over HTTP, rendering pages on demand',
+        description='Serve a corpus over HTTP. Pages are rendered when first opened and cached.')
+    serve_parser.add_argument('corpus', help="Conversation store or lookup directory, a .parquet/.json/.jsonl/.pkl "
+                                             "file, or 'sample' for the bundled sample data")
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+    serve_parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: 8000)')
+    serve_parser.add_argument('--theme', choices=['light', 'dark'], default='light', help='Default theme')
+    serve_parser.add_argument('--mode', choices=['base_html', 'annotation'], default='base_html',
+                              help='Default page mode')
+    serve_parser.add_argument('--cache-size', type=int, default=256, help='Rendered pages kept in memory')
+    serve_parser.add_argument('--css', default=None, help='Custom CSS file')
+    serve_parser.add_argument('--workers', type=int, default=None, help='Rendering threads')
+    serve_parser.set_defaults(func=_serve)
+
+    ingest_parser = commands.add_parser(
+        'ingest', help='Add new and changed files of a directory to a store',
+        description='Update a conversation store from a directory of files. Files already ingested and '
+                    'unchanged since are skipped, using a manifest kept in the store.')
+    ingest_parser.add_argument('directory', help='Directory containing the files')
+    ingest_parser.add_argument('store', help='Conversation store directory (created if missing)')
+    ingest_parser.add_argument('--type', default='json', help='File extension to ingest (default: json)')
+    ingest_parser.add_argument('--remove-missing', action='store_true',
+                               help='Remove rows of files deleted from the directory')
+    ingest_parser.add_argument('--min-age', type=float, default=0.0,
+                               help='Skip files modified less than this many seconds ago')
+    ingest_parser.add_argument('--lookup', action='store_true',
+                               help='Rebuild the store lookup (<store>/lookup) after updates')
+    ingest_parser.add_argument('--seed-manifest', action='store_true',
+                               help='Record the current files as already ingested if the store has no manifest')
+    ingest_parser.add_argument('--watch', action='store_true', help='Keep polling the directory for changes')
+    ingest_parser.add_argument('--interval', type=float, default=60.0,
+                               help='Seconds between polls with --watch (default: 60)')
+    ingest_parser.set_defaults(func=_ingest)
+
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level.upper())
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
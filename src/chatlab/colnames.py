@@ -4,6 +4,11 @@
 colnames = {'conv': {'conv_id': 'conv_id',
                      'user_id': 'user_id',
                      'user_freq': 'user_freq',
+                     'user_first': 'user_first',
+                     'user_last': 'user_last',
+                     'user_conv_num': 'user_conv_num',
+                     'user_sessions': 'user_sessions',
+                     'session_num': 'session_num',
                      'conversation': 'conversation',
                      'source': 'source',
                      'model': 'model',
@@ -18,7 +23,11 @@ colnames = {'conv': {'conv_id': 'conv_id',
                      'n_words': 'n_words',
                      'n_words_user': 'n_words_user',
                      'n_words_gpt': 'n_words_gpt',
-                     'language': 'language'},
+                     'language': 'language',
+                     'content_hash': 'content_hash',
+                     'dup_cluster': 'dup_cluster',
+                     'dup_cluster_size': 'dup_cluster_size',
+                     'dup_representative': 'dup_representative'},
             # Assumed column names at turn level
             'turn': {'conv_id': 'conv_id',
                      'role': 'role',
@@ -26,6 +35,9 @@ colnames = {'conv': {'conv_id': 'conv_id',
                      'message': 'content',
                      'language': 'language',
                      'n_words': 'n_words',
+                     'n_chars': 'n_chars',
+                     'n_code_blocks': 'n_code_blocks',
+                     'code_languages': 'code_languages',
                      'code_block': 'code_block', # only rows where role == 'assistant'
                      'toxic': 'toxic',
                      'redacted': 'redacted',
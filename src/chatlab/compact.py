@@ -0,0 +1,167 @@
+#chatlab/compact.py
+import logging
+from typing import Optional, Dict, Any, Tuple, Union, Iterable
+
+import pandas as pd
+
+from .colnames import colnames
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+# Low-cardinality label columns, stored as categoricals
+CATEGORICAL_COLUMNS = {colnames['conv'][key] for key in ('source', 'model', 'country', 'state', 'language')} | \
+                      {colnames['turn'][key] for key in ('role', 'language')}
+# Free text and identifiers, stored as Arrow strings
+STRING_COLUMNS = {colnames['conv'][key] for key in ('conv_id', 'user_id')} | \
+                 {colnames['turn'][key] for key in ('conv_id', 'message')}
+
+STRING_DTYPE = 'string[pyarrow]'
+
+
+class CompactReport:
+    """
+    Memory use of a DataFrame before and after compact().
+
+    Attributes:
+    -----------
+    bytes_before, bytes_after : int
+        Deep memory usage of the whole DataFrame.
+    columns : dict
+        Column name -> {'from': old dtype, 'to': new dtype, 'bytes_before', 'bytes_after'}
+        for every converted column.
+    """
+
+    def __init__(self, bytes_before: int, bytes_after: int, columns: Dict[str, Dict[str, Any]]):
+        self.bytes_before = bytes_before
+        self.bytes_after = bytes_after
+        self.columns = columns
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.bytes_before - self.bytes_after
+
+    def summary(self) -> str:
+        """Human-readable table of the converted columns, largest saving first."""
+        lines = [f"{self.bytes_before / 2**20:.1f} MB -> {self.bytes_after / 2**20:.1f} MB "
+                 f"({self.bytes_saved / 2**20:.1f} MB saved)"]
+        for name, entry in sorted(self.columns.items(), key=lambda item: item[1]['bytes_after'] - item[1]['bytes_before']):
+            lines.append(f"  {name:<24} {entry['from']:>10} -> {entry['to']:<16} "
+                         f"{(entry['bytes_before'] - entry['bytes_after']) / 2**20:>8.2f} MB saved")
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return self.summary()
+
+
+def _is_text(values: pd.Series) -> bool:
+    """Object column holding only str (and missing) values."""
+    if values.dtype != object:
+        return False
+    present = values.dropna()
+    return bool(len(present)) and present.map(type).eq(str).all()
+
+
+def _compact_column(values: pd.Series, name: str, categorical_threshold: float,
+                    downcast_floats: bool) -> Optional[pd.Series]:
+    """The compacted column, or None if it should stay as it is."""
+    dtype = values.dtype
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+        return None
+    if pd.api.types.is_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        result = pd.to_numeric(values, downcast='integer')
+        return result if result.dtype != dtype else None
+    if pd.api.types.is_float_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        if not downcast_floats:
+            return None
+        result = pd.to_numeric(values, downcast='float')
+        return result if result.dtype != dtype else None
+
+    if isinstance(dtype, pd.CategoricalDtype):
+        return None
+    is_string = pd.api.types.is_string_dtype(dtype) and dtype != object
+    if not is_string and not _is_text(values):
+        # Nested turns, dicts and mixed objects are left alone
+        return None
+    if name in CATEGORICAL_COLUMNS:
+        return values.astype('category')
+    # Already Arrow-backed strings stay as they are
+    is_arrow_string = isinstance(dtype, pd.StringDtype) and dtype.storage == 'pyarrow'
+    if name in STRING_COLUMNS:
+        return None if is_arrow_string else values.astype(STRING_DTYPE)
+    # Columns outside the schema: categorical if values repeat enough
+    if len(values) and values.nunique(dropna=True) <= categorical_threshold * len(values):
+        return values.astype('category')
+    return None if is_arrow_string else values.astype(STRING_DTYPE)
+
+
+@instrumented
+def compact(df: pd.DataFrame,
+            columns: Optional[Iterable[str]] = None,
+            categorical_threshold: float = 0.5,
+            downcast_floats: bool = False,
+            inplace: bool = False,
+            return_report: bool = False) -> Union[pd.DataFrame, Tuple[pd.DataFrame, CompactReport]]:
+    """
+    Shrink a conversation- or turn-level DataFrame by converting column dtypes.
+
+    Conversions, guided by colnames:
+    - label columns (source, model, country, state, language, role) -> category
+    - IDs and message text (conv_id, user_id, content) -> string[pyarrow]
+    - other text columns -> category if at most categorical_threshold of the
+      values are distinct, else string[pyarrow]
+    - integer columns -> the smallest integer type holding their values
+    - float columns -> float32 if downcast_floats and the values fit
+
+    Nested conversations, booleans, timestamps and mixed object columns are
+    left unchanged. All chatlab functions accept the compacted dtypes.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        The DataFrame to compact.
+    columns : iterable of str, optional
+        Only consider these columns. Defaults to all columns.
+    categorical_threshold : float, default=0.5
+        Distinct-value ratio up to which a text column outside the schema
+        becomes categorical.
+    downcast_floats : bool, default=False
+        Also downcast float64 columns (loses precision beyond float32).
+    inplace : bool, default=False
+        Convert the columns of df instead of a copy.
+    return_report : bool, default=False
+        Also return a CompactReport with the bytes saved per column.
+
+    Returns:
+    --------
+    pandas.DataFrame or (pandas.DataFrame, CompactReport)
+        The compacted DataFrame, and the report if return_report=True.
+        The bytes saved are logged at INFO level either way.
+
+    Examples:
+    ---------
+    >>> df = clb.compact(df)
+    >>> df, report = clb.compact(turns_df, return_report=True)
+    >>> print(report.summary())
+    """
+    result = df if inplace else df.copy(deep=False)
+    bytes_before = int(df.memory_usage(deep=True).sum())
+    converted: Dict[str, Dict[str, Any]] = {}
+
+    for name in (df.columns if columns is None else columns):
+        if name not in result.columns:
+            continue
+        values = result[name]
+        compacted = _compact_column(values, name, categorical_threshold, downcast_floats)
+        if compacted is None:
+            continue
+        converted[name] = {'from': str(values.dtype), 'to': str(compacted.dtype),
+                           'bytes_before': int(values.memory_usage(index=False, deep=True)),
+                           'bytes_after': int(compacted.memory_usage(index=False, deep=True))}
+        result[name] = compacted
+
+    report = CompactReport(bytes_before, int(result.memory_usage(deep=True).sum()), converted)
+    count('compact.bytes_saved', report.bytes_saved)
+    logger.info("Compacted %d columns: %.1f MB -> %.1f MB (%.1f MB saved)", len(converted),
+                report.bytes_before / 2**20, report.bytes_after / 2**20, report.bytes_saved / 2**20)
+    return (result, report) if return_report else result
@@ -1,17 +1,50 @@
 import pandas as pd
 import glob
+import logging
 import os
-from typing import Optional, Dict, Any, Union, List
+from pathlib import Path
+from typing import Optional, Dict, Any, Union, List, Callable
+from .store import ConversationStore, METADATA_FILE
+from .profiling import instrumented, count
+from .log_utils import VerboseLogger
 
+logger = logging.getLogger(__name__)
+# For the messages of verbose=True calls
+verbose_logger = VerboseLogger(logger)
 
+
+def default_read_kwargs(file_type: str) -> Dict[str, Any]:
+    """Reader keyword arguments used when none are given: JSON files are read as JSON lines."""
+    if file_type.lower() == 'json':
+        return {'orient': 'records', 'lines': True}
+    return {}
+
+
+def get_reader(file_type: str) -> Callable[..., pd.DataFrame]:
+    """The pandas read function for a file extension."""
+    if file_type.lower() == 'json':
+        return pd.read_json
+    elif file_type.lower() == 'csv':
+        return pd.read_csv
+    elif file_type.lower() == 'parquet':
+        return pd.read_parquet
+    elif file_type.lower() == 'excel' or file_type.lower() in ['xls', 'xlsx']:
+        return pd.read_excel
+    # Default to csv for unknown types
+    return pd.read_csv
+
+
+@instrumented
 def concat_files(
         directory: str,
         file_type: str = 'json',
         read_kwargs: Optional[Dict[str, Any]] = None,
         concat_kwargs: Optional[Dict[str, Any]] = None,
         verbose: bool = False,
-        error_handling: str = 'warn'
-) -> pd.DataFrame:
+        error_handling: str = 'warn',
+        store: Optional[Union[str, Path, ConversationStore]] = None,
+        incremental: bool = False
+) -> Union[pd.DataFrame, ConversationStore]:
     """
     Reads all files of specified type in the given directory and concatenates them into a single DataFrame.
 
@@ -28,18 +61,30 @@ def concat_files(
         Additional keyword arguments to pass to pd.concat().
         Defaults to {'ignore_index': True}.
     verbose : bool, default=False
-        If True, prints information about the files being processed.
+        If True, logs information about the files being processed at INFO level.
+        The messages are shown on stderr even if logging is not configured
+        (see chatlab.configure_logging).
     error_handling : str, default='warn'
         How to handle errors when reading files:
         - 'warn': Skip problematic files and issue a warning
         - 'raise': Raise an exception if any file cannot be read
         - 'ignore': Silently skip problematic files
+    store : str, Path or ConversationStore, optional
+        If given, the concatenated data is appended to this store (a new store is
+        created if a path without a store is given) and the store handle is returned.
+    incremental : bool, default=False
+        With store, only read files that are new or changed since the last
+        incremental run, as recorded in the store's manifest (see ingest_files).
+        Changed files replace the rows previously read from them. A store written
+        without incremental has no manifest and is refused; adopt it once with
+        ingest_files(directory, store, seed_manifest=True).
 
     Returns:
     --------
-    pd.DataFrame
+    pd.DataFrame or ConversationStore
         A DataFrame containing the concatenated data from all files.
         Returns an empty DataFrame if no valid files are found.
+        If store is given, the ConversationStore holding the data is returned instead.
 
     Raises:
     -------
@@ -55,6 +100,12 @@ def concat_files(
     # Concatenate all JSON files in a directory
     df = concat_files('data/raw_files')
 
+    # Concatenate into an on-disk store instead of returning a DataFrame
+    store = concat_files('data/raw_files', store='data/corpus_store')
+
+    # Refresh the store, reading only files added or changed since the last refresh
+    store = concat_files('data/raw_files', store='data/corpus_store', incremental=True)
+
     # Concatenate all CSV files with specific reading options
     df = concat_files('data/logs', file_type='csv', read_kwargs={'sep': '|'})
     """
@@ -67,12 +118,21 @@ def concat_files(
     if error_handling not in valid_error_modes:
         raise ValueError(f"error_handling must be one of {valid_error_modes}")
 
+    if incremental:
+        if store is None:
+            raise ValueError("incremental=True requires a store")
+        from .ingest import ingest_files
+        result = ingest_files(directory, store, file_type=file_type, read_kwargs=read_kwargs,
+                              error_handling=error_handling)
+        if result.store is None:
+            raise FileNotFoundError(f"No .{file_type} files found in {directory}")
+        if verbose:
+            verbose_logger.info("%s", result)
+        return result.store
+
     # Set default kwargs for reading files based on file_type
     if read_kwargs is None:
-        if file_type.lower() == 'json':
-            read_kwargs = {'orient': 'records', 'lines': True}
-        else:
-            read_kwargs = {}
+        read_kwargs = default_read_kwargs(file_type)
 
     # Default concat kwargs
     if concat_kwargs is None:
@@ -85,34 +145,26 @@ def concat_files(
         raise FileNotFoundError(f"No .{file_type} files found in {directory}")
 
     if verbose:
-        print(f"Found {len(files)} .{file_type} files in {directory}")
+        verbose_logger.info("Found %d .%s files in %s", len(files), file_type, directory)
 
     # Create a list to hold dataframes
     dataframes = []
 
     # Select the appropriate reader function based on file_type
-    if file_type.lower() == 'json':
-        reader_func = pd.read_json
-    elif file_type.lower() == 'csv':
-        reader_func = pd.read_csv
-    elif file_type.lower() == 'parquet':
-        reader_func = pd.read_parquet
-    elif file_type.lower() == 'excel' or file_type.lower() in ['xls', 'xlsx']:
-        reader_func = pd.read_excel
-    else:
-        # Default to csv for unknown types
-        reader_func = pd.read_csv
+    reader_func = get_reader(file_type)
 
     # Read each file
     for file in files:
         try:
             if verbose:
-                print(f"Reading {file}...")
+                verbose_logger.info("Reading %s...", file)
 
             df = reader_func(file, **read_kwargs)
+            count('files_read')
+            count('rows_read', len(df))
 
             if verbose:
-                print(f"  Read {len(df)} rows from {file}")
+                verbose_logger.info("  Read %d rows from %s", len(df), file)
 
             dataframes.append(df)
 
@@ -127,14 +179,28 @@ def concat_files(
     # Check if we have any valid dataframes
     if not dataframes:
         if verbose:
-            print("No valid data found in any files.")
+            verbose_logger.info("No valid data found in any files.")
         return pd.DataFrame()
 
     # Concatenate all dataframes
     concatenated_df = pd.concat(dataframes, **concat_kwargs)
 
     if verbose:
-        print(f"Concatenated DataFrame has {len(concatenated_df)} rows and {len(concatenated_df.columns)} columns.")
+        verbose_logger.info("Concatenated DataFrame has %d rows and %d columns.",
+                            len(concatenated_df), len(concatenated_df.columns))
+
+    # Persist to a store if requested
+    if store is not None:
+        if isinstance(store, ConversationStore):
+            store.append(concatenated_df)
+        elif (Path(store) / METADATA_FILE).exists():
+            store = ConversationStore(store)
+            store.append(concatenated_df)
+        else:
+            store = ConversationStore.create(concatenated_df, store)
+        if verbose:
+            verbose_logger.info("Wrote %d rows to %s", len(concatenated_df), store.path)
+        return store
 
     return concatenated_df
 
@@ -0,0 +1,159 @@
+#chatlab/decoding.py
+import ast
+import functools
+import json
+import logging
+from typing import Any, Callable, Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .colnames import colnames
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+# Decoded strings kept by decode_conversation(), so re-rendering the same
+# conversation does not re-parse it
+PARSE_CACHE_SIZE = 256
+
+# Decoder name -> loads function. Fast JSON libraries are used when installed.
+_DECODERS: Dict[str, Callable[[str], Any]] = {'json': json.loads}
+
+try:
+    import orjson
+    _DECODERS['orjson'] = orjson.loads
+except ImportError:
+    pass
+
+try:
+    import simdjson
+    _DECODERS['simdjson'] = simdjson.loads
+except ImportError:
+    pass
+
+_active_name = next(name for name in ('orjson', 'simdjson', 'json') if name in _DECODERS)
+
+
+def register_decoder(name: str, loads: Callable[[str], Any], activate: bool = True) -> None:
+    """
+    Register a JSON decoder under name.
+
+    Parameters:
+    -----------
+    name : str
+        Name to select the decoder with set_decoder().
+    loads : callable
+        Function taking a JSON string and returning Python objects. It should
+        raise ValueError (as json, orjson and simdjson do) on invalid input.
+    activate : bool, default=True
+        Make it the active decoder right away.
+    """
+    _DECODERS[name] = loads
+    if activate:
+        set_decoder(name)
+
+
+def set_decoder(name: str) -> None:
+    """Select the decoder used for conversation strings ('orjson', 'simdjson', 'json', ...)."""
+    global _active_name
+    if name not in _DECODERS:
+        raise ValueError(f"Unknown decoder '{name}'. Available: {', '.join(sorted(_DECODERS))}")
+    _active_name = name
+    clear_parse_cache()
+
+
+def get_decoder() -> str:
+    """Name of the active decoder."""
+    return _active_name
+
+
+def _decode(text: Union[str, bytes]) -> Any:
+    try:
+        return _DECODERS[_active_name](text)
+    except ValueError:
+        # Not JSON; conversations saved with str() are Python literals
+        if isinstance(text, bytes):
+            text = text.decode('utf-8')
+        return ast.literal_eval(text)
+
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _decode_cached(text: Union[str, bytes]) -> Any:
+    count('decode.cache_misses')
+    return _decode(text)
+
+
+def decode_conversation(text: Union[str, bytes]) -> Any:
+    """
+    Decode a conversation stored as a JSON or Python-literal string.
+
+    JSON is tried first with the active decoder, then ast.literal_eval.
+    Results are cached, so callers must not modify the returned turns.
+    """
+    count('decode.calls')
+    return _decode_cached(text)
+
+
+def clear_parse_cache() -> None:
+    """Drop all cached decode_conversation() results."""
+    _decode_cached.cache_clear()
+
+
+@instrumented
+def normalize_conversations(df: pd.DataFrame,
+                            column: Optional[str] = None,
+                            as_arrow: bool = False,
+                            inplace: bool = False) -> pd.DataFrame:
+    """
+    Decode a string-typed conversation column once, up front.
+
+    Every string cell is parsed into a list of turn dicts, so later calls to
+    visualize_conversation(), unpack_turns() etc. never parse it again.
+    Cells that are already lists or arrays are left as they are.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Conversation-level DataFrame.
+    column : str or None
+        Column to normalize. Defaults to colnames['conv']['conversation'].
+    as_arrow : bool, default=False
+        Store the result as a pyarrow-backed list<struct> column instead of
+        Python objects. Falls back to Python objects if the turns cannot be
+        represented with one Arrow schema.
+    inplace : bool, default=False
+        Modify df instead of returning a copy.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with the decoded column.
+    """
+    column = column or colnames['conv']['conversation']
+    values = df[column]
+
+    is_text = values.map(lambda value: isinstance(value, (str, bytes))).to_numpy(dtype=bool)
+    n_text = int(is_text.sum())
+    decoded = values.to_numpy(dtype=object, copy=True)
+    # Assign cell by cell: numpy would broadcast a list of lists into the array
+    for i in np.flatnonzero(is_text):
+        decoded[i] = _decode(decoded[i])
+    count('decode.bulk_rows', n_text)
+
+    if as_arrow:
+        try:
+            cells = [value.tolist() if hasattr(value, 'tolist') else value for value in decoded]
+            result = pd.arrays.ArrowExtensionArray(pa.array(cells, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            logger.warning("Could not convert '%s' to Arrow (%s). Keeping Python objects.", column, e)
+            result = decoded
+    else:
+        result = decoded
+
+    if not inplace:
+        df = df.copy()
+    df[column] = result
+    logger.info("Decoded %d conversation strings in '%s'", n_text, column)
+    return df
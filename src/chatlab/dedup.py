@@ -0,0 +1,478 @@
+#chatlab/dedup.py
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .colnames import colnames
+from .decoding import normalize_conversations
+from .store import ConversationStore, TURNS_DIR
+from .profiling import instrumented, stage, count
+
+logger = logging.getLogger(__name__)
+
+# Shingles hashed per block when building MinHash signatures; a block costs
+# 8 * SHINGLE_BLOCK * num_perm bytes of scratch memory
+SHINGLE_BLOCK = 1 << 16
+# Candidate pairs whose signatures are compared at once during LSH verification
+PAIR_BLOCK = 1 << 16
+
+_MAX_UINT32 = np.uint32(0xFFFFFFFF)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_2 = np.uint64(0x94D049BB133111EB)
+_S30, _S27, _S31, _S32 = np.uint64(30), np.uint64(27), np.uint64(31), np.uint64(32)
+
+
+def _mix(values: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer over a uint64 array; arithmetic wraps modulo 2**64."""
+    z = values + _GOLDEN
+    z = (z ^ (z >> _S30)) * _MIX_1
+    z = (z ^ (z >> _S27)) * _MIX_2
+    return z ^ (z >> _S31)
+
+
+def _hash_strings(values: Union[pa.Array, pa.ChunkedArray], categorize: bool = True) -> np.ndarray:
+    # pandas' SipHash uses a fixed key, so hashes agree across worker processes
+    return pd.util.hash_array(values.to_numpy(zero_copy_only=False).astype(object), categorize=categorize)
+
+
+def _normalize_text(content: Union[pa.Array, pa.ChunkedArray]) -> pa.Array:
+    """Lowercase, collapse whitespace runs to one space and trim."""
+    content = pc.fill_null(content.cast(pa.string()), '')
+    content = pc.utf8_lower(content)
+    content = pc.replace_substring_regex(content, r'\s+', ' ')
+    return pc.utf8_trim_whitespace(content)
+
+
+def _conversation_hashes(codes: np.ndarray, roles: pa.Array, text: pa.Array, n_conv: int) -> np.ndarray:
+    """Order-sensitive 64-bit hash of each conversation's (role, normalized text) turns."""
+    turn_hashes = _mix(_hash_strings(text, categorize=False) ^ _mix(_hash_strings(roles)))
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=np.int64)
+    positions = np.arange(len(codes), dtype=np.int64) - np.repeat(starts, np.diff(np.r_[starts, len(codes)]))
+    turn_hashes = _mix(turn_hashes + positions.astype(np.uint64) * _GOLDEN)
+
+    sums = np.zeros(n_conv, dtype=np.uint64)
+    n_turns = np.zeros(n_conv, dtype=np.uint64)
+    if len(codes):
+        sums[codes[starts]] = np.add.reduceat(turn_hashes, starts)
+        n_turns[codes[starts]] = np.diff(np.r_[starts, len(codes)]).astype(np.uint64)
+    return _mix(sums ^ _mix(n_turns))
+
+
+def _shingle_hashes(codes: np.ndarray, text: pa.Array, shingle_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Hash every run of shingle_size consecutive words that stays within one conversation."""
+    words = pc.split_pattern(text, ' ')
+    word_turns = pc.list_parent_indices(words).to_numpy(zero_copy_only=False)
+    words = pc.list_flatten(words)
+    keep = pc.not_equal(words, '')
+    words = words.filter(keep)
+    word_codes = codes[word_turns[keep.to_numpy(zero_copy_only=False)]]
+    word_hashes = _hash_strings(words)
+
+    n_shingles = len(word_hashes) - shingle_size + 1
+    if n_shingles <= 0:
+        return np.empty(0, dtype=np.uint64), np.empty(0, dtype=codes.dtype)
+    hashes = _mix(word_hashes[:n_shingles])
+    for offset in range(1, shingle_size):
+        hashes = _mix(hashes ^ word_hashes[offset:offset + n_shingles])
+    valid = word_codes[:n_shingles] == word_codes[shingle_size - 1:]
+    return hashes[valid], word_codes[:n_shingles][valid]
+
+
+def _permutations(num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=num_perm, dtype=np.uint64, endpoint=True)
+    return a, b
+
+
+def _signatures(shingles: np.ndarray, shingle_codes: np.ndarray, exact: np.ndarray,
+                num_perm: int, seed: int) -> np.ndarray:
+    """MinHash signatures (n_conv x num_perm, uint32) using multiply-shift hashing."""
+    n_conv = len(exact)
+    # Conversations too short for a full shingle are represented by their exact hash
+    missing = np.ones(n_conv, dtype=bool)
+    missing[shingle_codes] = False
+    if missing.any():
+        extra = np.flatnonzero(missing)
+        shingles = np.concatenate([shingles, exact[extra]])
+        shingle_codes = np.concatenate([shingle_codes, extra])
+        order = np.argsort(shingle_codes, kind='stable')
+        shingles, shingle_codes = shingles[order], shingle_codes[order]
+
+    a, b = _permutations(num_perm, seed)
+    a, b = a[:, None], b[:, None]
+    signatures = np.full((n_conv, num_perm), _MAX_UINT32, dtype=np.uint32)
+    # Permutations x shingles, so the per-conversation minimum runs along contiguous rows
+    values = np.empty((num_perm, min(SHINGLE_BLOCK, len(shingles))), dtype=np.uint64)
+    for start in range(0, len(shingles), SHINGLE_BLOCK):
+        block = shingles[start:start + SHINGLE_BLOCK]
+        block_codes = shingle_codes[start:start + SHINGLE_BLOCK]
+        block_values = values[:, :len(block)]
+        np.multiply(a, block[None, :], out=block_values)
+        block_values += b
+        block_values >>= _S32
+        starts = np.flatnonzero(np.r_[True, block_codes[1:] != block_codes[:-1]])
+        rows = block_codes[starts]
+        minima = np.minimum.reduceat(block_values, starts, axis=1).T.astype(np.uint32)
+        # A conversation can straddle two blocks, so merge with what is already there
+        signatures[rows] = np.minimum(signatures[rows], minima)
+    return signatures
+
+
+def _turns_to_arrays(turns: Union[pa.Table, pd.DataFrame], conv_id_col: str, role_col: str,
+                     message_col: str, turn_num_col: str):
+    """Sort turns by conversation (first appearance) and turn number; return codes and columns."""
+    if isinstance(turns, pd.DataFrame):
+        turns = pa.Table.from_pandas(turns, preserve_index=False)
+    conv_ids = turns.column(conv_id_col).to_numpy(zero_copy_only=False).astype(object)
+    codes, uniques = pd.factorize(conv_ids)
+    if turn_num_col in turns.column_names:
+        turn_nums = turns.column(turn_num_col).to_numpy(zero_copy_only=False).astype(float)
+        order = np.lexsort((np.nan_to_num(turn_nums, nan=np.inf), codes))
+    else:
+        order = np.argsort(codes, kind='stable')
+    indices = pa.array(order)
+
+    def column(name):
+        if name in turns.column_names:
+            return turns.column(name).take(indices)
+        return pa.nulls(turns.num_rows, pa.string())
+
+    return codes[order], np.asarray(uniques, dtype=object), column(role_col), column(message_col)
+
+
+def _dedup_chunk(turns: Union[pa.Table, pd.DataFrame, str], conv_id_col: str, role_col: str,
+                 message_col: str, turn_num_col: str, near: bool, shingle_size: int,
+                 num_perm: int, seed: int) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+    """
+    Exact hashes and MinHash signatures for the conversations of one chunk of turns.
+
+    Runs in executor workers. turns may be the path of a store's turn partition,
+    which the worker reads itself so that no turn data is pickled.
+    """
+    if isinstance(turns, str):
+        columns = pq.read_schema(turns).names
+        turns = pq.read_table(turns, memory_map=True,
+                              columns=[c for c in (conv_id_col, role_col, message_col, turn_num_col) if c in columns])
+    codes, conv_ids, roles, content = _turns_to_arrays(turns, conv_id_col, role_col, message_col, turn_num_col)
+    text = _normalize_text(content)
+    exact = _conversation_hashes(codes, roles, text, len(conv_ids))
+    signatures = None
+    if near:
+        shingles, shingle_codes = _shingle_hashes(codes, text, shingle_size)
+        signatures = _signatures(shingles, shingle_codes, exact, num_perm, seed)
+    return conv_ids, exact, signatures
+
+
+def _conversation_turns(df: pd.DataFrame, conv_id_col: str, conv_col: str,
+                        role_col: str, message_col: str) -> pd.DataFrame:
+    """Flatten the nested conversation column to (conv_id, role, content) rows."""
+    if df[conv_col].map(lambda value: isinstance(value, (str, bytes))).any():
+        df = normalize_conversations(df[[conv_id_col, conv_col]], column=conv_col)
+    nested = df[[conv_id_col, conv_col]].explode(conv_col)
+    nested = nested[nested[conv_col].map(lambda turn: isinstance(turn, dict))]
+    turns = nested[conv_col].tolist()
+    return pd.DataFrame({conv_id_col: nested[conv_id_col].astype(str).to_numpy(),
+                         role_col: [turn.get(role_col) for turn in turns],
+                         message_col: [turn.get(message_col) for turn in turns]})
+
+
+def _optimal_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """(bands, rows) minimizing the false positive plus false negative probability mass."""
+    grid = np.linspace(0, 1, 201)
+    below, above = grid[grid <= threshold], grid[grid >= threshold]
+    best, best_error = (1, num_perm), np.inf
+    for bands in range(1, num_perm + 1):
+        for rows in range(1, num_perm // bands + 1):
+            false_pos = (1 - (1 - below ** rows) ** bands).mean() * threshold
+            false_neg = ((1 - above ** rows) ** bands).mean() * (1 - threshold)
+            if false_pos + false_neg < best_error:
+                best, best_error = (bands, rows), false_pos + false_neg
+    return best
+
+
+def _group_leaders(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairs (first row with the same key, row) for every row that is not the first of its key."""
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    is_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+    leaders = order[is_start][np.cumsum(is_start) - 1]
+    members = ~is_start
+    return leaders[members], order[members]
+
+
+def _connected_components(n: int, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Label each node with the smallest node index of its component."""
+    labels = np.arange(n)
+    if not len(left):
+        return labels
+    while True:
+        lowest = np.minimum(labels[left], labels[right])
+        updated = labels.copy()
+        np.minimum.at(updated, left, lowest)
+        np.minimum.at(updated, right, lowest)
+        np.minimum.at(updated, labels[left], lowest)
+        np.minimum.at(updated, labels[right], lowest)
+        updated = updated[updated]
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _lsh_pairs(signatures: np.ndarray, threshold: float, bands: int, rows: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Candidate pairs from LSH banding, kept if their estimated Jaccard similarity reaches threshold."""
+    lefts, rights = [], []
+    for band in range(bands):
+        keys = np.zeros(len(signatures), dtype=np.uint64)
+        for column in range(band * rows, (band + 1) * rows):
+            keys = _mix(keys ^ signatures[:, column].astype(np.uint64))
+        left, right = _group_leaders(keys)
+        count('dedup.candidate_pairs', len(left))
+        for start in range(0, len(left), PAIR_BLOCK):
+            block_left, block_right = left[start:start + PAIR_BLOCK], right[start:start + PAIR_BLOCK]
+            similarity = (signatures[block_left] == signatures[block_right]).mean(axis=1)
+            keep = similarity >= threshold
+            lefts.append(block_left[keep])
+            rights.append(block_right[keep])
+    if not lefts:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(lefts), np.concatenate(rights)
+
+
+@instrumented
+def hash_conversations(df: Union[pd.DataFrame, ConversationStore],
+                       conv_id_colname: str = colnames['conv']['conv_id'],
+                       conv_colname: str = colnames['conv']['conversation']) -> pd.Series:
+    """
+    Exact content hash of every conversation.
+
+    Turn text is lowercased and whitespace-normalized, then hashed together with
+    the turn's role and position, so two conversations get the same hash when
+    they have the same turns in the same order regardless of IDs and metadata.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame or ConversationStore
+        Conversation-level DataFrame (with the nested conversation column),
+        turn-level DataFrame (e.g. from unpack_turns), or a store.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+    conv_colname : str, default=conversation
+        The name of the nested conversation column of a conversation-level DataFrame.
+
+    Returns:
+    --------
+    pd.Series
+        uint64 hashes indexed by conversation ID.
+    """
+    result = find_duplicates(df, near=False, conv_id_colname=conv_id_colname, conv_colname=conv_colname)
+    return pd.Series(result[colnames['conv']['content_hash']].to_numpy(),
+                     index=result[conv_id_colname].to_numpy(), name=colnames['conv']['content_hash'])
+
+
+@instrumented
+def find_duplicates(df: Union[pd.DataFrame, ConversationStore],
+                    threshold: float = 0.8,
+                    near: bool = True,
+                    num_perm: int = 128,
+                    bands: Optional[int] = None,
+                    shingle_size: int = 5,
+                    seed: int = 1,
+                    conv_id_colname: str = colnames['conv']['conv_id'],
+                    conv_colname: str = colnames['conv']['conversation'],
+                    executor: Optional[Union[str, Executor]] = None,
+                    max_workers: Optional[int] = None,
+                    chunk_size: int = 50_000) -> pd.DataFrame:
+    """
+    Group exact and near-duplicate conversations into clusters.
+
+    Conversations with identical normalized turns (see hash_conversations) are
+    always clustered. With near=True, conversations whose word shingle sets
+    have an estimated Jaccard similarity of at least threshold are clustered as
+    well, using MinHash signatures and an LSH banding index so that only
+    conversations sharing a band are ever compared.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame or ConversationStore
+        Conversation-level DataFrame (with the nested conversation column),
+        turn-level DataFrame (e.g. from unpack_turns), or a store.
+    threshold : float, default=0.8
+        Minimum estimated Jaccard similarity for near-duplicates.
+    near : bool, default=True
+        Detect near-duplicates. If False only exact hashes are compared.
+    num_perm : int, default=128
+        MinHash permutations. More are more accurate; signatures take
+        4 * num_perm bytes per conversation.
+    bands : int or None
+        LSH bands, each of num_perm // bands rows. Chosen from threshold if None.
+    shingle_size : int, default=5
+        Words per shingle. Conversations with fewer words are compared exactly.
+    seed : int, default=1
+        Seed of the MinHash permutations.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+    conv_colname : str, default=conversation
+        The name of the nested conversation column of a conversation-level DataFrame.
+    executor : None, 'thread', 'process' or concurrent.futures.Executor
+        Where hashes and signatures are computed, one chunk of conversations
+        (or one store partition) per task. None runs in the calling thread;
+        use 'process' to spread large corpora over several cores. Executors
+        passed in are not shut down.
+    max_workers : int or None
+        Workers of the executor created for 'thread'/'process'. Defaults to the number of CPUs.
+    chunk_size : int, default=50000
+        Conversations per task for DataFrame input.
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per conversation, in input order, with the columns
+        (names taken from colnames['conv']):
+        - conv_id
+        - content_hash: exact content hash
+        - dup_cluster: cluster number, in order of first appearance
+        - dup_cluster_size: conversations in the cluster
+        - dup_representative: conv_id of the first conversation of the cluster
+
+    Examples:
+    ---------
+    >>> dups = clb.find_duplicates(df, threshold=0.9, executor='process')
+    >>> dups[dups['dup_cluster_size'] > 1]
+    >>> unique_df = clb.deduplicate(df)
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError("threshold must be in (0, 1]")
+    if shingle_size < 1 or num_perm < 1 or chunk_size < 1:
+        raise ValueError("shingle_size, num_perm and chunk_size must be at least 1")
+    if bands is not None and not 1 <= bands <= num_perm:
+        raise ValueError("bands must be between 1 and num_perm")
+
+    conv_cols = colnames['conv']
+    turn_cols = colnames['turn']
+    role_col, message_col, turn_num_col = turn_cols['role'], turn_cols['message'], turn_cols['turn_number']
+
+    expected_ids = None
+    if isinstance(df, ConversationStore):
+        conv_id_col = df.metadata['conv_id']
+        turn_num_col = df.metadata['turn_number']
+        tasks = [str(df.path / TURNS_DIR / p['name']) for p in df.partitions]
+    else:
+        conv_id_col = conv_id_colname
+        if conv_colname in df.columns:
+            expected_ids = df[conv_id_col].astype(str)
+            with stage('dedup.unpack'):
+                turns = _conversation_turns(df, conv_id_col, conv_colname, role_col, message_col)
+        else:
+            if message_col not in df.columns:
+                raise ValueError(f"DataFrame has neither '{conv_colname}' nor '{message_col}' column")
+            columns = [c for c in (conv_id_col, role_col, message_col, turn_num_col) if c in df.columns]
+            turns = df[columns].assign(**{conv_id_col: df[conv_id_col].astype(str)})
+        # Chunk boundaries fall between conversations so every task sees whole conversations
+        conv_codes, unique_ids = pd.factorize(turns[conv_id_col])
+        order = np.argsort(conv_codes, kind='stable')
+        turns = turns.iloc[order]
+        bounds = np.r_[np.searchsorted(conv_codes[order], np.arange(0, len(unique_ids), chunk_size)), len(turns)]
+        tasks = [turns.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    n_workers = max_workers or os.cpu_count() or 1
+    owned_executor = None
+    if executor == 'thread':
+        executor = owned_executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='chatlab-dedup')
+    elif executor == 'process':
+        executor = owned_executor = ProcessPoolExecutor(max_workers=n_workers)
+    elif executor is not None and not isinstance(executor, Executor):
+        raise ValueError(f"executor must be None, 'thread', 'process' or an Executor, got {executor!r}")
+
+    args = (conv_id_col, role_col, message_col, turn_num_col, near, shingle_size, num_perm, seed)
+    with stage('dedup.hash'):
+        try:
+            if executor is None:
+                results = [_dedup_chunk(task, *args) for task in tasks]
+            else:
+                futures = [executor.submit(_dedup_chunk, task, *args) for task in tasks]
+                results = [future.result() for future in futures]
+        finally:
+            if owned_executor is not None:
+                owned_executor.shutdown()
+
+    conv_ids = np.concatenate([r[0] for r in results]) if results else np.empty(0, dtype=object)
+    exact = np.concatenate([r[1] for r in results]) if results else np.empty(0, dtype=np.uint64)
+    signatures = None
+    if near:
+        signatures = np.concatenate([r[2] for r in results]) if results else np.empty((0, num_perm), dtype=np.uint32)
+
+    if expected_ids is not None:
+        # Restore df's order and add conversations without any turns as empty ones
+        ordered_ids = expected_ids.drop_duplicates().to_numpy(dtype=object)
+        positions = pd.Index(conv_ids).get_indexer(ordered_ids)
+        has_turns = positions >= 0
+        empty_hash = _conversation_hashes(np.empty(0, dtype=np.int64), pa.array([], pa.string()),
+                                          pa.array([], pa.string()), 1)
+        ordered_exact = np.repeat(empty_hash, len(ordered_ids))
+        ordered_exact[has_turns] = exact[positions[has_turns]]
+        if near:
+            empty_signature = _signatures(np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64),
+                                          empty_hash, num_perm, seed)
+            ordered_signatures = np.repeat(empty_signature, len(ordered_ids), axis=0)
+            ordered_signatures[has_turns] = signatures[positions[has_turns]]
+            signatures = ordered_signatures
+        conv_ids, exact = ordered_ids, ordered_exact
+
+    n = len(conv_ids)
+    with stage('dedup.cluster'):
+        left, right = _group_leaders(exact)
+        if near and n > 1:
+            if bands is None:
+                bands, rows = _optimal_bands(threshold, num_perm)
+            else:
+                rows = num_perm // bands
+            near_left, near_right = _lsh_pairs(signatures, threshold, bands, rows)
+            left, right = np.concatenate([left, near_left]), np.concatenate([right, near_right])
+        labels = _connected_components(n, left, right)
+
+    clusters, _ = pd.factorize(labels)
+    sizes = np.bincount(clusters, minlength=clusters.max(initial=-1) + 1)
+    count('dedup.conversations', n)
+    logger.info("Found %d clusters among %d conversations", len(sizes), n)
+    return pd.DataFrame({conv_id_col: conv_ids,
+                         conv_cols['content_hash']: exact,
+                         conv_cols['dup_cluster']: clusters,
+                         conv_cols['dup_cluster_size']: sizes[clusters],
+                         conv_cols['dup_representative']: conv_ids[labels]})
+
+
+@instrumented
+def deduplicate(df: pd.DataFrame,
+                conv_id_colname: str = colnames['conv']['conv_id'],
+                **kwargs) -> pd.DataFrame:
+    """
+    Keep only the representative (first) conversation of every duplicate cluster.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Conversation-level or turn-level DataFrame.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+    **kwargs :
+        Passed to find_duplicates (threshold, near, num_perm, executor, ...).
+
+    Returns:
+    --------
+    pd.DataFrame
+        The rows of df belonging to representative conversations.
+    """
+    clusters = find_duplicates(df, conv_id_colname=conv_id_colname, **kwargs)
+    representatives = clusters[colnames['conv']['dup_representative']].unique()
+    result = df[df[conv_id_colname].astype(str).isin(representatives)]
+    logger.info("Kept %d of %d conversations", len(representatives), len(clusters))
+    return result
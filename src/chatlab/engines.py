@@ -0,0 +1,336 @@
+#chatlab/engines.py
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .store import kwargs_to_expression
+from .utils import _apply_filters_pandas as _pandas_apply_filters, _filters_mask as _pandas_filters_mask, as_arrow_strings
+from .profiling import count
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('pandas', 'arrow', 'polars')
+
+# Rows per regex task of the arrow engine; smaller inputs run in one task
+PARALLEL_CHUNK_ROWS = 100_000
+
+_active_name = 'pandas'
+
+
+def set_engine(name: str) -> None:
+    """
+    Select the engine used by apply_filters, filter_subset, search_text_matches
+    and unpack_turns when no backend is passed to the call.
+
+    'pandas' (the default) runs on pandas objects; 'arrow' runs on Arrow
+    tables with Arrow's compute and string kernels; 'polars' runs on Polars
+    lazy frames with multi-threaded query execution (needs polars installed).
+    """
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine '{name}'. Available: {', '.join(ENGINES)}")
+    if name == 'polars':
+        _polars()
+    global _active_name
+    _active_name = name
+
+
+def get_engine() -> str:
+    """Name of the active engine."""
+    return _active_name
+
+
+def _polars():
+    try:
+        import polars
+    except ImportError:
+        raise ImportError("The polars engine needs polars: pip install 'chatlab[polars]'") from None
+    return polars
+
+
+def is_polars(data: Any) -> bool:
+    module = type(data).__module__
+    return module.startswith('polars.') and type(data).__name__ in ('DataFrame', 'LazyFrame')
+
+
+def is_frame(data: Any) -> bool:
+    """Whether data is a frame one of the engines runs on (pandas, Arrow or Polars)."""
+    return isinstance(data, (pd.DataFrame, pa.Table)) or is_polars(data)
+
+
+def resolve_engine(data: Any, engine: Optional[str]) -> str:
+    """The engine for a call: the one passed, else the one matching the input, else the active one."""
+    if engine is None:
+        if isinstance(data, pa.Table):
+            return 'arrow'
+        if is_polars(data):
+            return 'polars'
+        return _active_name
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Available: {', '.join(ENGINES)}")
+    return engine
+
+
+def column_names(data: Any) -> List[str]:
+    if isinstance(data, pa.Table):
+        return data.column_names
+    if is_polars(data):
+        return list(data.collect_schema().names()) if hasattr(data, 'collect_schema') else list(data.columns)
+    return list(data.columns)
+
+
+def to_pandas(data: Any) -> pd.DataFrame:
+    """Any engine's frame as a pandas DataFrame."""
+    if isinstance(data, pd.DataFrame):
+        return data
+    if isinstance(data, pa.Table):
+        return data.to_pandas()
+    if is_polars(data):
+        frame = data.collect() if type(data).__name__ == 'LazyFrame' else data
+        return frame.to_pandas()
+    raise TypeError(f"Expected a pandas, Arrow or Polars frame, got {type(data).__name__}")
+
+
+def to_arrow(data: Any, columns: Optional[List[str]] = None) -> pa.Table:
+    """Any engine's frame (optionally only some columns) as an Arrow table."""
+    if isinstance(data, pa.Table):
+        return data if columns is None else data.select(columns)
+    if is_polars(data):
+        if columns is not None:
+            data = data.select(columns)
+        frame = data.collect() if type(data).__name__ == 'LazyFrame' else data
+        return frame.to_arrow()
+    frame = data if columns is None else data[columns]
+    arrays = [as_arrow_strings(frame[name]) if _is_text_column(frame[name]) else pa.array(frame[name], from_pandas=True)
+              for name in frame.columns]
+    return pa.table(arrays, names=[str(name) for name in frame.columns])
+
+
+def _is_text_column(values: pd.Series) -> bool:
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return True
+    if values.dtype != object:
+        return pd.api.types.is_string_dtype(values.dtype)
+    present = values.dropna()
+    return bool(len(present)) and isinstance(present.iloc[0], str)
+
+
+def to_lazy(data: Any):
+    """Any engine's frame as a Polars LazyFrame."""
+    pl = _polars()
+    if is_polars(data):
+        return data.lazy()
+    return pl.from_arrow(to_arrow(data)).lazy()
+
+
+def _mask_array(mask: Any) -> np.ndarray:
+    if isinstance(mask, pa.ChunkedArray):
+        mask = mask.combine_chunks()
+    return pc.fill_null(mask, False).to_numpy(zero_copy_only=False)
+
+
+# --- Filtering ---
+
+def _polars_filter_expression(pl, schema: Dict[str, Any], **kwargs):
+    """filter_subset-style keyword filters as a Polars expression, by the rules of apply_filters."""
+    from .utils import parse_range
+    expression = None
+    for key, value in kwargs.items():
+        if key not in schema:
+            continue
+        column = pl.col(key)
+        dtype = schema[key]
+        if dtype.is_numeric() or dtype == pl.Boolean:
+            min_val, max_val = parse_range(value)
+            if min_val is not None and max_val is not None and min_val == max_val:
+                condition = column == min_val
+            else:
+                condition = None
+                if min_val is not None:
+                    condition = column >= min_val
+                if max_val is not None:
+                    upper = column <= max_val
+                    condition = upper if condition is None else condition & upper
+                if condition is None:
+                    continue
+        elif isinstance(value, list):
+            condition = column.is_in(value)
+        else:
+            condition = column == value
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def filter_mask(data: Any, backend: Optional[str] = None, **kwargs) -> np.ndarray:
+    """Boolean mask of the rows of any engine's frame passing the keyword filters."""
+    engine = resolve_engine(data, backend)
+    if engine == 'pandas':
+        return _pandas_filters_mask(to_pandas(data), **kwargs)
+    columns = [key for key in dict.fromkeys(kwargs) if key in column_names(data)]
+    if engine == 'arrow':
+        table = to_arrow(data, columns)
+        n = len(data) if isinstance(data, pd.DataFrame) else to_arrow(data, columns or column_names(data)[:1]).num_rows
+        expression = kwargs_to_expression(table.schema, **kwargs)
+        if expression is None:
+            return np.ones(n, dtype=bool)
+        index = pa.table({'_row': pa.array(np.arange(n))})
+        for name in table.column_names:
+            index = index.append_column(name, table[name])
+        rows = index.filter(expression)['_row'].to_numpy()
+        mask = np.zeros(n, dtype=bool)
+        mask[rows] = True
+        return mask
+    pl = _polars()
+    lazy = to_lazy(data)
+    schema = dict(lazy.collect_schema()) if hasattr(lazy, 'collect_schema') else dict(lazy.schema)
+    expression = _polars_filter_expression(pl, schema, **kwargs)
+    if expression is None:
+        return np.ones(lazy.select(pl.len()).collect().item(), dtype=bool)
+    return lazy.select(expression.fill_null(False)).collect().to_series().to_numpy()
+
+
+def apply_filters(data: Any, backend: Optional[str] = None, **kwargs) -> Any:
+    """
+    Filter any engine's frame with filter_subset-style keyword filters.
+
+    The result has the type of the input: pandas rows keep their index,
+    Arrow tables stay tables and Polars frames stay Polars frames (lazy
+    frames are returned lazy, with the filter added to the query).
+    """
+    engine = resolve_engine(data, backend)
+    count(f'engine.{engine}.filters')
+    if engine == 'pandas' and isinstance(data, pd.DataFrame):
+        return _pandas_apply_filters(data, **kwargs)
+    if engine == 'arrow' and isinstance(data, pa.Table):
+        expression = kwargs_to_expression(data.schema, **kwargs)
+        return data if expression is None else data.filter(expression)
+    if engine == 'polars' and is_polars(data):
+        pl = _polars()
+        schema = dict(data.collect_schema()) if hasattr(data, 'collect_schema') else dict(data.schema)
+        expression = _polars_filter_expression(pl, schema, **kwargs)
+        return data if expression is None else data.filter(expression)
+    # Input of another type: compute the mask with the engine, filter in the input's type
+    mask = filter_mask(data, backend=engine, **kwargs)
+    if isinstance(data, pd.DataFrame):
+        return data[mask]
+    if isinstance(data, pa.Table):
+        return data.filter(pa.array(mask))
+    pl = _polars()
+    return data.filter(pl.Series(mask)) if type(data).__name__ == 'DataFrame' else \
+        data.collect().filter(pl.Series(mask)).lazy()
+
+
+# --- Text search ---
+
+def _arrow_match(messages: pa.Array, pattern: str, case_sensitive: bool) -> np.ndarray:
+    """Regex match over Arrow strings, in parallel chunks; the kernel releases the GIL."""
+    n = len(messages)
+    workers = min(os.cpu_count() or 1, max(1, n // PARALLEL_CHUNK_ROWS))
+    match = lambda chunk: _mask_array(pc.match_substring_regex(chunk, pattern, ignore_case=not case_sensitive))
+    if workers == 1:
+        return match(messages)
+    size = -(-n // workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chatlab-engine') as executor:
+        parts = list(executor.map(match, [messages.slice(start, size) for start in range(0, n, size)]))
+    return np.concatenate(parts)
+
+
+# RE2's (ASCII) meaning of the Perl classes, which Rust's regex crate makes Unicode-aware.
+# Character classes nest in Rust, so the replacements also work inside [...].
+_ASCII_CLASSES = {
+    'd': '[0-9]', 'D': '[^0-9]',
+    'w': '[0-9A-Za-z_]', 'W': '[^0-9A-Za-z_]',
+    's': '[\\t\\n\\f\\r ]', 'S': '[^\\t\\n\\f\\r ]',
+    'b': '(?-u:\\b)', 'B': '(?-u:\\B)',
+}
+
+
+def _ascii_classes(pattern: str) -> str:
+    """pattern with \\d, \\w, \\s and \\b (and their negations) matching ASCII only, as in RE2."""
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern[i] == '\\' and i + 1 < len(pattern):
+            escape = pattern[i + 1]
+            parts.append(_ASCII_CLASSES.get(escape, '\\' + escape))
+            i += 2
+        else:
+            parts.append(pattern[i])
+            i += 1
+    return ''.join(parts)
+
+
+def match_mask(data: Any, column: str, pattern: str, case_sensitive: bool = True,
+               backend: Optional[str] = None) -> np.ndarray:
+    """
+    Boolean mask of the rows whose column contains a match of the regex pattern.
+
+    The arrow engine runs RE2 and the polars engine Rust's regex crate; both
+    lack lookaround and backreferences. Patterns they reject fall back to
+    pandas (Python re), so every engine accepts the same patterns. \\d, \\w, \\s
+    and \\b match ASCII only, as in RE2, on the polars engine too.
+    """
+    engine = resolve_engine(data, backend)
+    count(f'engine.{engine}.searches')
+    if engine == 'arrow':
+        values = as_arrow_strings(data[column]) if isinstance(data, pd.DataFrame) else to_arrow(data, [column])[column]
+        if isinstance(values, pa.ChunkedArray):
+            values = values.combine_chunks()
+        try:
+            return _arrow_match(values, pattern, case_sensitive)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            logger.debug("Arrow cannot run pattern %r (%s); using pandas", pattern, e)
+    elif engine == 'polars':
+        pl = _polars()
+        flags = '' if case_sensitive else '(?i)'
+        condition = pl.col(column).str.contains(flags + _ascii_classes(pattern)).fill_null(False)
+        try:
+            return to_lazy(data).select(condition).collect().to_series().to_numpy()
+        except pl.exceptions.ComputeError as e:
+            logger.debug("Polars cannot run pattern %r (%s); using pandas", pattern, e)
+    values = to_pandas(data)[column] if not isinstance(data, pd.DataFrame) else data[column]
+    return values.str.contains(pattern, case=case_sensitive, regex=True, na=False).to_numpy(dtype=bool)
+
+
+# --- Unpacking ---
+
+def unpack_nested(data: Any, conv_colname: str, backend: Optional[str] = None) -> Any:
+    """
+    One row per turn from a nested conversation column, with one column per turn field.
+
+    Used by unpack_turns for the arrow and polars engines. The column must
+    hold lists of turn dicts with one consistent schema (e.g. from
+    normalize_conversations(as_arrow=True) or a Parquet file); the result has
+    the type of the input, as pandas for pandas input.
+    """
+    engine = resolve_engine(data, backend)
+    count(f'engine.{engine}.unpacks')
+    if engine == 'polars':
+        pl = _polars()
+        result = to_lazy(data).select(pl.col(conv_colname)).explode(conv_colname) \
+            .filter(pl.col(conv_colname).is_not_null()).unnest(conv_colname).collect().to_arrow()
+    else:
+        if isinstance(data, pd.DataFrame):
+            column = pa.array(data[conv_colname].tolist() if data[conv_colname].dtype == object
+                              else data[conv_colname].array, from_pandas=True)
+        else:
+            column = to_arrow(data, [conv_colname])[conv_colname]
+        if isinstance(column, pa.ChunkedArray):
+            column = column.combine_chunks()
+        turns = pc.list_flatten(column)
+        result = pa.Table.from_struct_array(turns.filter(pc.is_valid(turns)))
+    # Nested fields become 'parent.child' columns, as json_normalize names them
+    while any(pa.types.is_struct(field.type) for field in result.schema):
+        result = result.flatten()
+
+    if isinstance(data, pa.Table):
+        return result
+    if is_polars(data):
+        frame = _polars().from_arrow(result)
+        return frame.lazy() if type(data).__name__ == 'LazyFrame' else frame
+    return result.to_pandas()
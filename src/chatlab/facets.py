@@ -0,0 +1,255 @@
+#chatlab/facets.py
+import logging
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Union, Iterable, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .colnames import colnames
+from .compact import _is_text
+from .store import ConversationStore
+from .utils import filter_mask
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = 64
+
+
+def _freeze(value: Any) -> Any:
+    """A hashable form of a filter value, for cache keys."""
+    if isinstance(value, (list, tuple, set)):
+        return (type(value).__name__, tuple(_freeze(v) for v in value))
+    return value
+
+
+class _Facet:
+    """Per-row codes of one column, computed once: category codes or histogram bin numbers."""
+
+    def __init__(self, name: str, values: pd.Series, bins: int):
+        self.name = name
+        self.numeric = pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype)
+        if self.numeric:
+            numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            present = numbers[~np.isnan(numbers)]
+            if not len(present):
+                self.edges = np.array([0.0, 1.0])
+            elif pd.api.types.is_integer_dtype(values.dtype) and present.max() - present.min() < bins:
+                # Small integer ranges get one bin per value
+                self.edges = np.arange(present.min(), present.max() + 2, dtype=np.float64)
+            else:
+                self.edges = np.histogram_bin_edges(present, bins=bins)
+            codes = np.searchsorted(self.edges, numbers, side='right') - 1
+            # The last edge belongs to the last bin, as in np.histogram
+            codes[numbers == self.edges[-1]] = len(self.edges) - 2
+            codes[np.isnan(numbers)] = -1
+            self.size = len(self.edges) - 1
+        else:
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                codes, self.labels = values.cat.codes.to_numpy(), values.cat.categories
+            else:
+                codes, self.labels = pd.factorize(values, use_na_sentinel=True)
+            self.size = len(self.labels)
+        self.codes = codes.astype(np.int64)
+
+    def counts(self, mask: np.ndarray) -> np.ndarray:
+        codes = self.codes[mask]
+        return np.bincount(codes[codes >= 0], minlength=self.size)
+
+    def table(self, counts: np.ndarray, max_categories: Optional[int]) -> pd.DataFrame:
+        if self.numeric:
+            return pd.DataFrame({'bin_left': self.edges[:-1], 'bin_right': self.edges[1:], 'count': counts})
+        order = np.argsort(-counts, kind='stable')
+        order = order[counts[order] > 0][:max_categories]
+        return pd.DataFrame({'value': np.asarray(self.labels)[order], 'count': counts[order]})
+
+
+class FacetIndex:
+    """
+    Value counts and histograms of many columns under changing filters.
+
+    Every column is encoded once into integer codes (category codes for
+    labels, fixed bin numbers for numbers), so the facets of a filter state
+    are one bincount per column over a shared row mask. Masks are kept per
+    filter, so changing one filter recomputes only its mask, and the facets
+    of recent filter states are cached.
+
+    Filters follow filter_subset: a value or list for label columns, an exact
+    value or (min, max) range for numeric columns.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or ConversationStore
+        Conversation-level data. From a store only the facet columns are read.
+    columns : iterable of str, optional
+        Columns to facet. Defaults to all numeric, boolean and text columns
+        except conv_id and user_id.
+    bins : int, default=20
+        Histogram bins of numeric columns. Edges are fixed on the unfiltered
+        data, so histograms stay comparable as filters change. Integer columns
+        spanning fewer values than bins get one bin per value.
+    max_categories : int or None, default=50
+        Most frequent values returned per label column; None returns all.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+
+    Examples:
+    ---------
+    >>> facets = clb.FacetIndex(df)
+    >>> facets.facets(source='wc')['model']
+    >>> facets.update(turns=(5, None))     # source='wc' stays applied
+    >>> facets.conv_ids()                  # same IDs as filter_subset(df, return_all=True, ...)
+    """
+
+    def __init__(self, df: Union[pd.DataFrame, ConversationStore],
+                 columns: Optional[Iterable[str]] = None,
+                 bins: int = 20,
+                 max_categories: Optional[int] = 50,
+                 conv_id_colname: str = colnames['conv']['conv_id']):
+        if isinstance(df, ConversationStore):
+            df = df.read_conversations(columns=None if columns is None else [conv_id_colname, *columns])
+        if columns is None:
+            skip = {conv_id_colname, colnames['conv']['user_id']}
+            columns = [name for name in df.columns if name not in skip and self._facetable(df[name])]
+        missing = [name for name in columns if name not in df.columns]
+        if missing:
+            raise ValueError(f"Columns not found in DataFrame: {missing}")
+
+        self.df = df
+        self.conv_id_colname = conv_id_colname
+        self.max_categories = max_categories
+        self._facets = {name: _Facet(name, df[name], bins) for name in columns}
+        self.filters: Dict[str, Any] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        # Number of filters each row fails, kept up to date filter by filter
+        self._failed = np.zeros(len(df), dtype=np.int32)
+        self._cache: 'OrderedDict[Tuple, Dict[str, pd.DataFrame]]' = OrderedDict()
+
+    @staticmethod
+    def _facetable(values: pd.Series) -> bool:
+        dtype = values.dtype
+        return (pd.api.types.is_numeric_dtype(dtype) or isinstance(dtype, pd.CategoricalDtype)
+                or (pd.api.types.is_string_dtype(dtype) and dtype != object) or _is_text(values))
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._facets)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Rows passing all current filters."""
+        return self._failed == 0
+
+    def __len__(self) -> int:
+        """Number of rows passing all current filters."""
+        return int(np.count_nonzero(self._failed == 0))
+
+    def __repr__(self) -> str:
+        return f"FacetIndex({len(self._facets)} columns, {len(self)}/{len(self.df)} rows, filters={self.filters})"
+
+    def _set(self, name: str, value: Any) -> None:
+        old = self._masks.pop(name, None)
+        if old is not None:
+            self._failed -= ~old
+            del self.filters[name]
+        if value is None or name not in self.df.columns:
+            # Unknown columns are ignored, as in filter_subset
+            return
+        mask = filter_mask(self.df[name], value)
+        self._failed += ~mask
+        self._masks[name] = mask
+        self.filters[name] = value
+        count('facets.masks_computed')
+
+    def update(self, **kwargs) -> Dict[str, pd.DataFrame]:
+        """
+        Change some filters and return the facets. A value of None removes a filter;
+        filters not mentioned stay as they are.
+        """
+        for name, value in kwargs.items():
+            if _freeze(self.filters.get(name)) != _freeze(value):
+                self._set(name, value)
+        return self._compute()
+
+    def facets(self, **kwargs) -> Dict[str, pd.DataFrame]:
+        """
+        Set the filters to exactly kwargs and return the facets.
+
+        Only filters that differ from the current state are recomputed.
+
+        Returns:
+        --------
+        dict
+            Column name -> DataFrame: value and count (most frequent first) for
+            label columns, bin_left, bin_right and count for numeric columns.
+            The tables are copies and can be modified freely.
+        """
+        changes = {name: None for name in self.filters if name not in kwargs}
+        changes.update(kwargs)
+        return self.update(**changes)
+
+    def reset(self) -> Dict[str, pd.DataFrame]:
+        """Remove all filters and return the facets of the whole DataFrame."""
+        return self.facets()
+
+    def _compute(self) -> Dict[str, pd.DataFrame]:
+        key = tuple(sorted((name, _freeze(value)) for name, value in self.filters.items()))
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            count('facets.cache_hits')
+            return self._copy(self._cache[key])
+
+        mask = self._failed == 0
+        result = {name: facet.table(facet.counts(mask), self.max_categories) for name, facet in self._facets.items()}
+        self._cache[key] = result
+        if len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        logger.debug("Computed %d facets over %d rows", len(result), int(mask.sum()))
+        return self._copy(result)
+
+    @staticmethod
+    def _copy(result: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+        """Copies of cached facets, so callers can modify them without touching the cache."""
+        return {name: table.copy() for name, table in result.items()}
+
+    def conv_ids(self) -> List[str]:
+        """IDs of the conversations passing the current filters, as filter_subset(return_all=True)."""
+        return self.df.loc[self._failed == 0, self.conv_id_colname].unique().tolist()
+
+
+@instrumented
+def facet_counts(df: Union[pd.DataFrame, ConversationStore],
+                 columns: Optional[Iterable[str]] = None,
+                 bins: int = 20,
+                 max_categories: Optional[int] = 50,
+                 **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    Value counts of label columns and histograms of numeric columns under filters.
+
+    One-off form of FacetIndex; use a FacetIndex directly when filters change
+    interactively.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or ConversationStore
+        Conversation-level data.
+    columns, bins, max_categories :
+        As for FacetIndex.
+    **kwargs :
+        Filters as for filter_subset, e.g. source='wc', turns=(5, None).
+
+    Returns:
+    --------
+    dict
+        Column name -> facet DataFrame, as FacetIndex.facets.
+
+    Examples:
+    ---------
+    >>> facets = clb.facet_counts(df, source='wc', turns=(5, None))
+    >>> facets['language'].head()
+    """
+    if isinstance(df, ConversationStore) and columns is not None:
+        columns = list(columns)
+        df = df.read_conversations(columns=[colnames['conv']['conv_id'], *columns, *kwargs])
+    return FacetIndex(df, columns=columns, bins=bins, max_categories=max_categories).facets(**kwargs)
@@ -1,24 +1,40 @@
 import pandas as pd
+import pyarrow.compute as pc
+import logging
 import random
 from typing import Optional, Union, List, Tuple
 from .utils import apply_filters
 from .colnames import colnames
+from .store import ConversationStore, kwargs_to_expression
+from .engines import resolve_engine, to_arrow
+from .query_cache import cached_query
+from .profiling import instrumented
 
+logger = logging.getLogger(__name__)
 
-def filter_subset(df: pd.DataFrame,
+
+@instrumented
+def filter_subset(df: Union[pd.DataFrame, ConversationStore],
                   return_all: bool = False,
                   conv_id_colname: str = colnames['conv']['conv_id'],
+                  backend: Optional[str] = None,
                   **kwargs) -> Union[str, List[str], None]:
     """
     Return conversation ID(s) from the DataFrame that match the filters.
 
     Parameters:
     -----------
-    df : pandas.DataFrame
+    df : pandas.DataFrame, ConversationStore, pyarrow.Table or polars DataFrame/LazyFrame
         DataFrame containing conversation data (required positional argument).
+        If a ConversationStore is given, only the conv_id column and the filtered
+        columns are read, and the filters are pushed down to the Parquet scan.
     return_all : bool, default=False
         If True, returns all matching conversation IDs as a list.
         If False, returns a single random conversation ID.
+    backend : str, optional
+        The engine to run on: 'pandas', 'arrow' or 'polars' (see set_engine).
+        Defaults to the engine of the input type for Arrow and Polars input,
+        else the active engine.
     **kwargs : dict
         Keyword arguments for filtering. If a key matches a column name in df,
         filtering is applied based on the value type:
@@ -31,6 +47,7 @@ def filter_subset(df: pd.DataFrame,
             - (2, 10) means from 2 up to and including 10
             - (None, 10) means up to and including 10 (no lower bound)
             - (2, None) means 2 or more (no upper bound)
+        Names of the parameters above (e.g. 'backend') cannot be used as filters.
 
     Returns:
     --------
@@ -51,18 +68,34 @@ def filter_subset(df: pd.DataFrame,
     # Get all conversations with at least 5 turns
     filter_subset(df, return_all=True, turns=(5, None))
     """
-    # Apply filters from kwargs
-    filtered_df = apply_filters(df, **kwargs)
+    def matching_ids() -> pd.DataFrame:
+        data = df
+        # Read only the needed columns and row groups from a store
+        if isinstance(data, ConversationStore):
+            filter_expression = kwargs_to_expression(data.dataset().schema, **kwargs)
+            data = data.read_conversations(columns=[conv_id_colname, *kwargs], filters=filter_expression,
+                                           as_arrow=resolve_engine(data, backend) != 'pandas')
+
+        # Apply filters from kwargs
+        filtered_df = apply_filters(data, backend=backend, **kwargs)
+        if not isinstance(filtered_df, pd.DataFrame):
+            ids = pc.unique(to_arrow(filtered_df, [conv_id_colname])[conv_id_colname])
+            return pd.DataFrame({conv_id_colname: ids.to_numpy(zero_copy_only=False)})
+        return pd.DataFrame({conv_id_colname: filtered_df[conv_id_colname].unique()})
+
+    # Reused across calls with the same data and filters if the query cache is enabled
+    matches = cached_query('filter_subset', df, [conv_id_colname, *kwargs],
+                           {'conv_id_colname': conv_id_colname, 'filters': kwargs}, matching_ids)
 
     # Check if we have any matches
-    if filtered_df.empty:
+    if matches.empty:
         return None
 
-    # Print the number of matching conversations
-    print(f'{len(filtered_df)} conversations match filters')
+    # Report the number of matching conversations
+    logger.info('%d conversations match filters', len(matches))
 
     # Return based on return_all flag
     if return_all:
-        return filtered_df[conv_id_colname].unique().tolist()
+        return matches[conv_id_colname].tolist()
     else:
-        return random.choice(filtered_df[conv_id_colname].unique())
\ No newline at end of file
+        return random.choice(matches[conv_id_colname].to_numpy())
@@ -0,0 +1,368 @@
+#chatlab/ingest.py
+import glob
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Dict, Any, Union, List, Callable
+
+from .store import ConversationStore, METADATA_FILE
+from .concat_files import default_read_kwargs, get_reader
+from .log_utils import ErrorSummary
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = '_manifest.json'
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_hash(path: Union[str, Path]) -> str:
+    """BLAKE2b digest of a file's content, read in blocks."""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    Source files ingested into a store, kept as <store>/_manifest.json.
+
+    Each entry is keyed by the file's path relative to the ingested directory
+    and records its size, mtime, content hash, row count and the store
+    partitions its rows were written to, so a changed file can be replaced.
+    """
+
+    def __init__(self, store_path: Union[str, Path]):
+        self.path = Path(store_path) / MANIFEST_FILE
+        if self.path.exists():
+            self.data = json.loads(self.path.read_text(encoding='utf-8'))
+            if self.data.get('version') != MANIFEST_VERSION:
+                raise ValueError(f"Unsupported manifest version: {self.data.get('version')}")
+        else:
+            self.data = {'version': MANIFEST_VERSION, 'files': {}}
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    def __repr__(self) -> str:
+        return f"Manifest('{self.path}', files={len(self)})"
+
+    @property
+    def files(self) -> Dict[str, Dict[str, Any]]:
+        return self.data['files']
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(MANIFEST_FILE + '.tmp')
+        tmp_path.write_text(json.dumps(self.data, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+class IngestResult:
+    """
+    Outcome of one ingest_files() run.
+
+    Attributes:
+    -----------
+    added, changed, removed, unchanged, failed : list[str]
+        Source files (relative to the directory) by what happened to them.
+    rows : int
+        Rows written to the store.
+    partitions : list[str]
+        Store partitions written.
+    store : ConversationStore or None
+        The store, or None if it does not exist yet because nothing was ingested.
+    elapsed : float
+        Seconds the run took.
+    """
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+        self.unchanged: List[str] = []
+        self.failed: List[str] = []
+        self.rows = 0
+        self.partitions: List[str] = []
+        self.store: Optional[ConversationStore] = None
+        self.elapsed = 0.0
+
+    @property
+    def updated(self) -> bool:
+        """Whether the store changed."""
+        return bool(self.added or self.changed or self.removed)
+
+    def __repr__(self) -> str:
+        return (f"IngestResult({len(self.added)} added, {len(self.changed)} changed, "
+                f"{len(self.removed)} removed, {len(self.unchanged)} unchanged, {len(self.failed)} failed, "
+                f"{self.rows} rows, {self.elapsed:.1f}s)")
+
+
+def _open_or_none(store: Union[str, Path, ConversationStore]) -> Optional[ConversationStore]:
+    if isinstance(store, ConversationStore):
+        return store
+    if (Path(store) / METADATA_FILE).exists():
+        return ConversationStore(store)
+    return None
+
+
+def _seed(manifest: Manifest, directory: Path, files: List[str]) -> None:
+    """Record files as already ingested. Which partitions hold their rows is unknown."""
+    for file in files:
+        stat = os.stat(file)
+        manifest.files[Path(file).relative_to(directory).as_posix()] = {
+            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': file_hash(file),
+            'rows': None, 'partitions': [], 'seeded': True}
+    manifest.save()
+    logger.info("Seeded %s with %d files", manifest.path, len(files))
+
+
+@instrumented
+def ingest_files(
+        directory: Union[str, Path],
+        store: Union[str, Path, ConversationStore],
+        file_type: str = 'json',
+        read_kwargs: Optional[Dict[str, Any]] = None,
+        error_handling: str = 'warn',
+        remove_missing: bool = False,
+        min_age: float = 0.0,
+        lookup: Optional[Union[bool, str, Path]] = None,
+        store_kwargs: Optional[Dict[str, Any]] = None,
+        seed_manifest: bool = False
+) -> IngestResult:
+    """
+    Bring a store up to date with the files of a directory, reading only what changed.
+
+    A manifest next to the store (see Manifest) records every ingested file.
+    Files whose size and mtime match the manifest are skipped without being
+    read. Otherwise the content hash decides: new files are appended, files
+    with new content replace the partitions written from their old content,
+    and files that were only touched are skipped.
+
+    A store that already holds data but has no manifest, e.g. one written by
+    concat_files(store=...), is refused: every file would be appended again.
+    Use seed_manifest to adopt such a store.
+
+    Parameters:
+    -----------
+    directory : str or Path
+        The directory containing the files, as for concat_files.
+    store : str, Path or ConversationStore
+        The store to update. Created from the first ingested file if missing.
+    file_type : str, default='json'
+        The file extension to look for (without the dot).
+    read_kwargs : dict, optional
+        Keyword arguments for the pandas read function, as for concat_files.
+    error_handling : str, default='warn'
+        'warn', 'raise' or 'ignore' for files that cannot be read. Failed files
+        are not recorded, so they are retried on the next run.
+    remove_missing : bool, default=False
+        Remove the rows of files that were deleted from the directory.
+    min_age : float, default=0.0
+        Skip files modified less than this many seconds ago, e.g. files that
+        are still being written. They are picked up by a later run.
+    lookup : bool, str, Path or None
+        Rebuild a ConversationLookup of the store after an update. True uses
+        the default '<store>/lookup'; None or False rebuilds nothing.
+    store_kwargs : dict, optional
+        Passed to ConversationStore.create when the store is created.
+    seed_manifest : bool, default=False
+        For an existing store without a manifest: record the files currently
+        in the directory as already ingested, without reading them, and only
+        ingest files added after that. The store must hold exactly those files.
+        The partitions of seeded files are unknown, so when one changes its new
+        rows are appended without removing the old ones (with a warning), and
+        remove_missing cannot remove its rows.
+
+    Returns:
+    --------
+    IngestResult
+        What was added, replaced and removed, and the store.
+
+    Examples:
+    ---------
+    >>> result = clb.ingest_files('data/raw_files', 'data/corpus_store')
+    >>> result.added, result.store
+
+    >>> # Adopt a store written by concat_files(store=...) from the same directory
+    >>> clb.ingest_files('data/raw_files', 'data/corpus_store', seed_manifest=True)
+    """
+    start = time.perf_counter()
+    valid_error_modes = ['warn', 'raise', 'ignore']
+    if error_handling not in valid_error_modes:
+        raise ValueError(f"error_handling must be one of {valid_error_modes}")
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise ValueError(f"Directory does not exist: {directory}")
+
+    if read_kwargs is None:
+        read_kwargs = default_read_kwargs(file_type)
+    reader_func = get_reader(file_type)
+
+    result = IngestResult()
+    store_path = store.path if isinstance(store, ConversationStore) else Path(store)
+    result.store = _open_or_none(store)
+    manifest = Manifest(store_path)
+    seeding = False
+    if result.store is None:
+        # Entries left over from a deleted store would hide files that need ingesting
+        manifest.files.clear()
+    elif not manifest.path.exists() and result.store.partitions:
+        if not seed_manifest:
+            raise ValueError(f"Store {store_path} holds data but has no {MANIFEST_FILE}, so every file would be "
+                             f"appended again. Pass seed_manifest=True if the store holds the current files of "
+                             f"{directory}.")
+        seeding = True
+    errors = ErrorSummary(logger, 'files')
+
+    files = sorted(glob.glob(os.path.join(glob.escape(str(directory)), f"*.{file_type}")))
+    if seeding:
+        _seed(manifest, directory, files)
+    seen = set()
+    now = time.time()
+    for file in files:
+        key = Path(file).relative_to(directory).as_posix()
+        seen.add(key)
+        try:
+            stat = os.stat(file)
+        except OSError as e:
+            errors.add('stat failed', key, e)
+            continue
+        if now - stat.st_mtime < min_age:
+            continue
+
+        entry = manifest.files.get(key)
+        if entry is not None and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            result.unchanged.append(key)
+            continue
+
+        content_hash = file_hash(file)
+        count('ingest.files_hashed')
+        if entry is not None and entry['hash'] == content_hash:
+            # Touched but identical: remember the new stat so it is not hashed again
+            entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            manifest.save()
+            result.unchanged.append(key)
+            continue
+
+        try:
+            df = reader_func(file, **read_kwargs)
+        except Exception as e:
+            if error_handling == 'raise':
+                raise
+            if error_handling == 'warn':
+                errors.add('read failed', key, e)
+            result.failed.append(key)
+            continue
+        count('files_read')
+        count('rows_read', len(df))
+
+        if result.store is None:
+            result.store = ConversationStore.create(df, store_path, **(store_kwargs or {}))
+            written = [p['name'] for p in result.store.partitions]
+        else:
+            written = result.store.append(df)
+            if entry is not None:
+                result.store.remove_partitions(entry['partitions'])
+                if entry.get('seeded'):
+                    logger.warning("%s changed after the manifest was seeded; the rows of its old content "
+                                   "stay in the store", key)
+
+        manifest.files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash,
+                               'rows': int(len(df)), 'partitions': written}
+        manifest.save()
+        (result.added if entry is None else result.changed).append(key)
+        result.rows += len(df)
+        result.partitions.extend(written)
+        logger.debug("Ingested %d rows from %s", len(df), key)
+
+    if remove_missing:
+        for key in [key for key in manifest.files if key not in seen]:
+            if result.store is not None:
+                result.store.remove_partitions(manifest.files[key]['partitions'])
+            if manifest.files[key].get('seeded'):
+                logger.warning("%s was removed after the manifest was seeded; its rows stay in the store", key)
+            del manifest.files[key]
+            manifest.save()
+            result.removed.append(key)
+
+    errors.log()
+    if result.updated:
+        logger.info("Ingested %s: %d added, %d changed, %d removed (%d rows)", directory,
+                    len(result.added), len(result.changed), len(result.removed), result.rows)
+        if lookup and result.store is not None:
+            from .lookup import ConversationLookup
+            ConversationLookup.build(result.store, None if lookup is True else lookup, overwrite=True)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def watch_files(
+        directory: Union[str, Path],
+        store: Union[str, Path, ConversationStore],
+        interval: float = 60.0,
+        on_update: Optional[Callable[[IngestResult], None]] = None,
+        stop: Optional[threading.Event] = None,
+        max_runs: Optional[int] = None,
+        **kwargs
+) -> Optional[IngestResult]:
+    """
+    Poll a directory and keep a store up to date with ingest_files().
+
+    Blocks until stop is set, max_runs polls have been made or the process is
+    interrupted. A failing poll is logged and retried at the next interval.
+
+    Parameters:
+    -----------
+    directory, store :
+        As for ingest_files.
+    interval : float, default=60.0
+        Seconds between polls.
+    on_update : callable, optional
+        Called with the IngestResult after every poll that changed the store,
+        e.g. to refresh derived data.
+    stop : threading.Event, optional
+        Set it (e.g. from another thread) to stop watching.
+    max_runs : int, optional
+        Stop after this many polls.
+    **kwargs :
+        Passed to ingest_files (file_type, lookup, remove_missing, min_age, ...).
+
+    Returns:
+    --------
+    IngestResult or None
+        The result of the last successful poll.
+
+    Examples:
+    ---------
+    >>> clb.watch_files('data/raw_files', 'data/corpus_store', interval=300, lookup=True, min_age=30)
+    """
+    stop = stop or threading.Event()
+    last = None
+    runs = 0
+    logger.info("Watching %s every %.0fs", directory, interval)
+    try:
+        while not stop.is_set():
+            try:
+                last = ingest_files(directory, store, **kwargs)
+                if last.store is not None:
+                    store = last.store
+                if last.updated and on_update is not None:
+                    on_update(last)
+            except Exception:
+                logger.exception("Ingesting %s failed", directory)
+            runs += 1
+            if max_runs is not None and runs >= max_runs:
+                break
+            stop.wait(interval)
+    except KeyboardInterrupt:
+        logger.info("Stopped watching %s", directory)
+    return last
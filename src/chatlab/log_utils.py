@@ -0,0 +1,189 @@
+#chatlab/log_utils.py
+import logging
+import sys
+import threading
+from typing import Optional, Dict, List, Tuple, Any, Iterable
+
+LOGGER_NAME = 'chatlab'
+
+_HANDLER_ATTRIBUTE = '_chatlab_handler'
+
+
+def configure_logging(level: str = 'INFO',
+                      fmt: str = '%(levelname)s [%(name)s] %(message)s') -> logging.Handler:
+    """
+    Send chatlab log messages to stderr at the given level.
+
+    chatlab reports progress (e.g. "N conversations match filters") at INFO and
+    problems at WARNING through the standard logging module. Without any logging
+    configuration only warnings and errors reach stderr. Call this once, for
+    example at the top of a notebook, to also see progress messages. Calling it
+    again only changes the level and format.
+
+    Returns:
+    --------
+    logging.Handler
+        The stderr handler attached to the 'chatlab' logger.
+    """
+    logger = logging.getLogger(LOGGER_NAME)
+    handler = next((h for h in logger.handlers if getattr(h, _HANDLER_ATTRIBUTE, False)), None)
+    if handler is None:
+        handler = logging.StreamHandler(sys.stderr)
+        setattr(handler, _HANDLER_ATTRIBUTE, True)
+        logger.addHandler(handler)
+    handler.setFormatter(logging.Formatter(fmt))
+    logger.setLevel(level)
+    return handler
+
+
+class _StderrHandler(logging.StreamHandler):
+    """Writes to sys.stderr as it is when a message is logged (notebooks and tests replace it)."""
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+
+    @property
+    def stream(self):
+        return sys.stderr
+
+
+# Shows verbose=True messages where logging is not set up to show INFO; never attached to a logger
+_VERBOSE_HANDLER = _StderrHandler()
+_VERBOSE_HANDLER.setFormatter(logging.Formatter('%(message)s'))
+
+
+class VerboseLogger(logging.LoggerAdapter):
+    """
+    Logger for the messages of verbose=True calls, shown on stderr even without logging configuration.
+
+    Messages go through the logger as usual when it shows them (see
+    configure_logging). Otherwise they are written to stderr directly, without
+    changing the logger's level or handlers, so concurrent calls are unaffected.
+
+    Examples:
+    ---------
+    >>> verbose_logger = VerboseLogger(logger)
+    >>> if verbose:
+    ...     verbose_logger.info("Found %d files", n)
+    """
+
+    def __init__(self, logger: logging.Logger):
+        super().__init__(logger, {})
+
+    def isEnabledFor(self, level: int) -> bool:
+        return True
+
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        if self.logger.isEnabledFor(level) and self.logger.hasHandlers():
+            kwargs.setdefault('stacklevel', 3)
+            self.logger.log(level, msg, *args, **kwargs)
+        else:
+            _VERBOSE_HANDLER.handle(self.logger.makeRecord(self.logger.name, level, '(unknown file)', 0,
+                                                           msg, args, None))
+
+
+class RateLimitedLogger:
+    """
+    Logs at most `limit` warnings per key, then counts the rest silently.
+
+    Meant for messages that can fire once per turn or per conversation, such as
+    unparseable timestamps, so a bad batch cannot flood stderr. Pass it to the
+    batch's ErrorSummary (rate_limited=...), which resets the counts when the
+    batch starts and reports the suppressed messages with its summary.
+    """
+
+    def __init__(self, logger: logging.Logger, limit: int = 5):
+        self.logger = logger
+        self.limit = limit
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def warning(self, key: str, msg: str, *args: Any) -> None:
+        with self._lock:
+            seen = self._counts.get(key, 0) + 1
+            self._counts[key] = seen
+        if seen <= self.limit:
+            self.logger.warning(msg, *args)
+            if seen == self.limit:
+                self.logger.warning("Further '%s' warnings will be suppressed", key)
+
+    def suppressed(self) -> Dict[str, int]:
+        """Number of suppressed messages per key."""
+        with self._lock:
+            return {key: n - self.limit for key, n in self._counts.items() if n > self.limit}
+
+    def reset(self) -> Dict[str, int]:
+        """Start counting again; returns the suppressed counts until now."""
+        with self._lock:
+            suppressed = {key: n - self.limit for key, n in self._counts.items() if n > self.limit}
+            self._counts.clear()
+        return suppressed
+
+
+class ErrorSummary:
+    """
+    Collects per-item problems during a batch and logs them as one summary.
+
+    Tight loops call add() instead of logging, so no terminal I/O happens
+    per item. The summary is logged once, on log() or when used as a
+    context manager, on exit. Rate-limited loggers given as rate_limited are
+    reset when the summary is created, and the warnings they suppressed are
+    counted in the summary.
+
+    Examples:
+    ---------
+    >>> with ErrorSummary(logger, 'conversations') as errors:
+    ...     for conv_id in conv_ids:
+    ...         render(conv_id, errors=errors)
+    """
+
+    def __init__(self, logger: logging.Logger, label: str = 'items', max_examples: int = 3,
+                 rate_limited: Iterable[RateLimitedLogger] = ()):
+        self.logger = logger
+        self.label = label
+        self.max_examples = max_examples
+        self.total: Optional[int] = None
+        self._errors: Dict[str, List[Tuple[Any, Optional[str]]]] = {}
+        self._lock = threading.Lock()
+        self.rate_limited = list(rate_limited)
+        for limiter in self.rate_limited:
+            limiter.reset()
+
+    def add(self, category: str, item_id: Any, error: Any = None) -> None:
+        with self._lock:
+            self._errors.setdefault(category, []).append((item_id, None if error is None else str(error)))
+        self.logger.debug("%s for %s: %s", category, item_id, error)
+
+    def __len__(self) -> int:
+        return sum(len(items) for items in self._errors.values())
+
+    @property
+    def errors(self) -> Dict[str, List[Tuple[Any, Optional[str]]]]:
+        return {category: list(items) for category, items in self._errors.items()}
+
+    def log(self, level: int = logging.WARNING) -> None:
+        suppressed: Dict[str, int] = {}
+        for limiter in self.rate_limited:
+            for key, n in limiter.reset().items():
+                suppressed[key] = suppressed.get(key, 0) + n
+        if suppressed and self.logger.isEnabledFor(level):
+            self.logger.log(level, "%d further warnings suppressed: %s", sum(suppressed.values()),
+                            ', '.join(f"'{key}' x{n}" for key, n in suppressed.items()))
+        if not self._errors or not self.logger.isEnabledFor(level):
+            return
+        parts = []
+        for category, items in self._errors.items():
+            examples = ', '.join(str(item_id) for item_id, _ in items[:self.max_examples])
+            first_error = next((error for _, error in items if error), None)
+            detail = f"; first error: {first_error}" if first_error else ''
+            parts.append(f"{category} x{len(items)} (e.g. {examples}{detail})")
+        affected = len({item_id for items in self._errors.values() for item_id, _ in items})
+        total = f" of {self.total}" if self.total is not None else ''
+        self.logger.log(level, "%d%s %s had problems: %s", affected, total, self.label, '; '.join(parts))
+
+    def __enter__(self) -> 'ErrorSummary':
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self.log()
+        return False
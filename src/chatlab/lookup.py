@@ -0,0 +1,246 @@
+#chatlab/lookup.py
+import json
+import shutil
+from pathlib import Path
+from typing import Optional, Union, Dict, Any, Iterable
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from .colnames import colnames
+from .store import ConversationStore, CONVERSATIONS_DIR, TURNS_DIR, _to_arrow
+from .profiling import instrumented, count
+
+LOOKUP_FILE = '_lookup.json'
+INDEX_FILE = '_index.parquet'
+VALID_FORMATS = ['ipc', 'parquet']
+
+
+def _nest_turns(conversations: pa.Table, turns: pa.Table, conv_id_col: str,
+                conv_col: str, turn_num_col: str) -> pa.Table:
+    """
+    Attach the turns of a store partition to its conversations as a list<struct> column.
+
+    Every conversation row gets the turns stored under its conv_id, as in
+    ConversationStore.conversation_rows, so repeated conv_ids each get them.
+    """
+    turns = turns.sort_by([(conv_id_col, 'ascending'), (turn_num_col, 'ascending')])
+    conversations = conversations.sort_by(conv_id_col)
+
+    # Runs of equal conv_ids in the sorted turns
+    turn_ids = turns[conv_id_col].to_numpy(zero_copy_only=False)
+    starts = np.flatnonzero(np.r_[True, turn_ids[1:] != turn_ids[:-1]]) if len(turn_ids) else np.zeros(0, np.int64)
+    run_ids = turn_ids[starts]
+    run_lengths = np.diff(np.append(starts, len(turn_ids)))
+
+    # The run of every conversation row, if it has turns
+    conv_ids = conversations[conv_id_col].to_numpy(zero_copy_only=False)
+    runs = np.searchsorted(run_ids, conv_ids)
+    found = runs < len(run_ids)
+    found[found] = run_ids[runs[found]] == conv_ids[found]
+    lengths = np.zeros(len(conv_ids), dtype=np.int64)
+    lengths[found] = run_lengths[runs[found]]
+    first_turns = np.zeros(len(conv_ids), dtype=np.int64)
+    first_turns[found] = starts[runs[found]]
+    offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int32)
+
+    struct = pa.StructArray.from_arrays([column.combine_chunks() for column in turns.columns],
+                                        names=turns.column_names)
+    indices = np.repeat(first_turns - offsets[:-1], lengths) + np.arange(offsets[-1])
+    if len(indices) != len(struct) or not np.array_equal(indices, np.arange(len(struct))):
+        # Repeated conv_ids or turns without a conversation: gather the turns of every row
+        struct = struct.take(pa.array(indices))
+    nested = pa.ListArray.from_arrays(pa.array(offsets), struct)
+    return conversations.append_column(conv_col, nested)
+
+
+class ConversationLookup:
+    """
+    Random access to single conversations without loading the corpus.
+
+    The corpus is written once as conv_id-sorted Arrow IPC (or Parquet) files,
+    next to a small index mapping each conv_id to (file, batch, offset), where
+    batch is the IPC record batch or Parquet row group holding the row. Lookups
+    memory-map the file and decode only that row, so resident memory stays
+    small regardless of corpus size.
+
+    Examples:
+    ---------
+    >>> lookup = ConversationLookup.build(df, 'corpus_lookup')
+    >>> lookup = ConversationLookup('corpus_lookup')
+    >>> lookup.get('wc_2757233')
+    >>> clb.visualize_conversation(lookup, 'wc_2757233')
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        metadata_path = self.path / LOOKUP_FILE
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"No conversation lookup found at {self.path}")
+
+        self.metadata = json.loads(metadata_path.read_text(encoding='utf-8'))
+        self.format = self.metadata['format']
+        self.files = self.metadata['files']
+
+        index = pq.read_table(self.path / INDEX_FILE)
+        self._ids = index['conv_id'].to_numpy(zero_copy_only=False).astype(str)
+        self._file = index['file'].to_numpy()
+        self._batch = index['batch'].to_numpy()
+        self._offset = index['offset'].to_numpy()
+        self._readers: Dict[int, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, conv_id: str) -> bool:
+        return self._locate(conv_id) is not None
+
+    def __repr__(self) -> str:
+        return f"ConversationLookup('{self.path}', conversations={len(self)}, format='{self.format}')"
+
+    # --- Creation ---
+
+    @classmethod
+    @instrumented
+    def build(cls,
+              source: Union[pd.DataFrame, ConversationStore],
+              path: Optional[Union[str, Path]] = None,
+              format: str = 'ipc',
+              batch_size: int = 1024,
+              overwrite: bool = False,
+              conv_id_colname: str = colnames['conv']['conv_id'],
+              conv_colname: str = colnames['conv']['conversation']) -> 'ConversationLookup':
+        """
+        Write a sorted lookup for a DataFrame or ConversationStore and return it.
+
+        Parameters:
+        -----------
+        source : pandas.DataFrame or ConversationStore
+            Conversation-level data with a nested conversation column, or a store
+            (whose turns are re-nested per partition).
+        path : str or Path, optional
+            Output directory. Defaults to '<store>/lookup' when source is a store.
+        format : str, default='ipc'
+            'ipc': Arrow IPC files, mapped without decoding (fastest lookups)
+            'parquet': compressed Parquet, decoding one row group per lookup
+        batch_size : int, default=1024
+            Rows per IPC record batch / Parquet row group.
+        overwrite : bool, default=False
+            Whether to replace an existing lookup at path.
+        """
+        if format not in VALID_FORMATS:
+            raise ValueError(f"format must be one of {VALID_FORMATS}")
+
+        if path is None:
+            if not isinstance(source, ConversationStore):
+                raise ValueError("path is required when building from a DataFrame")
+            path = source.path / 'lookup'
+        path = Path(path)
+        if path.exists():
+            if not overwrite:
+                raise FileExistsError(f"Lookup already exists at {path}. Use overwrite=True to replace it.")
+            shutil.rmtree(path)
+        path.mkdir(parents=True)
+
+        if isinstance(source, ConversationStore):
+            conv_id_colname = source.metadata['conv_id']
+            conv_colname = source.metadata['conversation']
+            turn_num_col = source.metadata['turn_number']
+            tables = (
+                _nest_turns(pq.read_table(source.path / CONVERSATIONS_DIR / part['name'], memory_map=True),
+                            pq.read_table(source.path / TURNS_DIR / part['name'], memory_map=True),
+                            conv_id_colname, conv_colname, turn_num_col)
+                for part in source.partitions
+            )
+        else:
+            if conv_id_colname not in source.columns:
+                raise ValueError(f"Column '{conv_id_colname}' not found in DataFrame")
+            tables = [_to_arrow(source.sort_values(conv_id_colname, kind='stable'))]
+
+        files = []
+        index_parts = []
+        for file_number, table in enumerate(tables):
+            name = f"conversations-{file_number:05d}.{'arrow' if format == 'ipc' else 'parquet'}"
+            batches = table.to_batches(max_chunksize=batch_size)
+
+            if format == 'ipc':
+                with pa.OSFile(str(path / name), 'wb') as sink:
+                    with pa.ipc.new_file(sink, table.schema) as writer:
+                        for batch in batches:
+                            writer.write_batch(batch)
+            else:
+                pq.write_table(table, path / name, row_group_size=batch_size)
+
+            batch_lengths = [len(batch) for batch in batches]
+            batch_numbers = np.repeat(np.arange(len(batch_lengths), dtype=np.int32), batch_lengths)
+            offsets = np.concatenate([np.arange(n, dtype=np.int32) for n in batch_lengths]) \
+                if batch_lengths else np.array([], dtype=np.int32)
+            index_parts.append(pa.table({
+                'conv_id': pc.cast(table[conv_id_colname], pa.string()),
+                'file': pa.array(np.full(len(table), file_number, dtype=np.int32)),
+                'batch': pa.array(batch_numbers),
+                'offset': pa.array(offsets),
+            }))
+            files.append(name)
+
+        index = pa.concat_tables(index_parts) if index_parts else pa.table(
+            {'conv_id': pa.array([], pa.string()), 'file': pa.array([], pa.int32()),
+             'batch': pa.array([], pa.int32()), 'offset': pa.array([], pa.int32())})
+        pq.write_table(index.sort_by('conv_id'), path / INDEX_FILE)
+
+        metadata = {'format': format, 'files': files, 'conv_id': conv_id_colname, 'conversation': conv_colname}
+        (path / LOOKUP_FILE).write_text(json.dumps(metadata, indent=2), encoding='utf-8')
+        return cls(path)
+
+    # --- Reading ---
+
+    def _locate(self, conv_id: str) -> Optional[int]:
+        position = int(np.searchsorted(self._ids, str(conv_id)))
+        if position < len(self._ids) and self._ids[position] == str(conv_id):
+            return position
+        return None
+
+    def _reader(self, file_number: int) -> Any:
+        count('lookup.reader_cache_hits' if file_number in self._readers else 'lookup.reader_cache_misses')
+        if file_number not in self._readers:
+            file_path = str(self.path / self.files[file_number])
+            if self.format == 'ipc':
+                self._readers[file_number] = pa.ipc.open_file(pa.memory_map(file_path, 'r'))
+            else:
+                self._readers[file_number] = pq.ParquetFile(file_path, memory_map=True)
+        return self._readers[file_number]
+
+    def _read_row(self, position: int) -> Dict[str, Any]:
+        reader = self._reader(int(self._file[position]))
+        batch_number = int(self._batch[position])
+        if self.format == 'ipc':
+            batch = reader.get_batch(batch_number)
+        else:
+            batch = reader.read_row_group(batch_number)
+        return batch.slice(int(self._offset[position]), 1).to_pylist()[0]
+
+    @instrumented
+    def get(self, conv_id: str) -> Optional[pd.Series]:
+        """Return the row for conv_id as a Series, or None if it is not in the lookup."""
+        position = self._locate(conv_id)
+        if position is None:
+            return None
+        return pd.Series(self._read_row(position))
+
+    @instrumented
+    def rows(self, conv_ids: Iterable[str]) -> pd.DataFrame:
+        """Return the rows for the given conv_ids as a DataFrame, skipping unknown IDs."""
+        records = []
+        for conv_id in conv_ids:
+            position = self._locate(conv_id)
+            if position is not None:
+                records.append(self._read_row(position))
+        return pd.DataFrame.from_records(records) if records else pd.DataFrame(
+            columns=[self.metadata['conv_id'], self.metadata['conversation']])
+
+    def close(self) -> None:
+        """Release the memory maps held by cached readers."""
+        self._readers.clear()
@@ -0,0 +1,334 @@
+#chatlab/markers.py
+import logging
+import os
+import re
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Dict, List, Iterable, Tuple, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from .colnames import colnames
+from .decoding import normalize_conversations
+from .utils import as_arrow_strings
+from .profiling import instrumented, stage, count
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = ('redacted', 'toxic')
+_ASCII_WORD_CHAR = re.compile(r'[A-Za-z0-9_]')
+
+
+class Rule:
+    """
+    A named pattern that marks a turn as redacted (PII) or toxic.
+
+    Parameters:
+    -----------
+    name : str
+        Rule name, used in the default replacement text.
+    pattern : str
+        Regular expression in RE2 syntax (no lookarounds or backreferences),
+        as run by Arrow's string kernels.
+    category : str, default='redacted'
+        'redacted' or 'toxic': the turn flag set when the pattern matches.
+    replacement : str or None
+        Text matches are replaced with when redacting. Defaults to '[NAME]'.
+    """
+
+    def __init__(self, name: str, pattern: str, category: str = 'redacted', replacement: Optional[str] = None):
+        if category not in CATEGORIES:
+            raise ValueError(f"category must be one of {CATEGORIES}, got '{category}'")
+        try:
+            pc.match_substring_regex(pa.array(['']), pattern)
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Invalid pattern for rule '{name}': {e}") from None
+        self.name = name
+        self.pattern = pattern
+        self.category = category
+        self.replacement = f'[{name.upper()}]' if replacement is None else replacement
+
+    def __repr__(self) -> str:
+        return f"Rule('{self.name}', category='{self.category}')"
+
+
+def _whole_word(word: str) -> str:
+    """
+    The escaped word with \\b on the sides that begin or end with a word
+    character; RE2's \\b is ASCII-only, so 'C++' or non-ASCII words get no
+    boundary there and still match.
+    """
+    start = r'\b' if _ASCII_WORD_CHAR.match(word[0]) else ''
+    end = r'\b' if _ASCII_WORD_CHAR.match(word[-1]) else ''
+    return start + re.escape(word) + end
+
+
+def keyword_rule(name: str, words: Iterable[str], category: str = 'toxic',
+                 case_sensitive: bool = False, replacement: Optional[str] = None) -> Rule:
+    """
+    A rule matching any of the given words or phrases as whole words.
+
+    Meant for blocklists such as slur lists, which chatlab does not ship:
+    load them from a file and pass the resulting rule to scan_turns().
+    """
+    words = sorted({word.strip() for word in words if word and word.strip()}, key=len, reverse=True)
+    if not words:
+        raise ValueError(f"Keyword rule '{name}' has no words")
+    flags = '' if case_sensitive else '(?i)'
+    return Rule(name, flags + '(?:' + '|'.join(_whole_word(word) for word in words) + ')',
+                category=category, replacement=replacement)
+
+
+DEFAULT_RULES = [
+    Rule('email', r'[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}'),
+    # International numbers need a leading +; local ones need - or . separators,
+    # so space-separated lists of numbers are not mistaken for phone numbers
+    Rule('phone', r'\+\d{1,3}[ .-]?\(?\d{1,4}\)?(?:[ .-]?\d{2,4}){2,3}\b'
+                  r'|(?:\(\d{3}\)\s?|\b\d{3}[.-])\d{3}[.-]\d{4}\b'),
+    Rule('ip', r'\b(?:(?:25[0-5]|2[0-4]\d|1?\d?\d)\.){3}(?:25[0-5]|2[0-4]\d|1?\d?\d)\b'
+               r'|\b(?:[0-9A-Fa-f]{1,4}:){7}[0-9A-Fa-f]{1,4}\b'),
+    Rule('key', r'\b(?:sk-[A-Za-z0-9_-]{20,}|AKIA[0-9A-Z]{16}|gh[pousr]_[A-Za-z0-9]{36,}'
+                r'|xox[abprs]-[A-Za-z0-9-]{10,}|AIza[0-9A-Za-z_-]{35})'
+                r'|-----BEGIN [A-Z ]*PRIVATE KEY-----'),
+]
+
+
+def _combined_patterns(rules: List[Rule]) -> Dict[str, str]:
+    """One alternation per category, so each category costs a single kernel pass."""
+    combined = {}
+    for category in CATEGORIES:
+        patterns = [rule.pattern for rule in rules if rule.category == category]
+        if patterns:
+            combined[category] = '|'.join(f'(?:{pattern})' for pattern in patterns)
+    return combined
+
+
+def _scan_chunk(messages: pa.Array, rules: List[Rule],
+                redact: bool) -> Tuple[Dict[str, np.ndarray], Optional[pa.Array]]:
+    """Flags per category and, if redact, the redacted messages of one chunk. Runs in executor workers."""
+    messages = pc.fill_null(messages, '')
+    flags = {}
+    for category, pattern in _combined_patterns(rules).items():
+        flags[category] = pc.match_substring_regex(messages, pattern).to_numpy(zero_copy_only=False)
+
+    redacted = None
+    if redact and 'redacted' in flags and flags['redacted'].any():
+        mask = pa.array(flags['redacted'])
+        # Rewrite only the flagged messages, one rule at a time so each keeps its replacement
+        flagged = messages.filter(mask)
+        for rule in rules:
+            if rule.category == 'redacted':
+                flagged = pc.replace_substring_regex(flagged, rule.pattern, rule.replacement)
+        redacted = pc.replace_with_mask(messages, mask, flagged)
+    return flags, redacted
+
+
+@instrumented
+def scan_turns(turns_df: pd.DataFrame,
+               rules: Optional[List[Rule]] = None,
+               redact: bool = False,
+               keep_existing: bool = True,
+               message_colname: str = colnames['turn']['message'],
+               executor: Optional[Union[str, Executor]] = None,
+               max_workers: Optional[int] = None,
+               chunk_size: int = 100_000,
+               inplace: bool = False) -> pd.DataFrame:
+    """
+    Flag turns containing PII or toxic content with rule sets run in bulk.
+
+    The patterns of each category are combined into one regular expression
+    and run over a whole chunk of messages with Arrow's string kernels, so
+    the cost is one pass per category and chunk rather than one Python regex
+    call per turn and rule.
+
+    Parameters:
+    -----------
+    turns_df : pandas.DataFrame
+        Turn-level DataFrame (one row per turn), e.g. the result of unpack_turns.
+    rules : list of Rule, optional
+        Rules to run. Defaults to DEFAULT_RULES (emails, phone numbers, IP
+        addresses and API keys). Add keyword_rule(...) lists for toxicity.
+    redact : bool, default=False
+        Replace the matches of 'redacted' rules in the message column with
+        the rule's replacement text, e.g. for export.
+    keep_existing : bool, default=True
+        Keep flags already set in the data (e.g. from upstream moderation)
+        and only add new ones. If False, the flags are overwritten.
+    message_colname : str, default=content
+        The name of the column containing message text.
+    executor : None, 'thread', 'process' or concurrent.futures.Executor
+        Where chunks are scanned. None scans in the calling thread. Arrow's
+        regex kernels release the GIL, so threads already use several cores;
+        executors passed in are not shut down.
+    max_workers : int or None
+        Workers of the executor created for 'thread'/'process'. Defaults to the number of CPUs.
+    chunk_size : int, default=100000
+        Turns per task.
+    inplace : bool, default=False
+        If True, the columns are written to turns_df directly.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The DataFrame with boolean colnames['turn'] 'redacted' and 'toxic'
+        columns for every category that has rules, and redacted message text
+        if redact=True.
+
+    Examples:
+    ---------
+    >>> slurs = clb.keyword_rule('slur', open('slurs.txt').read().split('\\n'))
+    >>> turns = clb.scan_turns(turns, rules=clb.DEFAULT_RULES + [slurs], redact=True, executor='process')
+    >>> clb.summarize_markers(turns)
+    """
+    if message_colname not in turns_df.columns:
+        raise ValueError(f"Column '{message_colname}' not found in DataFrame")
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    rules = DEFAULT_RULES if rules is None else list(rules)
+    turn_cols = colnames['turn']
+    result = turns_df if inplace else turns_df.copy()
+
+    messages = as_arrow_strings(result[message_colname])
+    chunks = [messages.slice(start, chunk_size) for start in range(0, len(messages), chunk_size)]
+
+    n_workers = max_workers or os.cpu_count() or 1
+    owned_executor = None
+    if executor == 'thread':
+        executor = owned_executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='chatlab-scan')
+    elif executor == 'process':
+        executor = owned_executor = ProcessPoolExecutor(max_workers=n_workers)
+    elif executor is not None and not isinstance(executor, Executor):
+        raise ValueError(f"executor must be None, 'thread', 'process' or an Executor, got {executor!r}")
+
+    with stage('markers.scan'):
+        try:
+            if executor is None:
+                results = [_scan_chunk(chunk, rules, redact) for chunk in chunks]
+            else:
+                futures = [executor.submit(_scan_chunk, chunk, rules, redact) for chunk in chunks]
+                results = [future.result() for future in futures]
+        finally:
+            if owned_executor is not None:
+                owned_executor.shutdown()
+
+    for category in _combined_patterns(rules):
+        column = turn_cols[category]
+        flags = np.concatenate([flags[category] for flags, _ in results]) if results else np.zeros(0, dtype=bool)
+        if keep_existing and column in result.columns:
+            flags = flags | result[column].fillna(False).astype(bool).to_numpy()
+        result[column] = pd.Series(flags, index=result.index)
+        count(f'markers.{category}', int(flags.sum()))
+
+    if redact and any(redacted is not None for _, redacted in results):
+        texts = pa.chunked_array([chunk if redacted is None else redacted
+                                  for chunk, (_, redacted) in zip(chunks, results)], type=pa.string())
+        # Keep missing messages missing rather than turning them into ''
+        texts = pc.if_else(pc.is_null(messages), pa.scalar(None, pa.string()), texts)
+        values = texts.to_pandas().set_axis(result.index)
+        dtype = result[message_colname].dtype
+        result[message_colname] = values if isinstance(dtype, pd.CategoricalDtype) else values.astype(dtype)
+
+    logger.info("Scanned %d turns with %d rules", len(result), len(rules))
+    return result
+
+
+@instrumented
+def summarize_markers(turns_df: pd.DataFrame,
+                      conv_id_colname: str = colnames['turn']['conv_id']) -> pd.DataFrame:
+    """
+    Count flagged turns per conversation.
+
+    Parameters:
+    -----------
+    turns_df : pandas.DataFrame
+        Turn-level DataFrame that has been passed through scan_turns.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per conversation with the colnames['conv'] columns n_redacted
+        and n_toxic (for the flags present), ready to be merged onto the
+        conversation-level DataFrame.
+    """
+    turn_cols = colnames['turn']
+    conv_cols = colnames['conv']
+    frame = pd.DataFrame({conv_id_colname: turns_df[conv_id_colname]})
+    for category, count_key in (('redacted', 'n_redacted'), ('toxic', 'n_toxic')):
+        if turn_cols[category] in turns_df.columns:
+            frame[conv_cols[count_key]] = turns_df[turn_cols[category]].fillna(False).astype(bool).astype(int)
+    return frame.groupby(conv_id_colname, sort=False, observed=True).sum().reset_index()
+
+
+@instrumented
+def scan_conversations(df: pd.DataFrame,
+                       rules: Optional[List[Rule]] = None,
+                       redact: bool = False,
+                       keep_existing: bool = True,
+                       conv_colname: str = colnames['conv']['conversation'],
+                       inplace: bool = False,
+                       **kwargs) -> pd.DataFrame:
+    """
+    Scan the nested turns of a conversation-level DataFrame.
+
+    The turns are flattened, scanned with scan_turns() and written back: every
+    turn dict gets its 'redacted'/'toxic' flags (and redacted text, if
+    redact=True), so rendered pages show the PII and Toxic indicators, and
+    the conversation gets n_redacted/n_toxic counts. Turn dicts are copied,
+    never modified in place.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Conversation-level DataFrame with a nested conversation column.
+    rules, redact, keep_existing :
+        As for scan_turns.
+    conv_colname : str, default=conversation
+        The name of the nested conversation column.
+    inplace : bool, default=False
+        If True, df is modified directly.
+    **kwargs :
+        Passed to scan_turns (executor, max_workers, chunk_size).
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The DataFrame with scanned turns and n_redacted/n_toxic columns.
+    """
+    turn_cols = colnames['turn']
+    conv_cols = colnames['conv']
+    message_key = turn_cols['message']
+    if conv_colname not in df.columns:
+        raise ValueError(f"Column '{conv_colname}' not found in DataFrame")
+
+    result = df if inplace else df.copy()
+    if result[conv_colname].map(lambda value: isinstance(value, (str, bytes))).any():
+        result = normalize_conversations(result, column=conv_colname, inplace=True)
+
+    nested = [list(turns) if turns is not None and not isinstance(turns, float) else []
+              for turns in result[conv_colname]]
+    lengths = np.fromiter((len(turns) for turns in nested), dtype=np.int64, count=len(nested))
+    flat = [turn for turns in nested for turn in turns]
+    turns = pd.DataFrame({message_key: [turn.get(message_key) for turn in flat]})
+    for category in CATEGORIES:
+        if keep_existing:
+            turns[turn_cols[category]] = [bool(turn.get(turn_cols[category]) or False) for turn in flat]
+    turns = scan_turns(turns, rules=rules, redact=redact, keep_existing=keep_existing,
+                       message_colname=message_key, inplace=True, **kwargs)
+
+    categories = [category for category in CATEGORIES if turn_cols[category] in turns.columns]
+    columns = ([message_key] if redact else []) + [turn_cols[category] for category in categories]
+    updates = turns[columns].to_dict('records')
+    offsets = np.r_[0, np.cumsum(lengths)]
+    result[conv_colname] = [[{**turn, **update} for turn, update in zip(nested[i], updates[offsets[i]:offsets[i + 1]])]
+                            for i in range(len(nested))]
+
+    conv_index = np.repeat(np.arange(len(nested)), lengths)
+    for category in categories:
+        counts = np.bincount(conv_index, weights=turns[turn_cols[category]].to_numpy(dtype=float),
+                             minlength=len(nested)).astype(np.int64)
+        result[conv_cols['n_' + category]] = counts
+    return result
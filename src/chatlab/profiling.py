@@ -0,0 +1,169 @@
+#chatlab/profiling.py
+import contextlib
+import functools
+import threading
+import time
+from typing import Optional, Dict, Any, Callable
+
+# The stats object of the innermost active profile() block, or None when
+# instrumentation is disabled. Every hook checks this first, so the cost of
+# disabled instrumentation is a single global lookup.
+_ACTIVE: Optional['ProfileStats'] = None
+
+_NULL_STAGE = contextlib.nullcontext()
+
+
+class ProfileStats:
+    """
+    Timings and counters collected inside a profile() block.
+
+    Attributes:
+    -----------
+    stages : dict
+        Stage name -> {'seconds': total wall time, 'calls': number of entries}.
+        Stages may nest (e.g. 'render.markdown' inside 'visualize_conversation'),
+        so times are inclusive and do not add up to the total.
+    counters : dict
+        Counter name -> value, e.g. 'turns_rendered', 'bytes_written', 'cache_hits'.
+    total_seconds : float
+        Wall time of the whole profile() block.
+    cprofile : pstats.Stats or None
+        Function-level profile, if profile(cprofile=True) was used.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.total_seconds: float = 0.0
+        self.cprofile = None
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.stages.get(name)
+            if entry is None:
+                self.stages[name] = {'seconds': seconds, 'calls': 1}
+            else:
+                entry['seconds'] += seconds
+                entry['calls'] += 1
+
+    def add_count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'total_seconds': self.total_seconds,
+                'stages': {k: dict(v) for k, v in self.stages.items()},
+                'counters': dict(self.counters)}
+
+    def summary(self) -> str:
+        """Human-readable table of stages (slowest first) and counters."""
+        lines = [f"Total: {self.total_seconds * 1000:.1f} ms"]
+        for name, entry in sorted(self.stages.items(), key=lambda item: -item[1]['seconds']):
+            lines.append(f"  {name:<40} {entry['seconds'] * 1000:>10.2f} ms  {int(entry['calls']):>8} calls")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<40} {value:>10}")
+        return '\n'.join(lines)
+
+    def __repr__(self) -> str:
+        return self.summary()
+
+
+class _Stage:
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats: ProfileStats, name: str):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name: str):
+    """
+    Context manager timing a named stage while profiling is active.
+
+    Returns a shared no-op context manager when profiling is disabled.
+    """
+    stats = _ACTIVE
+    if stats is None:
+        return _NULL_STAGE
+    return _Stage(stats, name)
+
+
+def count(name: str, n: int = 1) -> None:
+    """Increment a named counter while profiling is active."""
+    stats = _ACTIVE
+    if stats is not None:
+        stats.add_count(name, n)
+
+
+def instrumented(func: Callable) -> Callable:
+    """Decorator that reports each call of a public function as a stage named after it."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = _ACTIVE
+        if stats is None:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.add_time(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+@contextlib.contextmanager
+def profile(cprofile: bool = False):
+    """
+    Collect chatlab timings and counters for the code run inside the block.
+
+    Parameters:
+    -----------
+    cprofile : bool, default=False
+        Also run the standard library cProfile and attach the resulting
+        pstats.Stats object as stats.cprofile.
+
+    Yields:
+    -------
+    ProfileStats
+        Filled in while the block runs; complete once it exits.
+
+    Examples:
+    ---------
+    >>> with clb.profile() as stats:
+    ...     clb.visualize_conversation(df, conv_ids, display=False, save=True)
+    >>> print(stats.summary())
+    >>> stats.counters['turns_rendered']
+    """
+    global _ACTIVE
+    previous = _ACTIVE
+    stats = ProfileStats()
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    _ACTIVE = stats
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield stats
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        stats.total_seconds = time.perf_counter() - start
+        _ACTIVE = previous
+        if profiler is not None:
+            import pstats
+            stats.cprofile = pstats.Stats(profiler)
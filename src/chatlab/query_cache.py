@@ -0,0 +1,318 @@
+#chatlab/query_cache.py
+import hashlib
+import logging
+import threading
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any, Union, Iterable, Callable, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from .store import ConversationStore
+from .engines import is_polars, to_arrow
+from .profiling import count
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAXSIZE = 128
+# Queries whose results also go to the on-disk tier, if one is configured
+DISK_KINDS = ('search_text_matches',)
+
+
+class _QueryCache:
+    """In-memory LRU of query results with an optional Parquet tier on disk."""
+
+    def __init__(self, maxsize: int, disk_path: Optional[Path]):
+        self.maxsize = maxsize
+        self.disk_path = disk_path
+        self.entries: 'OrderedDict[Tuple, pd.DataFrame]' = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if disk_path is not None:
+            disk_path.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: Tuple) -> Optional[pd.DataFrame]:
+        with self.lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                count('query_cache.hits')
+            return result
+
+    def load(self, disk_key: Tuple) -> Optional[pd.DataFrame]:
+        """The result stored on disk under disk_key, or None."""
+        path = self._disk_file(disk_key)
+        if not path.exists():
+            return None
+        try:
+            result = pd.read_parquet(path)
+        except Exception as e:
+            logger.warning("Ignoring unreadable query cache file %s: %s", path, e)
+            return None
+        self.disk_hits += 1
+        count('query_cache.disk_hits')
+        return result
+
+    def miss(self) -> None:
+        with self.lock:
+            self.misses += 1
+        count('query_cache.misses')
+
+    def save(self, disk_key: Tuple, result: pd.DataFrame) -> None:
+        path = self._disk_file(disk_key)
+        tmp_path = path.with_suffix('.tmp')
+        try:
+            result.to_parquet(tmp_path, index=False)
+            tmp_path.replace(path)
+        except Exception as e:
+            logger.warning("Could not write query cache file %s: %s", path, e)
+
+    def put(self, key: Tuple, result: pd.DataFrame) -> None:
+        with self.lock:
+            self.entries[key] = result
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def _disk_file(self, key: Tuple) -> Path:
+        return self.disk_path / (hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).hexdigest() + '.parquet')
+
+
+# The active cache, or None while caching is disabled (the default)
+_CACHE: Optional[_QueryCache] = None
+
+# id(df) -> version token set by bump_version, dropped when the frame is collected
+_VERSIONS: Dict[int, int] = {}
+# ids of the frames with a finalizer dropping their cache entries
+_TRACKED = set()
+# (id(df), version, columns) -> content digest, so a frame is hashed once per version
+_DIGESTS: Dict[Tuple, str] = {}
+
+
+def enable_query_cache(maxsize: int = DEFAULT_MAXSIZE, disk_path: Optional[Union[str, Path]] = None) -> None:
+    """
+    Cache the matches of filter_subset and search_text_matches.
+
+    In memory, results are keyed by the query arguments, the frame's id()
+    and version token (see bump_version) and its shape, columns and dtypes;
+    values are not looked at, so call bump_version after modifying a frame in
+    place. A frame's entries are dropped when it is garbage collected. The
+    disk tier is keyed by a hash of the queried columns instead, computed once
+    per frame and version. Stores are identified by their path and partition
+    listing.
+
+    Parameters:
+    -----------
+    maxsize : int, default=128
+        Query results kept in memory, least recently used dropped first.
+    disk_path : str or Path, optional
+        Directory for a second tier holding search_text_matches results as
+        Parquet files, so expensive text searches survive restarts.
+
+    Examples:
+    ---------
+    >>> clb.enable_query_cache(maxsize=256, disk_path='.chatlab_cache')
+    >>> clb.search_text_matches(turns, 'python', return_all=True)   # computed
+    >>> clb.search_text_matches(turns, 'python', return_all=True)   # from the cache
+    """
+    global _CACHE
+    if maxsize < 1:
+        raise ValueError("maxsize must be at least 1")
+    _CACHE = _QueryCache(maxsize, None if disk_path is None else Path(disk_path))
+
+
+def disable_query_cache() -> None:
+    """Stop caching and drop the in-memory results. Files on disk are kept."""
+    global _CACHE
+    _CACHE = None
+
+
+def clear_query_cache(disk: bool = False) -> None:
+    """Drop the in-memory results, and the files of the disk tier if disk=True."""
+    if _CACHE is None:
+        return
+    with _CACHE.lock:
+        _CACHE.entries.clear()
+    if disk and _CACHE.disk_path is not None:
+        for path in _CACHE.disk_path.glob('*.parquet'):
+            path.unlink()
+
+
+def query_cache_info() -> Optional[Dict[str, Any]]:
+    """Hits, misses and size of the active cache, or None if caching is disabled."""
+    if _CACHE is None:
+        return None
+    return {'hits': _CACHE.hits, 'disk_hits': _CACHE.disk_hits, 'misses': _CACHE.misses,
+            'size': len(_CACHE.entries), 'maxsize': _CACHE.maxsize,
+            'disk_path': None if _CACHE.disk_path is None else str(_CACHE.disk_path)}
+
+
+def bump_version(df: pd.DataFrame) -> int:
+    """
+    Mark a frame as changed, so cached results computed from it are not reused.
+
+    Cached results are found by the frame's id(), so in-place edits (e.g.
+    df.loc[...] = ...) are only seen after this is called. Returns the new token.
+    """
+    key, version = _identity(df)
+    if key is None:
+        return version
+    _VERSIONS[key] = version + 1
+    _drop_digests(key)
+    return _VERSIONS[key]
+
+
+def _hash_column(values: pd.Series) -> np.ndarray:
+    """uint64 hash of every row of a column."""
+    try:
+        hashes = pd.util.hash_pandas_object(values, index=False)
+    except TypeError:
+        # Unhashable cells (lists, dicts) are hashed by their text
+        hashes = pd.util.hash_pandas_object(values.astype(str), index=False)
+    return hashes.to_numpy()
+
+
+def _content_digest(frame: pd.DataFrame, columns: Iterable[str]) -> str:
+    """Digest of every row of the given columns, in order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for column in columns:
+        digest.update(repr((column, str(frame[column].dtype))).encode('utf-8'))
+        digest.update(_hash_column(frame[column]).tobytes())
+    return digest.hexdigest()
+
+
+def _signature(df: Any) -> Tuple:
+    """Shape, column names and dtypes of a frame; path and partition listing of a store."""
+    if isinstance(df, ConversationStore):
+        return ('store', str(df.path.resolve()),
+                tuple((p['name'], p['n_conversations'], p['n_turns']) for p in df.partitions))
+    if isinstance(df, pa.Table):
+        return ('arrow', df.num_rows, tuple(df.column_names), tuple(str(t) for t in df.schema.types))
+    if is_polars(df):
+        return ('polars', df.height, tuple(df.columns), tuple(str(t) for t in df.dtypes))
+    return ('frame', len(df), tuple(df.columns), tuple(str(dtype) for dtype in df.dtypes))
+
+
+def fingerprint(df: Union[pd.DataFrame, ConversationStore], columns: Optional[Iterable[str]] = None) -> Tuple:
+    """
+    Identity of the data a query runs on, by content.
+
+    The signature of the frame (shape, columns, dtypes) and a hash of every
+    row of the given columns (all columns if None), so two frames only share
+    a fingerprint if the queried data is the same. This reads all the queried
+    data, so it is only used for the disk tier. Stores are identified by their
+    path and partition listing.
+    """
+    signature = _signature(df)
+    if isinstance(df, ConversationStore):
+        return signature
+    if isinstance(df, pa.Table) or is_polars(df):
+        table = to_arrow(df)
+        names = [c for c in dict.fromkeys(columns or table.column_names) if c in table.column_names]
+        return signature + (_content_digest(table.select(names).to_pandas(), names),)
+    names = [c for c in dict.fromkeys(df.columns if columns is None else columns) if c in df.columns]
+    return signature + (_content_digest(df, names),)
+
+
+def _content_key(df: Any, identity: Tuple, columns: Tuple[str, ...]) -> Tuple:
+    """fingerprint(df, columns), computed once per frame and version."""
+    if isinstance(df, ConversationStore) or identity[0] is None:
+        return fingerprint(df, columns)
+    key = (*identity, columns)
+    content = _DIGESTS.get(key)
+    if content is None:
+        content = _DIGESTS[key] = fingerprint(df, columns)
+    return content
+
+
+def _identity(df: Any) -> Tuple:
+    """
+    id() and version token of a frame, part of the in-memory keys.
+
+    The cache entries of a frame are dropped when it is garbage collected, so
+    a new frame reusing its id never sees them.
+    """
+    key = id(df)
+    if key not in _TRACKED:
+        try:
+            weakref.finalize(df, _forget, key)
+        except TypeError:
+            # Not weak-referenceable: keyed by content only
+            return None, 0
+        _TRACKED.add(key)
+    return key, _VERSIONS.get(key, 0)
+
+
+def _drop_digests(key: int) -> None:
+    for digest_key in [digest_key for digest_key in list(_DIGESTS) if digest_key[0] == key]:
+        _DIGESTS.pop(digest_key, None)
+
+
+def _forget(key: int) -> None:
+    _TRACKED.discard(key)
+    _VERSIONS.pop(key, None)
+    _drop_digests(key)
+    cache = _CACHE
+    if cache is not None:
+        with cache.lock:
+            for entry in [entry for entry in cache.entries if entry[1] == key]:
+                del cache.entries[entry]
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = [_freeze(v) for v in value]
+        return (type(value).__name__, tuple(sorted(items, key=repr) if isinstance(value, (set, frozenset)) else items))
+    if isinstance(value, dict):
+        return ('dict', tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def cached_query(kind: str, df: Union[pd.DataFrame, ConversationStore], columns: Iterable[str],
+                 params: Dict[str, Any], compute: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    """
+    compute(), or its cached result for the same kind, data and params.
+
+    Runs compute() directly while caching is disabled. Callers must not
+    modify the returned frame.
+    """
+    cache = _CACHE
+    if cache is None or (is_polars(df) and type(df).__name__ == 'LazyFrame'):
+        # Lazy frames are queries, not data: fingerprinting would run them
+        return compute()
+    params = tuple(sorted((k, _freeze(v)) for k, v in params.items()))
+    columns = tuple(dict.fromkeys(columns))
+    identity = ('store', 0) if isinstance(df, ConversationStore) else _identity(df)
+    # In memory: the frame object, its version and its signature; values are not hashed
+    if identity[0] is None:
+        # Not weak-referenceable, so an id() could be reused: keyed by content
+        key = (kind, None, 0, fingerprint(df, columns), params)
+    else:
+        key = (kind, identity[0], identity[1], _signature(df), params)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    # On disk: the content of the queried columns, hashed once per frame version
+    disk_key = None
+    if kind in DISK_KINDS and cache.disk_path is not None:
+        disk_key = (kind, _content_key(df, identity, columns), params)
+        result = cache.load(disk_key)
+        if result is not None:
+            cache.put(key, result)
+            return result
+
+    cache.miss()
+    result = compute()
+    cache.put(key, result)
+    if disk_key is not None:
+        cache.save(disk_key, result)
+    return result
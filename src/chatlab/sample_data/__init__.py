@@ -1,26 +1,197 @@
 # chatlab/sample_data/__init__.py
-import pandas as pd
 from pathlib import Path
+from typing import Optional, List, Dict, Any, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from ..colnames import colnames
+from ..profiling import instrumented, count
+
+SAMPLE_FILE = Path(__file__).parent / "samples" / "sample_data.parquet"
+
+
+def _freeze(value: Any) -> Any:
+    """Make list/tuple filter specs hashable so they can key the cache."""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+# Cached reads keyed by (columns, filters); the sample file is small and static
+_FRAME_CACHE: Dict[Any, pd.DataFrame] = {}
+_TABLE_CACHE: Dict[Any, pa.Table] = {}
+
 
+def clear_sample_cache() -> None:
+    """Drop all cached sample data."""
+    _FRAME_CACHE.clear()
+    _TABLE_CACHE.clear()
 
-def load_sample_data():
+
+@instrumented
+def load_sample_data(columns: Optional[List[str]] = None,
+                     filters: Optional[List[Any]] = None,
+                     as_arrow: bool = False,
+                     copy: bool = True) -> Union[pd.DataFrame, pa.Table]:
     """
     Load the sample conversation data for demonstration purposes.
 
+    The parquet file is read once per (columns, filters) combination and cached
+    for the rest of the session.
+
+    Parameters:
+    -----------
+    columns : list of str, optional
+        Only read these columns. Reads all columns if None.
+    filters : list of tuples, optional
+        Row filters pushed down to the parquet reader, in pd.read_parquet form,
+        e.g. [('source', '==', 'wc'), ('turns', '>=', 5)].
+    as_arrow : bool, default=False
+        If True, return the pyarrow.Table instead of a DataFrame. Arrow tables
+        are immutable, so the cached table is returned as-is.
+    copy : bool, default=True
+        If True, return a copy of the cached DataFrame that is safe to modify,
+        including the nested turns. If False, return the cached DataFrame itself, which must be treated as
+        read-only (changes would be visible to every later call).
+
     Returns:
     --------
-    pd.DataFrame
+    pd.DataFrame or pa.Table
         DataFrame containing sample conversation data
 
     Examples:
     ---------
     >>> import chatlab as clb
-    >>> df = clb.sample_data.load_sample_data()
+    >>> df = clb.sample_data()
     >>> clb.visualize_conversation(df, df['conv_id'].iloc[0])
+    >>> wc = clb.sample_data(columns=['conv_id', 'turns'], filters=[('source', '==', 'wc')])
     """
-    # Get the path to the sample data file
-    sample_dir = Path(__file__).parent
-    sample_file = sample_dir / "samples" / "sample_data.parquet"
+    key = (_freeze(columns), _freeze(filters))
+
+    cache = _TABLE_CACHE if as_arrow else _FRAME_CACHE
+    count('sample_data.cache_hits' if key in cache else 'sample_data.cache_misses')
+
+    if as_arrow:
+        return _sample_table(key, columns, filters)
+
+    if key not in _FRAME_CACHE:
+        _FRAME_CACHE[key] = pd.read_parquet(SAMPLE_FILE, columns=columns, filters=filters)
+    df = _FRAME_CACHE[key]
+    if not copy:
+        return df
+    df = df.copy()
+    # df.copy() shares the objects of object columns (the nested turn dicts);
+    # rebuild those columns from the immutable Arrow table instead
+    nested = [name for name in df.columns if df[name].dtype == object]
+    if nested:
+        fresh = _sample_table(key, columns, filters).select(nested).to_pandas()
+        for name in nested:
+            df[name] = fresh[name].to_numpy()
+    return df
+
+
+def _sample_table(key: Any, columns: Optional[List[str]], filters: Optional[List[Any]]) -> pa.Table:
+    if key not in _TABLE_CACHE:
+        _TABLE_CACHE[key] = pq.read_table(SAMPLE_FILE, columns=columns, filters=filters, memory_map=True)
+    return _TABLE_CACHE[key]
+
+
+@instrumented
+def make_synthetic_data(n_conversations: Optional[int] = None,
+                        n_turns: Optional[int] = None,
+                        n_users: Optional[int] = None,
+                        start: str = '2023-04-01',
+                        days: int = 365,
+                        seed: int = 0) -> pd.DataFrame:
+    """
+    Generate a synthetic corpus of arbitrary size with the sample data schema.
+
+    Conversations are resampled from the bundled sample and given new conv_ids,
+    user_ids and start times, so text statistics stay realistic while the
+    corpus size is free. Intended to drive benchmarks.
+
+    Parameters:
+    -----------
+    n_conversations : int, optional
+        Number of conversations to generate.
+    n_turns : int, optional
+        Generate conversations until their turns add up to at least this number.
+        Exactly one of n_conversations and n_turns must be given.
+    n_users : int, optional
+        Size of the user pool. Defaults to a third of the conversations.
+        Users are drawn with a skewed (Zipf-like) distribution.
+    start : str, default='2023-04-01'
+        Earliest conversation start date.
+    days : int, default=365
+        Conversation start times are spread uniformly over this many days.
+    seed : int, default=0
+        Random seed, for reproducible corpora.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Conversation-level DataFrame with the same columns and dtypes as the
+        sample data, including a nested conversation column.
+    """
+    if (n_conversations is None) == (n_turns is None):
+        raise ValueError("Specify exactly one of n_conversations and n_turns")
+
+    conv_cols = colnames['conv']
+    turn_cols = colnames['turn']
+    conv_id_col = conv_cols['conv_id']
+    conv_col = conv_cols['conversation']
+
+    sample = load_sample_data(copy=False)
+    rng = np.random.default_rng(seed)
+
+    if n_turns is not None:
+        # Draw with some headroom, then cut at the first prefix reaching n_turns
+        turns = sample[conv_cols['turns']].to_numpy()
+        estimate = int(np.ceil(n_turns / turns.mean() * 1.2)) + 10
+        idx = rng.integers(0, len(sample), estimate)
+        while turns[idx].sum() < n_turns:
+            idx = np.concatenate([idx, rng.integers(0, len(sample), estimate)])
+        idx = idx[:int(np.searchsorted(np.cumsum(turns[idx]), n_turns)) + 1]
+    else:
+        idx = rng.integers(0, len(sample), n_conversations)
+
+    df = sample.iloc[idx].reset_index(drop=True)
+    n = len(df)
+
+    # New identifiers, keeping the source prefix
+    numbers = pd.Series(np.arange(n)).astype(str).str.zfill(9)
+    df[conv_id_col] = df[conv_cols['source']].astype(str) + '_syn' + numbers
+
+    n_users = n_users or max(1, n // 3)
+    user_numbers = np.minimum(rng.zipf(1.5, n) - 1, n_users - 1)
+    df[conv_cols['user_id']] = 'syn_usr_' + pd.Series(user_numbers).astype(str).str.zfill(9)
+    if conv_cols['user_freq'] in df.columns:
+        df[conv_cols['user_freq']] = df.groupby(conv_cols['user_id'])[conv_id_col].transform('size').astype(
+            sample[conv_cols['user_freq']].dtype)
+
+    # Move each conversation to a new start time, preserving its duration
+    start_col, end_col = conv_cols['start'], conv_cols['end']
+    offsets = pd.to_timedelta(rng.integers(0, days * 86400, n), unit='s')
+    new_start = pd.Series(pd.Timestamp(start, tz='UTC') + offsets, index=df.index)
+    shift = (new_start - df[start_col]).fillna(pd.Timedelta(0))
+    df[start_col] = new_start.astype(df[start_col].dtype)
+    df[end_col] = (df[end_col] + shift).astype(df[end_col].dtype)
+
+    # Rewrite the nested turns so they link to the new conv_id and times
+    timestamp_key = turn_cols['timestamp']
+    conv_id_key = turn_cols['conv_id']
+    nested = []
+    for conv_id, offset, turns in zip(df[conv_id_col], shift.dt.to_pytimedelta(), df[conv_col]):
+        nested.append(np.array([
+            {**t, conv_id_key: conv_id,
+             timestamp_key: t[timestamp_key] + offset if t.get(timestamp_key) is not None else None}
+            for t in turns
+        ], dtype=object))
+    df[conv_col] = nested
 
-    # Load and return the parquet file
-    return pd.read_parquet(sample_file)
\ No newline at end of file
+    return df
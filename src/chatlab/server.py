@@ -0,0 +1,383 @@
+#chatlab/server.py
+import asyncio
+import hashlib
+import html
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+
+import numpy as np
+import pandas as pd
+
+from .colnames import colnames
+from .store import ConversationStore, METADATA_FILE
+from .lookup import ConversationLookup, LOOKUP_FILE
+from .profiling import stage, count
+
+logger = logging.getLogger(__name__)
+
+THEMES = ('light', 'dark')
+MODES = ('base_html', 'annotation')
+INDEX_PAGE_SIZE = 500
+MAX_REQUEST_LINE = 8192
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def load_corpus(path: Union[str, Path]) -> Union[pd.DataFrame, ConversationStore, ConversationLookup]:
+    """
+    Open a corpus for serving: a ConversationLookup or ConversationStore
+    directory, or a .parquet, .json/.jsonl or .pkl file of conversations.
+    'sample' loads the bundled sample data.
+    """
+    if str(path) == 'sample':
+        from .sample_data import load_sample_data
+        return load_sample_data(copy=False)
+    path = Path(path)
+    if path.is_dir():
+        if (path / LOOKUP_FILE).exists():
+            return ConversationLookup(path)
+        if (path / METADATA_FILE).exists():
+            return ConversationStore(path)
+        raise ValueError(f"{path} is neither a conversation lookup nor a conversation store")
+    suffix = path.suffix.lower()
+    if suffix == '.parquet':
+        return pd.read_parquet(path)
+    if suffix in ('.json', '.jsonl'):
+        return pd.read_json(path, orient='records', lines=(suffix == '.jsonl'))
+    if suffix in ('.pkl', '.pickle'):
+        return pd.read_pickle(path)
+    raise ValueError(f"Unsupported corpus file '{path}'. Use .parquet, .json, .jsonl or .pkl")
+
+
+class ConversationServer:
+    """
+    Renders conversation pages on request instead of exporting them up front.
+
+    The corpus is indexed by conv_id once; of stores and lookups only the IDs
+    are read up front, and a conversation's rows are read when its page is
+    rendered. A page (one theme and mode) is rendered the first time it is
+    requested (in a worker thread, so cached pages keep being served
+    meanwhile) and kept in an LRU cache of `cache_size` pages. Responses
+    carry an ETag derived from the page's key, so browsers revalidating a page
+    get a 304 without it being rendered again.
+
+    Routes:
+    -------
+    /                           Index of conversations (?q= filters by conv_id, ?page=N)
+    /c/<conv_id>                A conversation (?theme=light|dark, ?mode=base_html|annotation)
+
+    Examples:
+    ---------
+    >>> server = ConversationServer(clb.open_store('corpus_store'))
+    >>> server.serve(port=8000)
+    """
+
+    def __init__(self,
+                 source: Union[pd.DataFrame, ConversationStore, ConversationLookup],
+                 theme: str = 'light',
+                 save_mode: str = 'base_html',
+                 cache_size: int = 256,
+                 custom_css_path: Optional[Union[str, Path]] = None,
+                 user_avatar_svg: Optional[str] = None,
+                 assistant_avatar_svg: Optional[str] = None,
+                 virtualize_turns: Optional[int] = None,
+                 max_workers: Optional[int] = None):
+        self.conv_id_col = colnames['conv']['conv_id']
+        self.theme = theme if theme in THEMES else 'light'
+        self.save_mode = save_mode if save_mode in MODES else 'base_html'
+        self.cache_size = cache_size
+        self.custom_css_path = custom_css_path
+        self.user_avatar_svg = user_avatar_svg
+        self.assistant_avatar_svg = assistant_avatar_svg
+        self.virtualize_turns = virtualize_turns
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+
+        with stage('serve.load'):
+            self._lookup = self._store = self.df = None
+            if isinstance(source, ConversationLookup):
+                # Already indexed on disk; rows are read per request
+                self._lookup = source
+                ids = np.asarray(source._ids)
+            elif isinstance(source, ConversationStore):
+                # Only the IDs are read up front; rows are read per request
+                self._store = source
+                ids = source.read_conversations(columns=[self.conv_id_col])[self.conv_id_col].astype(str).to_numpy()
+            else:
+                self.df = source
+                ids = source[self.conv_id_col].astype(str).to_numpy()
+            # conv_id -> row position of its first row
+            first = ~pd.Series(ids).duplicated().to_numpy()
+            self.conv_ids = ids[first]
+            self._positions = pd.Series(np.flatnonzero(first), index=self.conv_ids)
+        logger.info("Loaded %d conversations", len(self.conv_ids))
+
+        # Pages are immutable while the server runs; the token changes across restarts
+        self._etag_token = f"{os.getpid()}-{time.time_ns()}"
+        self._cache: 'OrderedDict[Tuple[str, str, str], bytes]' = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Future] = {}
+        self._read_lock = threading.Lock()
+        self._executor = None
+
+    # --- Rendering ---
+
+    def _rows(self, conv_id: str) -> Optional[pd.DataFrame]:
+        if conv_id not in self._positions.index:
+            return None
+        if self._lookup is not None:
+            with self._read_lock:  # Lookup readers are shared
+                return self._lookup.rows([conv_id])
+        if self._store is not None:
+            return self._store.conversation_rows([conv_id]).iloc[:1]
+        position = int(self._positions[conv_id])
+        return self.df.iloc[position:position + 1]
+
+    def render(self, conv_id: str, theme: str, mode: str) -> Optional[bytes]:
+        """Render one mode of a conversation's page; None if it is unknown or fails."""
+        from .visualization import _process_single_conversation
+
+        rows = self._rows(conv_id)
+        if rows is None:
+            return None
+        result = _process_single_conversation(
+            df=rows,
+            conv_id=conv_id,
+            theme=theme,
+            custom_css_path=self.custom_css_path,
+            save_mode=mode,
+            user_avatar_svg=self.user_avatar_svg,
+            assistant_avatar_svg=self.assistant_avatar_svg,
+            virtualize_turns=self.virtualize_turns
+        )
+        if result is None:
+            return None
+        count('conversations_rendered')
+        return result['annotation_html' if mode == 'annotation' else 'base_html'].encode('utf-8')
+
+    def etag(self, conv_id: str, theme: str, mode: str) -> str:
+        key = f"{self._etag_token}:{conv_id}:{theme}:{mode}".encode('utf-8')
+        return '"' + hashlib.sha1(key).hexdigest()[:20] + '"'
+
+    async def page(self, conv_id: str, theme: str, mode: str) -> Optional[bytes]:
+        """Return a page from the cache, rendering it (once, however many requests wait) if needed."""
+        key = (conv_id, theme, mode)
+        page = self._cache.get(key)
+        if page is not None:
+            self._cache.move_to_end(key)
+            count('cache_hits')
+            return page
+
+        count('cache_misses')
+        future = self._inflight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, self.render, conv_id, theme, mode)
+            self._inflight[key] = future
+            try:
+                page = await future
+            finally:
+                del self._inflight[key]
+            if page is not None:
+                self._cache[key] = page
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            page = await asyncio.shield(future)
+        return page
+
+    def index_page(self, query: str = '', page: int = 0) -> bytes:
+        ids = self.conv_ids
+        if query:
+            ids = ids[pd.Series(ids).str.contains(query, case=False, regex=False).to_numpy()]
+        n_pages = max(1, -(-len(ids) // INDEX_PAGE_SIZE))
+        page = min(max(page, 0), n_pages - 1)
+        shown = ids[page * INDEX_PAGE_SIZE:(page + 1) * INDEX_PAGE_SIZE]
+
+        def link(cid: str) -> str:
+            href = f"/c/{quote(cid, safe='')}"
+            return (f'<li><a href="{href}">{html.escape(cid)}</a> '
+                    f'<a class="alt" href="{href}?mode=annotation">annotate</a> '
+                    f'<a class="alt" href="{href}?theme=dark">dark</a></li>')
+
+        nav = []
+        q = f"&q={quote(query)}" if query else ''
+        if page > 0:
+            nav.append(f'<a href="/?page={page - 1}{q}">&laquo; previous</a>')
+        if page < n_pages - 1:
+            nav.append(f'<a href="/?page={page + 1}{q}">next &raquo;</a>')
+        body = '\n'.join(link(cid) for cid in shown)
+        return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>chatlab: {len(self.conv_ids)} conversations</title>
+    <style>
+    body {{ font-family: sans-serif; margin: 2em; }}
+    li {{ margin: 2px 0; font-family: monospace; }}
+    a.alt {{ font-size: 0.8em; color: #888; margin-left: 0.5em; }}
+    nav a {{ margin-right: 1em; }}
+    </style>
+</head>
+<body>
+    <form method="get" action="/"><input name="q" value="{html.escape(query)}" placeholder="Filter by conv_id"></form>
+    <p>{len(ids)} conversations, page {page + 1} of {n_pages}</p>
+    <ul>
+{body}
+    </ul>
+    <nav>{' '.join(nav)}</nav>
+</body>
+</html>'''.encode('utf-8')
+
+    # --- HTTP ---
+
+    async def handle_request(self, method: str, target: str,
+                             headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        """Map a request to (status, headers, body)."""
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        html_type = {'Content-Type': 'text/html; charset=utf-8'}
+
+        if url.path == '/':
+            try:
+                page_number = int(params.get('page', 0))
+            except ValueError:
+                return 400, html_type, b'Invalid page number'
+            return 200, html_type, self.index_page(params.get('q', ''), page_number)
+
+        if url.path.startswith('/c/'):
+            conv_id = unquote(url.path[3:])
+            theme = params.get('theme', self.theme)
+            mode = params.get('mode', self.save_mode)
+            if theme not in THEMES or mode not in MODES:
+                return 400, html_type, f"theme must be one of {THEMES} and mode one of {MODES}".encode('utf-8')
+            if conv_id not in self._positions.index:
+                return 404, html_type, f"Unknown conversation {html.escape(conv_id)}".encode('utf-8')
+
+            etag = self.etag(conv_id, theme, mode)
+            # Revalidation: no-cache makes browsers ask every time; the answer needs no rendering
+            cache_headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+                count('not_modified')
+                return 304, cache_headers, b''
+            with stage('serve.page'):
+                page = await self.page(conv_id, theme, mode)
+            if page is None:
+                return 500, html_type, f"Could not render {html.escape(conv_id)}".encode('utf-8')
+            return 200, {**html_type, **cache_headers}, page
+
+        return 404, html_type, b'Not found'
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                if len(request_line) > MAX_REQUEST_LINE:
+                    await self._respond(writer, 400, {}, b'', False, False)
+                    break
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    await self._respond(writer, 400, {}, b'', False, False)
+                    break
+                method, target, version = parts
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = (connection != 'close') if version == 'HTTP/1.1' else (connection == 'keep-alive')
+                try:
+                    status, response_headers, body = await self.handle_request(method, target, headers)
+                except Exception:
+                    logger.exception("Error handling %s %s", method, target)
+                    status, response_headers, body = 500, {}, b''
+                logger.debug("%s %s -> %d", method, target, status)
+                await self._respond(writer, status, response_headers, body, method == 'HEAD', keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, headers: Dict[str, str], body: bytes,
+                       head_only: bool, keep_alive: bool) -> None:
+        lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+                 f"Content-Length: {len(body) if status != 304 else 0}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if body and not head_only and status != 304:
+            writer.write(body)
+        await writer.drain()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 8000) -> asyncio.AbstractServer:
+        """Start listening on the running event loop and return the asyncio server."""
+        from concurrent.futures import ThreadPoolExecutor
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='chatlab-serve')
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        address = server.sockets[0].getsockname()
+        logger.info("Serving %d conversations at http://%s:%d/", len(self.conv_ids), address[0], address[1])
+        return server
+
+    async def serve_forever(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        server = await self.start(host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def serve(self, host: str = '127.0.0.1', port: int = 8000) -> None:
+        """Serve until interrupted (Ctrl+C)."""
+        try:
+            asyncio.run(self.serve_forever(host, port))
+        except KeyboardInterrupt:
+            logger.info("Server stopped")
+
+
+def serve(source: Union[str, Path, pd.DataFrame, ConversationStore, ConversationLookup],
+          host: str = '127.0.0.1',
+          port: int = 8000,
+          theme: str = 'light',
+          save_mode: str = 'base_html',
+          cache_size: int = 256,
+          **kwargs) -> None:
+    """
+    Serve conversations over HTTP, rendering each page when it is first opened.
+
+    Parameters:
+    -----------
+    source : str, Path, DataFrame, ConversationStore or ConversationLookup
+        The corpus, or a path to one (see load_corpus).
+    host, port :
+        Address to listen on. The default only accepts local connections.
+    theme : str
+        Default theme; pages also accept ?theme=light|dark.
+    save_mode : str
+        Default mode; pages also accept ?mode=base_html|annotation.
+    cache_size : int, default=256
+        Rendered pages kept in memory.
+    **kwargs :
+        Passed to ConversationServer (custom_css_path, avatars, virtualize_turns, max_workers).
+    """
+    if isinstance(source, (str, Path)):
+        source = load_corpus(source)
+    ConversationServer(source, theme=theme, save_mode=save_mode, cache_size=cache_size, **kwargs).serve(host, port)
@@ -0,0 +1,375 @@
+#chatlab/store.py
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Optional, Union, List, Dict, Any, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+from .colnames import colnames
+from .utils import parse_range
+from .profiling import instrumented, count
+
+STORE_VERSION = 1
+METADATA_FILE = '_store.json'
+CONVERSATIONS_DIR = 'conversations'
+TURNS_DIR = 'turns'
+
+
+def _to_arrow(frame: pd.DataFrame) -> pa.Table:
+    """Convert a DataFrame to Arrow, stringifying object columns Arrow cannot type."""
+    try:
+        return pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        frame = frame.copy()
+        for col in frame.columns:
+            if frame[col].dtype != object:
+                continue
+            try:
+                pa.array(frame[col], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+                frame[col] = frame[col].map(lambda v: None if v is None else str(v))
+        return pa.Table.from_pandas(frame, preserve_index=False)
+
+
+def _explode_turns(df: pd.DataFrame, conv_id_colname: str, conv_colname: str,
+                   turn_num_colname: str) -> pd.DataFrame:
+    """Unpack the nested conversation column, keeping the parent conv_id on every turn."""
+    nested = df[[conv_id_colname, conv_colname]].explode(conv_colname)
+    nested = nested[nested[conv_colname].notna()].reset_index(drop=True)
+    if nested.empty:
+        return pd.DataFrame(columns=[conv_id_colname, turn_num_colname])
+
+    turns = pd.json_normalize(nested[conv_colname].tolist())
+    turns[conv_id_colname] = nested[conv_id_colname].to_numpy()
+    if turn_num_colname not in turns.columns:
+        turns[turn_num_colname] = turns.groupby(conv_id_colname, sort=False).cumcount() + 1
+    return turns
+
+
+def kwargs_to_expression(schema: pa.Schema, **kwargs) -> Optional[ds.Expression]:
+    """
+    Translate filter_subset-style keyword filters into an Arrow dataset expression.
+
+    Follows the same rules as utils.apply_filters: numeric columns take an exact
+    value or a (min, max) range, other columns take a single value or a list.
+    Keys that are not columns of the schema are ignored.
+    """
+    expression = None
+    for key, value in kwargs.items():
+        if key not in schema.names:
+            continue
+
+        field = ds.field(key)
+        arrow_type = schema.field(key).type
+        if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type):
+            min_val, max_val = parse_range(value)
+            if min_val is not None and max_val is not None and min_val == max_val:
+                condition = field == min_val
+            else:
+                condition = None
+                if min_val is not None:
+                    condition = field >= min_val
+                if max_val is not None:
+                    upper = field <= max_val
+                    condition = upper if condition is None else condition & upper
+                if condition is None:
+                    continue
+        elif isinstance(value, list):
+            condition = field.isin(value)
+        else:
+            condition = field == value
+
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+class ConversationStore:
+    """
+    On-disk columnar store holding a corpus as two linked Parquet tables.
+
+    Layout:
+    -------
+    <path>/_store.json                 store metadata and partition listing
+    <path>/conversations/part-*.parquet  one row per conversation (no nested turns)
+    <path>/turns/part-*.parquet          one row per turn, linked by conv_id
+
+    Each partition covers a contiguous, sorted range of conv_ids in both tables,
+    so row-group statistics on conv_id let scans skip everything that is not
+    needed. Files are read through memory maps.
+
+    Examples:
+    ---------
+    >>> store = ConversationStore.create(df, 'corpus_store')
+    >>> store = open_store('corpus_store')
+    >>> clb.filter_subset(store, source='wc', turns=(5, None))
+    >>> clb.visualize_conversation(store, 'wc_2757233')
+    """
+
+    def __init__(self, path: Union[str, Path], memory_map: bool = True):
+        self.path = Path(path)
+        metadata_path = self.path / METADATA_FILE
+        if not metadata_path.exists():
+            raise FileNotFoundError(f"No chatlab store found at {self.path}")
+
+        self.metadata = json.loads(metadata_path.read_text(encoding='utf-8'))
+        if self.metadata.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported store version: {self.metadata.get('version')}")
+
+        self.memory_map = memory_map
+        self._filesystem = pafs.LocalFileSystem(use_mmap=memory_map)
+        self._datasets: Dict[str, ds.Dataset] = {}
+
+    def __repr__(self) -> str:
+        return (f"ConversationStore('{self.path}', conversations={self.n_conversations}, "
+                f"turns={self.n_turns}, partitions={len(self.partitions)})")
+
+    # --- Creation ---
+
+    @classmethod
+    @instrumented
+    def create(cls,
+               df: pd.DataFrame,
+               path: Union[str, Path],
+               overwrite: bool = False,
+               rows_per_partition: int = 1_000_000,
+               row_group_size: int = 65_536,
+               conv_id_colname: str = colnames['conv']['conv_id'],
+               conv_colname: str = colnames['conv']['conversation'],
+               turn_num_colname: str = colnames['turn']['turn_number']) -> 'ConversationStore':
+        """
+        Write a conversation-level DataFrame to a new store and return its handle.
+
+        Parameters:
+        -----------
+        df : pandas.DataFrame
+            Conversation-level DataFrame with a nested conversation column.
+        path : str or Path
+            Directory of the store. Must not exist unless overwrite=True.
+        overwrite : bool, default=False
+            Whether to replace an existing store at path.
+        rows_per_partition : int, default=1_000_000
+            Maximum number of conversations per partition file.
+        row_group_size : int, default=65_536
+            Maximum number of rows per Parquet row group.
+        """
+        path = Path(path)
+        if path.exists():
+            if not overwrite:
+                raise FileExistsError(f"Store already exists at {path}. Use overwrite=True to replace it.")
+            shutil.rmtree(path)
+
+        (path / CONVERSATIONS_DIR).mkdir(parents=True)
+        (path / TURNS_DIR).mkdir(parents=True)
+        metadata = {
+            'version': STORE_VERSION,
+            'conv_id': conv_id_colname,
+            'conversation': conv_colname,
+            'turn_number': turn_num_colname,
+            'row_group_size': row_group_size,
+            'rows_per_partition': rows_per_partition,
+            'partitions': [],
+        }
+        (path / METADATA_FILE).write_text(json.dumps(metadata, indent=2), encoding='utf-8')
+
+        store = cls(path)
+        store.append(df)
+        return store
+
+    @instrumented
+    def append(self, df: pd.DataFrame) -> List[str]:
+        """
+        Add conversations to the store as new sorted partitions.
+
+        Returns the names of the partition files written.
+        """
+        conv_id_col = self.metadata['conv_id']
+        conv_col = self.metadata['conversation']
+        turn_num_col = self.metadata['turn_number']
+
+        if conv_id_col not in df.columns:
+            raise ValueError(f"Column '{conv_id_col}' not found in DataFrame")
+        if df.empty:
+            return []
+
+        conversations = df.sort_values(conv_id_col, kind='stable').reset_index(drop=True)
+        rows_per_partition = self.metadata['rows_per_partition']
+        written = []
+
+        for start in range(0, len(conversations), rows_per_partition):
+            chunk = conversations.iloc[start:start + rows_per_partition]
+            written.append(self._write_partition(chunk, conv_id_col, conv_col, turn_num_col))
+
+        self._save_metadata()
+        return written
+
+    def _write_partition(self, chunk: pd.DataFrame, conv_id_col: str, conv_col: str,
+                         turn_num_col: str, name: Optional[str] = None) -> str:
+        if name is None:
+            name = self._next_partition_name()
+        row_group_size = self.metadata['row_group_size']
+
+        if conv_col in chunk.columns:
+            turns = _explode_turns(chunk, conv_id_col, conv_col, turn_num_col)
+            turns = turns.sort_values([conv_id_col, turn_num_col], kind='stable')
+            conv_table = _to_arrow(chunk.drop(columns=[conv_col]))
+        else:
+            turns = pd.DataFrame(columns=[conv_id_col, turn_num_col])
+            conv_table = _to_arrow(chunk)
+
+        pq.write_table(conv_table, self.path / CONVERSATIONS_DIR / name,
+                       row_group_size=row_group_size, write_statistics=True)
+        pq.write_table(_to_arrow(turns), self.path / TURNS_DIR / name,
+                       row_group_size=row_group_size, write_statistics=True)
+
+        self.metadata['partitions'] = [p for p in self.partitions if p['name'] != name]
+        self.metadata['partitions'].append({
+            'name': name,
+            'min_conv_id': str(chunk[conv_id_col].iloc[0]),
+            'max_conv_id': str(chunk[conv_id_col].iloc[-1]),
+            'n_conversations': int(len(chunk)),
+            'n_turns': int(len(turns)),
+        })
+        self._datasets.clear()
+        return name
+
+    def _next_partition_name(self) -> str:
+        # Numbered after the highest existing partition, so names stay unique
+        # when partitions have been removed
+        numbers = [int(p['name'][5:10]) for p in self.partitions
+                   if p['name'].startswith('part-') and p['name'][5:10].isdigit()]
+        return f"part-{max(numbers, default=-1) + 1:05d}.parquet"
+
+    @instrumented
+    def remove_partitions(self, names: Iterable[str]) -> List[str]:
+        """
+        Delete partitions (in both tables) from the store.
+
+        Returns the names of the partitions that were removed; unknown names are ignored.
+        """
+        names = set(names)
+        removed = [p['name'] for p in self.partitions if p['name'] in names]
+        if not removed:
+            return []
+        self.metadata['partitions'] = [p for p in self.partitions if p['name'] not in names]
+        self._save_metadata()
+        for name in removed:
+            for table in (CONVERSATIONS_DIR, TURNS_DIR):
+                (self.path / table / name).unlink(missing_ok=True)
+        self._datasets.clear()
+        return removed
+
+    def _save_metadata(self) -> None:
+        tmp_path = self.path / (METADATA_FILE + '.tmp')
+        tmp_path.write_text(json.dumps(self.metadata, indent=2), encoding='utf-8')
+        os.replace(tmp_path, self.path / METADATA_FILE)
+
+    # --- Introspection ---
+
+    @property
+    def partitions(self) -> List[Dict[str, Any]]:
+        return self.metadata['partitions']
+
+    @property
+    def n_conversations(self) -> int:
+        return sum(p['n_conversations'] for p in self.partitions)
+
+    @property
+    def n_turns(self) -> int:
+        return sum(p['n_turns'] for p in self.partitions)
+
+    def dataset(self, table: str = CONVERSATIONS_DIR) -> ds.Dataset:
+        """Return the memory-mapped Arrow dataset for 'conversations' or 'turns'."""
+        if table not in (CONVERSATIONS_DIR, TURNS_DIR):
+            raise ValueError(f"table must be '{CONVERSATIONS_DIR}' or '{TURNS_DIR}'")
+        if table not in self._datasets:
+            files = [str(self.path / table / p['name']) for p in self.partitions]
+            self._datasets[table] = ds.dataset(files, format='parquet', filesystem=self._filesystem)
+        return self._datasets[table]
+
+    def columns(self, table: str = CONVERSATIONS_DIR) -> List[str]:
+        """Column names of the conversations or turns table."""
+        return self.dataset(table).schema.names
+
+    # --- Reading ---
+
+    def _scan(self, table: str, columns: Optional[List[str]], filters: Any) -> pa.Table:
+        if not self.partitions:
+            return pa.table({})
+        dataset = self.dataset(table)
+        if columns is not None:
+            columns = [c for c in dict.fromkeys(columns) if c in dataset.schema.names]
+        if filters is not None and not isinstance(filters, ds.Expression):
+            filters = pq.filters_to_expression(filters)
+        result = dataset.to_table(columns=columns, filter=filters)
+        count(f'store.{table}_rows_read', result.num_rows)
+        return result
+
+    @instrumented
+    def read_conversations(self, columns: Optional[List[str]] = None, filters: Any = None,
+                           as_arrow: bool = False) -> Union[pd.DataFrame, pa.Table]:
+        """
+        Read the conversation-level table.
+
+        Parameters:
+        -----------
+        columns : list of str, optional
+            Columns to read. Unknown names are ignored. Reads all columns if None.
+        filters : pyarrow.dataset.Expression or list of tuples, optional
+            Row filter pushed down to the Parquet scan, in either Arrow expression
+            or pd.read_parquet (DNF) form.
+        as_arrow : bool, default=False
+            Return a pyarrow.Table instead of a pandas DataFrame.
+        """
+        table = self._scan(CONVERSATIONS_DIR, columns, filters)
+        return table if as_arrow else table.to_pandas()
+
+    @instrumented
+    def read_turns(self, columns: Optional[List[str]] = None, filters: Any = None,
+                   as_arrow: bool = False) -> Union[pd.DataFrame, pa.Table]:
+        """Read the turn-level table. Takes the same arguments as read_conversations."""
+        table = self._scan(TURNS_DIR, columns, filters)
+        return table if as_arrow else table.to_pandas()
+
+    @instrumented
+    def conversation_rows(self, conv_ids: Iterable[str], columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read the given conversations with their nested conversation column rebuilt.
+
+        Only the row groups whose conv_id range contains a requested ID are read,
+        in both the conversations and the turns table.
+        """
+        conv_id_col = self.metadata['conv_id']
+        conv_col = self.metadata['conversation']
+        turn_num_col = self.metadata['turn_number']
+
+        conv_ids = [str(cid) for cid in conv_ids]
+        id_filter = ds.field(conv_id_col).isin(conv_ids)
+
+        if columns is not None:
+            columns = [conv_id_col] + [c for c in columns if c != conv_col]
+        rows = self.read_conversations(columns=columns, filters=id_filter)
+        turns = self.read_turns(filters=id_filter)
+
+        nested = {cid: [] for cid in rows[conv_id_col]}
+        if not turns.empty:
+            turns = turns.sort_values([conv_id_col, turn_num_col], kind='stable')
+            for record in turns.to_dict('records'):
+                nested.setdefault(record[conv_id_col], []).append(record)
+        rows[conv_col] = [nested.get(cid, []) for cid in rows[conv_id_col]]
+        return rows
+
+
+def write_store(df: pd.DataFrame, path: Union[str, Path], **kwargs) -> ConversationStore:
+    """Write df to a new ConversationStore at path. See ConversationStore.create."""
+    return ConversationStore.create(df, path, **kwargs)
+
+
+def open_store(path: Union[str, Path], memory_map: bool = True) -> ConversationStore:
+    """Open an existing ConversationStore."""
+    return ConversationStore(path, memory_map=memory_map)
@@ -1,13 +1,25 @@
 import pandas as pd
+import pyarrow as pa
+import logging
 import random
 import re
 import warnings
-from typing import Union, List, Tuple
+from typing import Optional, Union, List, Tuple
 from .utils import apply_filters
 from .colnames import colnames
+from .store import ConversationStore, TURNS_DIR, kwargs_to_expression
+from .engines import resolve_engine, column_names, to_arrow, match_mask
+from .query_cache import cached_query
+from .profiling import instrumented
+from .log_utils import VerboseLogger
 
+logger = logging.getLogger(__name__)
+# For the messages of verbose=True calls
+verbose_logger = VerboseLogger(logger)
 
-def search_text_matches(df: pd.DataFrame,
+
+@instrumented
+def search_text_matches(df: Union[pd.DataFrame, ConversationStore],
                         text: str,
                         case_sensitive: bool = True,
                         regex: bool = False,
@@ -16,14 +28,17 @@ def search_text_matches(df: pd.DataFrame,
                         message_colname: str = colnames['turn']['message'],
                         turn_num_colname: str = colnames['turn']['turn_number'],
                         verbose=True,
+                        backend: Optional[str] = None,
                         **kwargs) -> Union[List[str], Tuple[str, List[int]], None]:
     """
     Search for text matches in a DataFrame's 'message' column and apply additional filters.
 
     Parameters:
     -----------
-    df : pandas.DataFrame
+    df : pandas.DataFrame, ConversationStore, pyarrow.Table or polars DataFrame/LazyFrame
         DataFrame containing conversation data with at least 'message', 'conv_id', and 'turn_num' columns.
+        If a ConversationStore is given, the search runs on its turns table, reading only
+        the required columns and pushing the kwargs filters down to the Parquet scan.
     text : str
         The text to search for in the 'message' column. If regex=True, this is treated as a regular expression pattern.
         To match text at specific positions, use regex=True with:
@@ -42,7 +57,14 @@ def search_text_matches(df: pd.DataFrame,
     message_colname : str
         The name of the column containing message text.
     verbose : bool, default=True
-        Whether to print information about the number of matching messages and conversations.
+        Whether to log (at INFO level) the number of matching messages and conversations.
+        The message is shown on stderr even if logging is not configured.
+    backend : str, optional
+        The engine to run on: 'pandas', 'arrow' or 'polars' (see set_engine).
+        Defaults to the engine of the input type for Arrow and Polars input,
+        else the active engine.
+        Patterns the arrow (RE2) or polars regex engine cannot run, such as
+        lookarounds, are run with pandas.
     **kwargs : dict
         Additional keyword arguments for filtering. If a key matches a column name in df,
         filtering is applied using the same logic as in filter_subset:
@@ -50,6 +72,7 @@ def search_text_matches(df: pd.DataFrame,
           e.g., role='user' to filter for user messages only
         - Numerical columns: exact value or range tuple
         A warning will be issued for kwargs that don't match column names.
+        Names of the parameters above (e.g. 'backend') cannot be used as filters.
 
     Returns:
     --------
@@ -71,42 +94,71 @@ def search_text_matches(df: pd.DataFrame,
     # Find all conversations with "help" in messages and at least 5 turns
     search_text_matches(df, "help", return_all=True, turns=(5, None))
     """
+    is_store = isinstance(df, ConversationStore)
+    available = df.dataset(TURNS_DIR).schema.names if is_store else column_names(df)
+
     # Verify required columns exist
     required_columns = [conv_id_colname, message_colname, turn_num_colname]
-    if not all(column in df.columns for column in required_columns):
+    if not all(column in available for column in required_columns):
         raise ValueError(f"DataFrame is missing one or more required columns: {required_columns}")
 
-    # Start with a copy of the DataFrame
-    filtered_df = df.copy()
-
-    # Prepare the pattern based on regex flag
-    pattern = text if regex else re.escape(text)
-
-    # Apply text search to message column
-    filtered_df = filtered_df[filtered_df[message_colname].str.contains(
-        pattern, case=case_sensitive, regex=True, na=False)]
-
-    # Apply additional filters from kwargs (with warning for non-existent columns)
+    # Warn about filters on non-existent columns, which are ignored
     filtered_kwargs = {}
     for key, value in kwargs.items():
-        if key not in df.columns:
+        if key not in available:
             warnings.warn(f"Column '{key}' not found in DataFrame. This filter will be ignored.")
         else:
             filtered_kwargs[key] = value
 
-    # Apply remaining filters
-    if filtered_kwargs:
-        filtered_df = apply_filters(filtered_df, **filtered_kwargs)
+    # Prepare the pattern based on regex flag
+    pattern = text if regex else re.escape(text)
+
+    def matching_turns() -> pd.DataFrame:
+        data = df
+        # Read only the needed columns and row groups from a store
+        if is_store:
+            filter_expression = kwargs_to_expression(data.dataset(TURNS_DIR).schema, **filtered_kwargs)
+            data = data.read_turns(columns=[conv_id_colname, message_colname, turn_num_colname, *filtered_kwargs],
+                                   filters=filter_expression, as_arrow=resolve_engine(data, backend) != 'pandas')
+
+        if isinstance(data, pd.DataFrame) and resolve_engine(data, backend) == 'pandas':
+            # Apply text search to message column
+            filtered_df = data[data[message_colname].str.contains(
+                pattern, case=case_sensitive, regex=True, na=False)]
+
+            # Apply remaining filters
+            if filtered_kwargs:
+                filtered_df = apply_filters(filtered_df, **filtered_kwargs)
+            return filtered_df[[conv_id_colname, turn_num_colname]].reset_index(drop=True)
+
+        # Other engines: filter first, then run the string kernel on the remaining rows
+        if not isinstance(data, pd.DataFrame):
+            data = to_arrow(data, list(dict.fromkeys([conv_id_colname, message_colname, turn_num_colname,
+                                                      *filtered_kwargs])))
+        if filtered_kwargs:
+            data = apply_filters(data, backend=backend, **filtered_kwargs)
+        mask = match_mask(data, message_colname, pattern, case_sensitive=case_sensitive, backend=backend)
+        if isinstance(data, pd.DataFrame):
+            return data.loc[mask, [conv_id_colname, turn_num_colname]].reset_index(drop=True)
+        return data.select([conv_id_colname, turn_num_colname]).filter(pa.array(mask)).to_pandas()
+
+    # Reused across calls with the same data and arguments if the query cache is enabled
+    filtered_df = cached_query('search_text_matches', df,
+                               [conv_id_colname, message_colname, turn_num_colname, *filtered_kwargs],
+                               {'pattern': pattern, 'case_sensitive': case_sensitive,
+                                'columns': (conv_id_colname, message_colname, turn_num_colname),
+                                'filters': filtered_kwargs},
+                               matching_turns)
 
     # Check if we have any matches
     if filtered_df.empty:
         return None
 
-    # Print the number of matching rows and conversations
+    # Report the number of matching rows and conversations
     unique_convs = filtered_df[conv_id_colname].unique()
 
     if verbose:
-        print(f'Found {len(filtered_df)} matching messages in {len(unique_convs)} conversations')
+        verbose_logger.info('Found %d matching messages in %d conversations', len(filtered_df), len(unique_convs))
 
     # Return based on return_all flag
     if return_all:
@@ -0,0 +1,218 @@
+#chatlab/timeseries.py
+import logging
+from typing import Optional, Union, List, Iterable, Any
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from .colnames import colnames
+from .utils import apply_filters
+from .store import ConversationStore, kwargs_to_expression
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+PERIOD_COLNAME = 'period'
+COUNT_COLNAME = 'n_conversations'
+
+
+def _as_list(columns: Optional[Union[str, Iterable[str]]]) -> List[str]:
+    if columns is None:
+        return []
+    return [columns] if isinstance(columns, str) else list(columns)
+
+
+def _is_fixed(freq: str) -> bool:
+    """Whether freq has a fixed length ('h', 'D', '15min') rather than a calendar one ('W', 'M')."""
+    try:
+        return isinstance(pd.tseries.frequencies.to_offset(freq), pd.offsets.Tick)
+    except ValueError:
+        # Period-only aliases such as 'M', 'Q' and 'Y'
+        return False
+
+
+def _bin_times(times: pd.Series, freq: str) -> pd.Series:
+    """
+    The period each timestamp falls in.
+
+    Fixed-length frequencies ('h', '15min', ...) are floored to timestamps;
+    calendar frequencies ('D', 'W', 'M', 'Q', 'Y') become Periods, in local
+    wall time for time zone aware columns. Periods are grouped as they are
+    and only the distinct ones are turned into timestamps, by _period_starts.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(times.dtype):
+        times = pd.to_datetime(times, utc=True, errors='coerce')
+    if _is_fixed(freq):
+        return times.dt.floor(freq)
+    tz = getattr(times.dtype, 'tz', None)
+    local = times.dt.tz_localize(None) if tz is not None else times
+    return local.dt.to_period(freq)
+
+
+def _period_starts(bins: pd.Series, times: pd.Series) -> pd.Series:
+    """Start timestamps of binned periods, in the time zone of the original times."""
+    if not isinstance(bins.dtype, pd.PeriodDtype):
+        return bins
+    starts = bins.dt.start_time
+    tz = getattr(times.dtype, 'tz', None)
+    if tz is None and not pd.api.types.is_datetime64_any_dtype(times.dtype):
+        tz = 'UTC'
+    return starts.dt.tz_localize(tz) if tz is not None else starts
+
+
+def _time_bound(value: Any, arrow_type: pa.DataType) -> pa.Scalar:
+    """since/until as an Arrow scalar comparable with a timestamp column."""
+    ts = pd.Timestamp(value)
+    if arrow_type.tz is not None:
+        ts = ts.tz_localize(arrow_type.tz) if ts.tzinfo is None else ts.tz_convert(arrow_type.tz)
+    elif ts.tzinfo is not None:
+        ts = ts.tz_convert('UTC').tz_localize(None)
+    return pa.scalar(ts.to_pydatetime(), type=arrow_type)
+
+
+def _time_expression(schema: pa.Schema, time_colname: str, since: Any, until: Any) -> Optional[ds.Expression]:
+    """since/until as an Arrow expression, or None if the column is not stored as timestamps."""
+    if time_colname not in schema.names or not pa.types.is_timestamp(schema.field(time_colname).type):
+        return None
+    arrow_type = schema.field(time_colname).type
+    field = ds.field(time_colname)
+    expression = None
+    if since is not None:
+        expression = field >= _time_bound(since, arrow_type)
+    if until is not None:
+        upper = field < _time_bound(until, arrow_type)
+        expression = upper if expression is None else expression & upper
+    return expression
+
+
+def _compare_bound(times: pd.Series, value: Any) -> pd.Timestamp:
+    """since/until as a Timestamp in the time zone of times."""
+    ts = pd.Timestamp(value)
+    tz = getattr(times.dtype, 'tz', None)
+    if tz is not None:
+        return ts.tz_localize(tz) if ts.tzinfo is None else ts.tz_convert(tz)
+    return ts.tz_convert('UTC').tz_localize(None) if ts.tzinfo is not None else ts
+
+
+def _fill_gaps(result: pd.DataFrame, freq: str, by: List[str], sums: List[str]) -> pd.DataFrame:
+    """Add zero rows for every period between the first and last one, for every group."""
+    periods = result[PERIOD_COLNAME]
+    tz = getattr(periods.dtype, 'tz', None)
+    if _is_fixed(freq):
+        all_periods = pd.date_range(periods.min(), periods.max(), freq=freq)
+    else:
+        local = periods.dt.tz_localize(None) if tz is not None else periods
+        all_periods = pd.period_range(local.min(), local.max(), freq=freq).start_time
+        if tz is not None:
+            all_periods = all_periods.tz_localize(tz)
+    grid = pd.DataFrame({PERIOD_COLNAME: all_periods})
+    if by:
+        grid = grid.merge(result[by].drop_duplicates(), how='cross')
+    filled = grid.merge(result, on=[PERIOD_COLNAME, *by], how='left')
+    filled[[COUNT_COLNAME, *sums]] = filled[[COUNT_COLNAME, *sums]].fillna(0)
+    filled[COUNT_COLNAME] = filled[COUNT_COLNAME].astype('int64')
+    for col in sums:
+        filled[col] = filled[col].astype(result[col].dtype)
+    return filled
+
+
+@instrumented
+def time_series(df: Union[pd.DataFrame, ConversationStore],
+                freq: str = 'D',
+                by: Optional[Union[str, Iterable[str]]] = None,
+                sums: Optional[Union[str, Iterable[str]]] = None,
+                time_colname: str = colnames['conv']['start'],
+                since: Any = None,
+                until: Any = None,
+                fill_gaps: bool = False,
+                **kwargs) -> pd.DataFrame:
+    """
+    Count conversations (and sum numeric columns) per time period and group.
+
+    The time column is binned and all groups are aggregated in a single
+    groupby, instead of one filter_subset call per period and group.
+    Conversations without a timestamp are left out.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or ConversationStore
+        Conversation-level data. If a ConversationStore is given, only the time,
+        group, sum and filter columns are read, and the filters and the
+        since/until range are pushed down to the Parquet scan.
+    freq : str, default='D'
+        Period length: a fixed frequency such as 'h', '6h' or '15min', or a
+        calendar frequency 'D', 'W' (weeks ending Sunday), 'M', 'Q' or 'Y'.
+    by : str or list of str, optional
+        Conversation-level columns to group by, e.g. ['model', 'source', 'language'].
+    sums : str or list of str, optional
+        Numeric columns to sum per period and group, e.g. ['turns', 'n_words'].
+    time_colname : str, default=colnames['conv']['start']
+        The time column to bin, e.g. colnames['conv']['end'].
+    since, until : str or Timestamp, optional
+        Only count conversations with since <= time < until. Naive bounds are
+        taken to be in the time zone of the column.
+    fill_gaps : bool, default=False
+        Add rows with zero counts for periods without conversations, for every
+        group, so each group has one row per period from the first to the last.
+    **kwargs : dict
+        Filters applied before aggregating, as for filter_subset.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per period and group (tidy), sorted by period: a 'period'
+        column with the period start, the by columns, 'n_conversations' and
+        one column per summed column.
+
+    Examples:
+    ---------
+    >>> daily = clb.time_series(df, freq='D', by=['model', 'source'], sums=['turns', 'n_words'])
+    >>> weekly = clb.time_series(store, freq='W', by='language', source='wc', since='2024-01-01')
+    >>> weekly.pivot(index='period', columns='language', values='n_conversations')
+    """
+    by = _as_list(by)
+    sums = _as_list(sums)
+    columns = list(dict.fromkeys([time_colname, *by, *sums, *kwargs]))
+
+    if isinstance(df, ConversationStore):
+        schema = df.dataset().schema
+        filter_expression = kwargs_to_expression(schema, **kwargs)
+        time_expression = _time_expression(schema, time_colname, since, until)
+        if time_expression is not None:
+            filter_expression = time_expression if filter_expression is None else filter_expression & time_expression
+        df = df.read_conversations(columns=columns, filters=filter_expression)
+
+    missing = [col for col in [time_colname, *by, *sums] if col not in df.columns]
+    if missing:
+        raise KeyError(f"Columns not found: {missing}")
+
+    frame = df[[col for col in columns if col in df.columns]]
+    if kwargs:
+        frame = apply_filters(frame, **kwargs)
+
+    periods = _bin_times(frame[time_colname], freq)
+    mask = periods.notna()
+    if since is not None or until is not None:
+        times = frame[time_colname]
+        if not pd.api.types.is_datetime64_any_dtype(times.dtype):
+            times = pd.to_datetime(times, utc=True, errors='coerce')
+        if since is not None:
+            mask &= times >= _compare_bound(times, since)
+        if until is not None:
+            mask &= times < _compare_bound(times, until)
+    count('time_series.rows', int(mask.sum()))
+
+    keys = [periods[mask].rename(PERIOD_COLNAME), *(frame.loc[mask, col] for col in by)]
+    grouped = frame.loc[mask, sums].groupby(keys, observed=True, dropna=False, sort=True)
+    sizes = grouped.size().astype('int64')
+    result = grouped.sum() if sums else pd.DataFrame(index=sizes.index)
+    result.insert(0, COUNT_COLNAME, sizes)
+    result = result.reset_index()
+    result[PERIOD_COLNAME] = _period_starts(result[PERIOD_COLNAME], frame[time_colname])
+
+    if fill_gaps and len(result):
+        result = _fill_gaps(result, freq, by, sums)
+        result = result.sort_values([PERIOD_COLNAME, *by], kind='stable').reset_index(drop=True)
+    logger.info('%d periods, %d rows', result[PERIOD_COLNAME].nunique(), len(result))
+    return result
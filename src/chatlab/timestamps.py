@@ -0,0 +1,241 @@
+#chatlab/timestamps.py
+import logging
+import warnings
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .colnames import colnames
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+# Formats tried, in order, when inferring the format of a timestamp column.
+# 'ISO8601' is parsed with datetime.fromisoformat / pd.to_datetime(format='ISO8601').
+TIMESTAMP_FORMATS = ('ISO8601', '%Y-%m-%d %H:%M:%S', '%H:%M:%S')
+
+# Column name -> format that parsed the last value seen in it
+_COLUMN_FORMATS: Dict[str, str] = {}
+
+
+def _parse_with_format(text: str, fmt: str) -> datetime:
+    if fmt == 'ISO8601':
+        return datetime.fromisoformat(text.replace('Z', '+00:00'))
+    return datetime.strptime(text, fmt)
+
+
+def _matching_format(text: str) -> Optional[str]:
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            _parse_with_format(text, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+
+def infer_timestamp_format(values: Iterable[Any], sample_size: int = 20) -> Optional[str]:
+    """
+    Infer the format of timestamp strings from a sample of values.
+
+    Parameters:
+    -----------
+    values : iterable
+        Timestamp strings; None/NaN values and datetime objects are skipped.
+    sample_size : int, default=20
+        Number of strings to check.
+
+    Returns:
+    --------
+    str or None
+        The first entry of TIMESTAMP_FORMATS that parses every sampled string,
+        or None if there are no strings or no single format fits.
+    """
+    sample = []
+    for value in values:
+        if isinstance(value, str):
+            sample.append(value)
+            if len(sample) == sample_size:
+                break
+    if not sample:
+        return None
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            for text in sample:
+                _parse_with_format(text, fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+
+def parse_timestamp(value: Any, column: str) -> Optional[datetime]:
+    """
+    Parse one timestamp, reusing the format last seen in the same column.
+
+    datetime objects (including pd.Timestamp) are returned as they are. Only
+    when the remembered format fails are the other formats tried.
+
+    Returns:
+    --------
+    datetime or None
+        None for missing values. Raises ValueError if no format matches.
+    """
+    if isinstance(value, datetime):
+        return None if value is pd.NaT else value
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+
+    text = str(value)
+    fmt = _COLUMN_FORMATS.get(column)
+    if fmt is not None:
+        try:
+            return _parse_with_format(text, fmt)
+        except ValueError:
+            pass
+    count('timestamps.format_inferred')
+    fmt = _matching_format(text)
+    if fmt is None:
+        raise ValueError(f"No known timestamp format matches '{text}'")
+    _COLUMN_FORMATS[column] = fmt
+    return _parse_with_format(text, fmt)
+
+
+def _parse_one(text: str) -> Optional[datetime]:
+    try:
+        return parse_timestamp(text, '_bulk')
+    except ValueError:
+        return None
+
+
+def _parse_strings(strings: List[str], fmt: Optional[str]) -> List[Optional[datetime]]:
+    """
+    Parse strings in bulk with one format; per value if that is not possible.
+
+    Strings the bulk format does not fit are retried one by one with all the
+    known formats, so a column mixing formats parses as it does per value.
+    """
+    if fmt is not None:
+        with warnings.catch_warnings():
+            # Mixed UTC offsets give an object result (and a FutureWarning); handled below
+            warnings.simplefilter('ignore')
+            try:
+                parsed = pd.to_datetime(pd.Series(strings, dtype=object), format=fmt, errors='coerce')
+            except (ValueError, TypeError):
+                parsed = None
+        if parsed is not None and pd.api.types.is_datetime64_any_dtype(parsed.dtype):
+            result = parsed.tolist()
+            failed = np.flatnonzero(parsed.isna().to_numpy())
+            for i in failed:
+                result[i] = _parse_one(strings[i])
+            count('timestamps.bulk_retried', len(failed))
+            return result
+
+    return [_parse_one(text) for text in strings]
+
+
+@instrumented
+def parse_timestamps(values: Union[pd.Series, List[Any]], format: Optional[str] = None) -> List[Optional[datetime]]:
+    """
+    Parse many timestamps at once, inferring the format a single time.
+
+    Parameters:
+    -----------
+    values : pd.Series or list
+        Timestamp strings, datetime objects or missing values.
+    format : str or None
+        One of TIMESTAMP_FORMATS or a strptime format. Inferred if None.
+
+    Returns:
+    --------
+    list
+        datetime objects (pd.Timestamp where parsed in bulk) or None, in input order.
+        Strings that cannot be parsed become None.
+    """
+    values = list(values)
+    result: List[Optional[datetime]] = [None] * len(values)
+    positions = []
+    strings = []
+    for i, value in enumerate(values):
+        if isinstance(value, datetime):
+            result[i] = None if value is pd.NaT else value
+        elif isinstance(value, str):
+            positions.append(i)
+            strings.append(value)
+
+    if strings:
+        if format is None:
+            format = infer_timestamp_format(strings)
+        for i, parsed in zip(positions, _parse_strings(strings, format)):
+            result[i] = parsed
+        count('timestamps.parsed', len(strings))
+    return result
+
+
+@instrumented
+def normalize_timestamps(df: pd.DataFrame,
+                         timestamp_colname: str = colnames['turn']['timestamp'],
+                         conversation_colname: str = colnames['conv']['conversation'],
+                         format: Optional[str] = None,
+                         inplace: bool = False) -> pd.DataFrame:
+    """
+    Convert timestamps to datetimes once, so rendering never parses them again.
+
+    For a turn-level DataFrame (with a timestamp column) the column is converted
+    to datetime64. For a conversation-level DataFrame the timestamp of every turn
+    in the conversation column is replaced with a datetime object (or None);
+    the turn dicts are copied, never modified in place. String-typed
+    conversation columns are skipped; decode them with
+    normalize_conversations() first.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame
+        Turn-level or conversation-level DataFrame.
+    timestamp_colname : str
+        Timestamp column (turn-level) or turn dict key (conversation-level).
+    conversation_colname : str
+        Column holding the turns of a conversation-level DataFrame.
+    format : str or None
+        Timestamp format. Inferred once from the data if None.
+    inplace : bool, default=False
+        Modify df instead of returning a copy.
+
+    Returns:
+    --------
+    pd.DataFrame
+        DataFrame with parsed timestamps.
+    """
+    if not inplace:
+        df = df.copy()
+
+    if timestamp_colname in df.columns:
+        column = df[timestamp_colname]
+        if not pd.api.types.is_datetime64_any_dtype(column.dtype):
+            parsed = parse_timestamps(column, format=format)
+            df[timestamp_colname] = pd.Series(parsed, index=df.index, dtype=object).infer_objects()
+        return df
+
+    if conversation_colname not in df.columns:
+        raise KeyError(f"DataFrame has neither '{timestamp_colname}' nor '{conversation_colname}' columns")
+
+    conversations = [list(turns) if turns is not None and not isinstance(turns, str) else turns
+                     for turns in df[conversation_colname]]
+    flat = [turn.get(timestamp_colname) for turns in conversations if isinstance(turns, list)
+            for turn in turns if isinstance(turn, dict)]
+    parsed = iter(parse_timestamps(flat, format=format))
+
+    for turns in conversations:
+        if not isinstance(turns, list):
+            continue
+        for j, turn in enumerate(turns):
+            if isinstance(turn, dict):
+                turns[j] = {**turn, timestamp_colname: next(parsed)}
+
+    result = np.empty(len(conversations), dtype=object)
+    for i, turns in enumerate(conversations):
+        result[i] = turns
+    df[conversation_colname] = result
+    return df
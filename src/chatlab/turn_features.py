@@ -0,0 +1,131 @@
+#chatlab/turn_features.py
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from .colnames import colnames
+from .utils import as_arrow_strings
+from .profiling import instrumented
+
+# Python's str.split() whitespace set, expressed for Arrow's RE2 engine so that
+# vectorized word counts agree with len(text.split()).
+_WORD_PATTERN = r'[^\s\p{Z}\x{0b}\x{1c}-\x{1f}\x{85}]+'
+# A fenced block is an opening ``` (optionally followed by a language tag) up to
+# the next ```, the same pairing rule used by the HTML renderer.
+_FENCE_PATTERN = r'(?s)```[ \t]*([\w+#.-]*).*?```'
+
+
+@instrumented
+def add_turn_features(turns_df: pd.DataFrame,
+                      message_colname: str = colnames['turn']['message'],
+                      role_colname: str = colnames['turn']['role'],
+                      inplace: bool = False) -> pd.DataFrame:
+    """
+    Compute per-turn text features for the output of unpack_turns in one bulk pass.
+
+    Parameters:
+    -----------
+    turns_df : pandas.DataFrame
+        Turn-level DataFrame (one row per turn), e.g. the result of unpack_turns.
+    message_colname : str, default=content
+        The name of the column containing message text.
+    role_colname : str, default=role
+        The name of the column containing the speaker role.
+    inplace : bool, default=False
+        If True, the feature columns are written to turns_df directly.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The DataFrame with the following columns added or overwritten
+        (names taken from colnames['turn']):
+        - n_words: number of whitespace-separated words
+        - n_chars: message length in characters
+        - n_code_blocks: number of fenced (```) code blocks
+        - code_languages: list of language tags on the code fences ('' if untagged)
+        - code_block: True for assistant turns containing a code fence
+
+    Notes:
+    ------
+    Counting is done with Arrow string kernels over the whole column instead of
+    per-row Python loops. The renderer reads the code_block flag when present,
+    so running this once avoids re-scanning message text at render time.
+    """
+    if message_colname not in turns_df.columns:
+        raise ValueError(f"Column '{message_colname}' not found in DataFrame")
+
+    turn_cols = colnames['turn']
+    result = turns_df if inplace else turns_df.copy()
+
+    messages = as_arrow_strings(result[message_colname])
+    messages = pc.fill_null(messages, '')
+
+    n_words = pc.count_substring_regex(messages, _WORD_PATTERN)
+    n_chars = pc.utf8_length(messages)
+    n_fences = pc.count_substring(messages, '```')
+    n_code_blocks = pc.divide(n_fences, 2)
+
+    index = result.index
+    result[turn_cols['n_words']] = pd.Series(n_words.to_numpy(zero_copy_only=False), index=index)
+    result[turn_cols['n_chars']] = pd.Series(n_chars.to_numpy(zero_copy_only=False), index=index)
+    result[turn_cols['n_code_blocks']] = pd.Series(n_code_blocks.to_numpy(zero_copy_only=False), index=index)
+
+    # Only rows that actually contain fences need the (slower) language extraction.
+    # An unterminated fence still counts as code, matching the renderer's check.
+    has_fence = pd.Series(pc.greater(n_fences, 0).to_numpy(zero_copy_only=False), index=index)
+    languages = pd.Series([[] for _ in range(len(result))], index=index, dtype=object)
+    if has_fence.any():
+        fenced = pd.Series(messages.filter(pa.array(has_fence.to_numpy())).to_pylist(), index=index[has_fence])
+        languages[has_fence] = fenced.str.findall(_FENCE_PATTERN)
+    result[turn_cols['code_languages']] = languages
+
+    if role_colname in result.columns:
+        result[turn_cols['code_block']] = has_fence & (result[role_colname] == 'assistant')
+    else:
+        result[turn_cols['code_block']] = has_fence
+
+    return result
+
+
+@instrumented
+def summarize_turn_features(turns_df: pd.DataFrame,
+                            conv_id_colname: str = colnames['turn']['conv_id'],
+                            role_colname: str = colnames['turn']['role']) -> pd.DataFrame:
+    """
+    Aggregate turn features to the conversation level.
+
+    Parameters:
+    -----------
+    turns_df : pandas.DataFrame
+        Turn-level DataFrame that has been passed through add_turn_features.
+    conv_id_colname : str, default=conv_id
+        The name of the column containing conversation IDs.
+    role_colname : str, default=role
+        The name of the column containing the speaker role.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per conversation with the colnames['conv'] columns
+        turns, n_words, n_words_user, n_words_gpt and n_code, ready to be
+        merged onto the conversation-level DataFrame and used with filter_subset.
+    """
+    turn_cols = colnames['turn']
+    conv_cols = colnames['conv']
+
+    n_words = turns_df[turn_cols['n_words']]
+    is_user = turns_df[role_colname] == 'user'
+    is_assistant = turns_df[role_colname] == 'assistant'
+
+    frame = pd.DataFrame({
+        conv_id_colname: turns_df[conv_id_colname],
+        conv_cols['n_words']: n_words,
+        conv_cols['n_words_user']: n_words.where(is_user, 0),
+        conv_cols['n_words_gpt']: n_words.where(is_assistant, 0),
+        conv_cols['n_code']: turns_df[turn_cols['code_block']].astype(int),
+    })
+
+    grouped = frame.groupby(conv_id_colname, sort=False, observed=True)
+    summary = grouped.sum()
+    summary.insert(0, conv_cols['turns'], grouped.size())
+
+    return summary.reset_index()
@@ -1,32 +1,64 @@
+import logging
 import pandas as pd
+import pyarrow as pa
+from typing import Optional, Union
 from .colnames import colnames
+from .store import ConversationStore
+from .engines import resolve_engine, unpack_nested
+from .profiling import instrumented
 
-def unpack_turns(df: pd.DataFrame,
-                 conv_colname: str = colnames['conv']['conversation']) -> pd.DataFrame:
+logger = logging.getLogger(__name__)
+
+@instrumented
+def unpack_turns(df: Union[pd.DataFrame, ConversationStore],
+                 conv_colname: str = colnames['conv']['conversation'],
+                 backend: Optional[str] = None) -> pd.DataFrame:
     """
     Unpacks conversation turns from a nested structure into separate rows.
 
     Parameters:
     -----------
-    df : pandas.DataFrame
+    df : pandas.DataFrame, ConversationStore, pyarrow.Table or polars DataFrame/LazyFrame
         DataFrame containing a column with nested conversation data.
+        If a ConversationStore is given, its turns table is returned directly.
     conv_colname : str, default=conversation
         The name of the column containing conversation data (list of dictionaries).
+    backend : str, optional
+        The engine to run on: 'pandas', 'arrow' or 'polars' (see set_engine).
+        Defaults to the engine of the input type for Arrow and Polars input,
+        else the active engine.
+        The arrow and polars engines unpack the turns with one list flatten
+        instead of building a dict per turn. Turns that do not share one schema
+        are unpacked with pandas.
 
     Returns:
     --------
     pandas.DataFrame
-        A new DataFrame with each turn unpacked into a separate row.
+        A new DataFrame with each turn unpacked into a separate row. Arrow and
+        Polars input give an Arrow table or Polars frame.
 
     Notes:
     ------
     This function assumes each entry in the conv_colname column is a list of dictionaries,
     where each dictionary represents a turn in the conversation.
     """
+    # A store already holds the turns unpacked
+    if isinstance(df, ConversationStore):
+        return df.read_turns()
+
+    if not isinstance(df, pd.DataFrame):
+        return unpack_nested(df, conv_colname, backend=backend)
+
     # Check if the conversation column exists
     if conv_colname not in df.columns:
         raise ValueError(f"Column '{conv_colname}' not found in DataFrame")
 
+    if resolve_engine(df, backend) != 'pandas' and not df.empty:
+        try:
+            return unpack_nested(df, conv_colname, backend=backend)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError) as e:
+            logger.debug("Unpacking turns with pandas: %s", e)
+
     # Step 1: Create a subset of df with only the conversation column
     conversation_df = df[[conv_colname]].copy()
 
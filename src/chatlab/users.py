@@ -0,0 +1,292 @@
+#chatlab/users.py
+import logging
+from typing import Union, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .colnames import colnames
+from .store import ConversationStore
+from .profiling import instrumented, count
+
+logger = logging.getLogger(__name__)
+
+_NAT = np.iinfo(np.int64).min
+
+
+def _to_ns(values: pd.Series) -> np.ndarray:
+    """Datetimes as int64 nanoseconds since the epoch, NaT as the int64 minimum."""
+    if not pd.api.types.is_datetime64_any_dtype(values.dtype):
+        values = pd.to_datetime(values, utc=True, errors='coerce')
+    return pd.DatetimeIndex(values).as_unit('ns').asi8
+
+
+def _from_ns(values: np.ndarray, like: pd.Series) -> pd.Series:
+    """Inverse of _to_ns, in the time zone of like."""
+    tz = getattr(like.dtype, 'tz', None)
+    result = pd.to_datetime(values, unit='ns')
+    return pd.Series(result.tz_localize('UTC').tz_convert(tz) if tz is not None else result)
+
+
+def _sessionize(user_ids: pd.Series, start: pd.Series, end: pd.Series, session_gap: pd.Timedelta
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Assign conversations to gap-based sessions with one sort.
+
+    Returns, per input row, the user code, the session number within the user
+    and the position of the conversation within the user, plus the start and
+    end times in nanoseconds and the sort order, in which every session is a
+    contiguous run of rows. Rows without a user get code -1.
+    """
+    codes, _ = pd.factorize(user_ids, use_na_sentinel=True)
+    start_ns = _to_ns(start)
+    end_ns = _to_ns(end)
+    # A conversation missing one bound is treated as instantaneous
+    start_ns = np.where(start_ns == _NAT, end_ns, start_ns)
+    end_ns = np.where(end_ns == _NAT, start_ns, end_ns)
+    missing = start_ns == _NAT
+
+    # Users together, by start time; undated conversations last. Two stable
+    # argsorts are cheaper than a multi-key lexsort.
+    order = np.argsort(np.where(missing, np.iinfo(np.int64).max, start_ns), kind='stable')
+    order = order[np.argsort(codes[order], kind='stable')]
+    sorted_codes = codes[order]
+    sorted_start = start_ns[order]
+    sorted_end = end_ns[order]
+    sorted_missing = missing[order]
+
+    new_user = np.r_[True, sorted_codes[1:] != sorted_codes[:-1]]
+    # Latest end so far within the user, so a long conversation keeps its session open
+    running_end = pd.Series(sorted_end).groupby(sorted_codes, sort=False).cummax().to_numpy()
+    gap = np.r_[0, sorted_start[1:] - running_end[:-1]]
+    new_session = new_user | (gap > session_gap.value) | sorted_missing
+
+    user_starts = np.flatnonzero(new_user)
+    user_of_row = np.cumsum(new_user) - 1
+    position = np.arange(len(order)) - user_starts[user_of_row]
+    session_count = np.cumsum(new_session)
+    session_num = session_count - session_count[user_starts][user_of_row]
+
+    rows = np.empty(len(order), dtype=np.int64)
+    rows[order] = np.arange(len(order))
+    return codes, session_num[rows], position[rows], start_ns, end_ns, order
+
+
+def _read(df: Union[pd.DataFrame, ConversationStore], columns) -> pd.DataFrame:
+    if isinstance(df, ConversationStore):
+        return df.read_conversations(columns=list(columns))
+    return df
+
+
+@instrumented
+def add_user_features(df: pd.DataFrame,
+                      session_gap: Union[str, pd.Timedelta] = '30min',
+                      user_id_colname: str = colnames['conv']['user_id'],
+                      start_colname: str = colnames['conv']['start'],
+                      end_colname: str = colnames['conv']['end'],
+                      inplace: bool = False) -> pd.DataFrame:
+    """
+    Compute per-user activity and sessions and write them back as columns.
+
+    Conversations of a user belong to the same session while each starts at
+    most session_gap after the latest end of the conversations before it.
+    Everything is computed with one sort and grouped cumulative operations,
+    without per-user Python loops.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Conversation-level DataFrame.
+    session_gap : str or pd.Timedelta, default='30min'
+        Longest idle time within a session.
+    user_id_colname : str, default=user_id
+        The name of the column containing user IDs.
+    start_colname, end_colname : str, default=time_first, time_last
+        Conversation start and end times. Conversations missing both form
+        sessions of their own, after the user's dated conversations.
+    inplace : bool, default=False
+        If True, the columns are written to df directly.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        The DataFrame with these columns added (names taken from colnames['conv']):
+        - user_freq: number of conversations of the user
+        - user_first, user_last: start of the user's first and end of their last conversation
+        - user_conv_num: position of the conversation in the user's history (0-based)
+        - session_num: session of the conversation within the user (0-based)
+        - user_sessions: number of sessions of the user
+        Rows without a user ID get missing values.
+
+    Examples:
+    ---------
+    >>> df = clb.add_user_features(df, session_gap='1h', user_id_colname='user_id_n')
+    >>> df.groupby(['user_id', 'session_num']).size()
+    """
+    for column in (user_id_colname, start_colname, end_colname):
+        if column not in df.columns:
+            raise ValueError(f"Column '{column}' not found in DataFrame")
+
+    conv_cols = colnames['conv']
+    session_gap = pd.Timedelta(session_gap)
+    result = df if inplace else df.copy()
+
+    codes, session_num, position, start_ns, end_ns, _ = _sessionize(
+        result[user_id_colname], result[start_colname], result[end_colname], session_gap)
+    has_user = codes >= 0
+    n_users = int(codes.max(initial=-1)) + 1
+    user_codes = np.where(has_user, codes, 0)
+
+    freq = np.bincount(codes[has_user], minlength=n_users)
+    # Earliest start and latest end per user; NaT (the int64 minimum) never wins the maximum
+    first = np.full(n_users, np.iinfo(np.int64).max)
+    np.minimum.at(first, codes[has_user], np.where(start_ns == _NAT, np.iinfo(np.int64).max, start_ns)[has_user])
+    first = np.where(first == np.iinfo(np.int64).max, _NAT, first)
+    last = np.full(n_users, _NAT)
+    np.maximum.at(last, codes[has_user], end_ns[has_user])
+    sessions = np.zeros(n_users, dtype=np.int64)
+    np.maximum.at(sessions, codes[has_user], session_num[has_user] + 1)
+
+    def per_row(values: np.ndarray) -> pd.Series:
+        return pd.Series(values[user_codes], index=result.index).where(has_user)
+
+    result[conv_cols['user_freq']] = per_row(freq).astype('Int64')
+    result[conv_cols['user_first']] = _from_ns(first[user_codes], result[start_colname]).set_axis(result.index).where(has_user)
+    result[conv_cols['user_last']] = _from_ns(last[user_codes], result[end_colname]).set_axis(result.index).where(has_user)
+    result[conv_cols['user_conv_num']] = pd.Series(position, index=result.index).where(has_user).astype('Int64')
+    result[conv_cols['session_num']] = pd.Series(session_num, index=result.index).where(has_user).astype('Int64')
+    result[conv_cols['user_sessions']] = per_row(sessions).astype('Int64')
+
+    count('users.conversations', len(result))
+    logger.info("Computed activity of %d users (%d sessions)", n_users, int(sessions.sum()))
+    return result
+
+
+@instrumented
+def update_user_features(df: pd.DataFrame,
+                         new_df: pd.DataFrame,
+                         session_gap: Union[str, pd.Timedelta] = '30min',
+                         user_id_colname: str = colnames['conv']['user_id'],
+                         start_colname: str = colnames['conv']['start'],
+                         end_colname: str = colnames['conv']['end']) -> pd.DataFrame:
+    """
+    Append new conversations to a DataFrame that already has user features.
+
+    Only the users appearing in new_df are recomputed, from their ID and time
+    columns alone; rows of all other users keep their values. The sort and
+    sessionizing thus follow the history of the affected users, but df is
+    still scanned for them and copied once into the result, so an update
+    remains linear in the size of the corpus.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame
+        Result of add_user_features (or an earlier update_user_features).
+    new_df : pandas.DataFrame
+        New conversations, with the same columns as df before add_user_features.
+    session_gap, user_id_colname, start_colname, end_colname :
+        As for add_user_features; use the same values as for df.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        df followed by new_df, with the user feature columns of the affected users recomputed.
+    """
+    combined = pd.concat([df, new_df], ignore_index=True)
+    new_users = new_df[user_id_colname].dropna().unique()
+    if len(new_users) == 0:
+        return combined
+
+    # Recompute from the key columns of the affected rows only, not from copies of whole rows
+    keys = [user_id_colname, start_colname, end_colname]
+    affected_old = df[user_id_colname].isin(new_users).to_numpy()
+    affected_new = new_df[user_id_colname].notna().to_numpy()
+    history = pd.concat([df.loc[affected_old, keys], new_df.loc[affected_new, keys]], ignore_index=True)
+    updated = add_user_features(history, session_gap=session_gap, user_id_colname=user_id_colname,
+                                start_colname=start_colname, end_colname=end_colname, inplace=True)
+    affected = np.r_[affected_old, affected_new]
+    updated.index = combined.index[affected]
+    conv_cols = colnames['conv']
+    for key in ('user_freq', 'user_first', 'user_last', 'user_conv_num', 'session_num', 'user_sessions'):
+        column = conv_cols[key]
+        if column in combined.columns and combined[column].dtype == updated[column].dtype:
+            combined.loc[affected, column] = updated[column]
+        else:
+            combined[column] = updated[column].reindex(combined.index)
+    logger.info("Updated %d rows of %d users", int(affected.sum()), updated[user_id_colname].nunique())
+    return combined
+
+
+@instrumented
+def user_sessions(df: Union[pd.DataFrame, ConversationStore],
+                  session_gap: Union[str, pd.Timedelta] = '30min',
+                  user_id_colname: str = colnames['conv']['user_id'],
+                  start_colname: str = colnames['conv']['start'],
+                  end_colname: str = colnames['conv']['end']) -> pd.DataFrame:
+    """
+    One row per user session.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or ConversationStore
+        Conversation-level data. Only the user and time columns are read from a store.
+    session_gap, user_id_colname, start_colname, end_colname :
+        As for add_user_features.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns user_id, session_num, start, end, duration and n_conversations.
+    """
+    df = _read(df, [user_id_colname, start_colname, end_colname])
+    codes, session_num, _, start_ns, end_ns, order = _sessionize(
+        df[user_id_colname], df[start_colname], df[end_colname], pd.Timedelta(session_gap))
+    rows = order[codes[order] >= 0]
+    new_session = np.r_[True, (codes[rows][1:] != codes[rows][:-1]) | (session_num[rows][1:] != session_num[rows][:-1])]
+    starts = np.flatnonzero(new_session) if len(rows) else np.array([], dtype=np.int64)
+
+    first_rows = rows[starts]
+    session_start = np.where(start_ns == _NAT, np.iinfo(np.int64).max, start_ns)[rows]
+    session_start = np.minimum.reduceat(session_start, starts) if len(rows) else session_start
+    session_start = np.where(session_start == np.iinfo(np.int64).max, _NAT, session_start)
+    session_end = np.maximum.reduceat(end_ns[rows], starts) if len(rows) else end_ns[rows]
+    result = pd.DataFrame({user_id_colname: df[user_id_colname].to_numpy()[first_rows],
+                           'session_num': session_num[first_rows]})
+    result['start'] = _from_ns(session_start, df[start_colname])
+    result['end'] = _from_ns(session_end, df[end_colname])
+    result['duration'] = result['end'] - result['start']
+    result['n_conversations'] = np.diff(np.r_[starts, len(rows)])
+    return result
+
+
+@instrumented
+def summarize_users(df: Union[pd.DataFrame, ConversationStore],
+                    session_gap: Union[str, pd.Timedelta] = '30min',
+                    user_id_colname: str = colnames['conv']['user_id'],
+                    start_colname: str = colnames['conv']['start'],
+                    end_colname: str = colnames['conv']['end']) -> pd.DataFrame:
+    """
+    One row per user with conversation count, activity span and sessions.
+
+    Parameters:
+    -----------
+    df : pandas.DataFrame or ConversationStore
+        Conversation-level data. Only the user and time columns are read from a store.
+    session_gap, user_id_colname, start_colname, end_colname :
+        As for add_user_features.
+
+    Returns:
+    --------
+    pandas.DataFrame
+        Columns user_id, user_freq, user_first, user_last, active_span and
+        user_sessions, most active users first.
+    """
+    conv_cols = colnames['conv']
+    df = _read(df, [user_id_colname, start_colname, end_colname])
+    features = add_user_features(df[[user_id_colname, start_colname, end_colname]], session_gap=session_gap,
+                                 user_id_colname=user_id_colname, start_colname=start_colname,
+                                 end_colname=end_colname, inplace=True)
+    columns = [user_id_colname] + [conv_cols[key] for key in ('user_freq', 'user_first', 'user_last', 'user_sessions')]
+    summary = features.loc[features[user_id_colname].notna(), columns].drop_duplicates(user_id_colname)
+    summary.insert(4, 'active_span', summary[conv_cols['user_last']] - summary[conv_cols['user_first']])
+    return summary.sort_values(conv_cols['user_freq'], ascending=False, kind='stable').reset_index(drop=True)
@@ -1,11 +1,15 @@
 #utils.py
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from typing import Optional, Union, Tuple, Any
-import sys
+import logging
 import os
 from pathlib import Path
 import importlib.resources
 
+logger = logging.getLogger(__name__)
+
 
 def parse_range(range_input: Any) -> Tuple[Optional[float], Optional[float]]:
     """
@@ -37,58 +41,89 @@ def parse_range(range_input: Any) -> Tuple[Optional[float], Optional[float]]:
     return range_input, range_input
 
 
-def apply_filters(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+def apply_filters(df: pd.DataFrame, backend: Optional[str] = None, **kwargs) -> pd.DataFrame:
     """
     Apply multiple filters to a DataFrame based on column types.
 
     Parameters:
     -----------
-    df : pandas.DataFrame
+    df : pandas.DataFrame, pyarrow.Table or polars DataFrame/LazyFrame
         DataFrame to filter
+    backend : str, optional
+        The engine to run on: 'pandas', 'arrow' or 'polars' (see set_engine).
+        Defaults to the engine of the input type for Arrow and Polars input,
+        else the active engine.
     **kwargs : dict
         Keyword arguments for filtering, where keys are column names and
-        values are filter criteria
+        values are filter criteria. 'backend' is taken by the parameter above,
+        so a column of that name cannot be filtered here.
 
     Returns:
     --------
     pandas.DataFrame
-        Filtered DataFrame
+        Filtered DataFrame, of the same type as df
     """
-    filtered_df = df.copy()
+    if backend is None and isinstance(df, pd.DataFrame):
+        from .engines import get_engine
+        if get_engine() == 'pandas':
+            return _apply_filters_pandas(df, **kwargs)
+    from .engines import apply_filters as engine_apply_filters
+    return engine_apply_filters(df, backend=backend, **kwargs)
+
+
+def _apply_filters_pandas(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    return df[_filters_mask(df, **kwargs)]
 
-    # Apply filters for each keyword argument
+
+def _filters_mask(df: pd.DataFrame, **kwargs) -> np.ndarray:
+    """Boolean mask of the rows of df passing all keyword filters (columns df lacks are skipped)."""
+    mask = np.ones(len(df), dtype=bool)
     for key, value in kwargs.items():
-        # Skip if the column doesn't exist
-        if key not in df.columns:
-            continue
-
-        # Get the column data type
-        dtype = df[key].dtype
-
-        if pd.api.types.is_numeric_dtype(dtype):
-            # Numeric column handling
-            min_val, max_val = parse_range(value)
-
-            if min_val is not None and max_val is not None and min_val == max_val:
-                # Exact value match
-                filtered_df = filtered_df[filtered_df[key] == min_val]
-            else:
-                # Range filter
-                if min_val is not None:
-                    filtered_df = filtered_df[filtered_df[key] >= min_val]
-                if max_val is not None:
-                    filtered_df = filtered_df[filtered_df[key] <= max_val]
-        else:
-            # String/Object column handling
-            if isinstance(value, list):
-                # Filter with a list of values
-                filtered_df = filtered_df[filtered_df[key].isin(value)]
-            else:
-                # Single value filter
-                filtered_df = filtered_df[filtered_df[key] == value]
+        if key in df.columns:
+            mask &= filter_mask(df[key], value)
+    return mask
 
-    return filtered_df
 
+def filter_mask(values: pd.Series, value: Any) -> np.ndarray:
+    """
+    Boolean mask of the rows of one column passing a filter, by the rules of apply_filters.
+    """
+    if pd.api.types.is_numeric_dtype(values.dtype):
+        min_val, max_val = parse_range(value)
+        if min_val is not None and max_val is not None and min_val == max_val:
+            mask = values == min_val
+        else:
+            mask = pd.Series(True, index=values.index)
+            if min_val is not None:
+                mask &= values >= min_val
+            if max_val is not None:
+                mask &= values <= max_val
+    elif isinstance(value, list):
+        mask = values.isin(value)
+    else:
+        mask = values == value
+    return mask.fillna(False).to_numpy(dtype=bool)
+
+
+def as_arrow_strings(values: pd.Series) -> pa.Array:
+    """
+    A text column as an Arrow string array.
+
+    string[pyarrow] and pyarrow-backed columns are used without copying and
+    categoricals are decoded from their categories, so compacted columns are
+    never expanded to Python str objects.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        categories = pa.array(values.cat.categories.astype(object), type=pa.string(), from_pandas=True)
+        result = categories.take(pa.array(codes, mask=codes < 0))
+    elif values.dtype != object and hasattr(values.array, '__arrow_array__'):
+        result = pa.array(values.array)
+        if isinstance(result, pa.ChunkedArray):
+            result = result.combine_chunks()
+    else:
+        return pa.array(values.astype(object), type=pa.string(), from_pandas=True)
+    return result if result.type == pa.string() else result.cast(pa.string())
 
 
 def get_package_root() -> Path:
@@ -100,12 +135,12 @@ def get_package_root() -> Path:
         with importlib.resources.path('chatlab', '__init__.py') as p:
             return p.parent
     except Exception:
-        print("Warning: Could not reliably determine package root via importlib.resources. Falling back to __file__.", file=sys.stderr)
+        logger.warning("Could not reliably determine package root via importlib.resources. Falling back to __file__.")
         try:
             # Fallback using __file__ (less reliable in some scenarios)
             return Path(__file__).parent.resolve()
         except NameError:
-            print("Warning: __file__ not defined. Using CWD. Asset loading might fail.", file=sys.stderr)
+            logger.warning("__file__ not defined. Using CWD. Asset loading might fail.")
             return Path(os.getcwd()).resolve()
 
 # Add other general utility functions here if needed...
\ No newline at end of file
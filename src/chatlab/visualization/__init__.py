@@ -1,9 +1,8 @@
 # chatlab/visualization/__init__.py
 import pandas as pd
 import numpy as np
-import json
+import logging
 from pathlib import Path
-import sys
 import os
 import random
 from typing import Union, List, Optional, Dict, Any
@@ -11,58 +10,86 @@ from datetime import datetime # Added
 
 # Import helpers from sibling modules
 # --- Make sure get_additional_styles is NOT imported if it stays in html_generator ---
-from .html_generator import get_metadata_html, get_full_grid_row_html, generate_full_html
-from .resources import get_avatars, load_css, load_js, _load_file_content, PACKAGE_ROOT
+from .html_generator import (get_metadata_html, get_metadata_html_batch, get_full_grid_row_html,
+                             generate_full_html, get_avatar_css)
+from .shared_assets import write_shared_assets, minify_html
+from .resources import get_avatars, load_css, load_js, _load_file_content
 from ..colnames import colnames
-
-# Optional: For displaying in notebooks
-try:
-    from IPython.display import display as ipython_display, HTML
-    _IPYTHON_AVAILABLE = True
-except ImportError:
-    _IPYTHON_AVAILABLE = False
+from ..store import ConversationStore
+from ..lookup import ConversationLookup
+from ..decoding import decode_conversation
+from ..timestamps import parse_timestamp
+from ..profiling import instrumented, stage, count
+from ..log_utils import RateLimitedLogger, ErrorSummary
+from . import html_generator
+
+logger = logging.getLogger(__name__)
+# Timestamp problems can occur on every turn; only the first few are reported
+turn_logger = RateLimitedLogger(logger)
+# Rate-limited loggers of the rendering code, reset and reported per batch by its ErrorSummary
+_TURN_LOGGERS = (turn_logger, html_generator.turn_logger)
+
+# Optional: For displaying in notebooks. IPython is imported on first display
+# rather than at import time, since it is by far the slowest dependency to load.
+def _get_ipython_display():
+    """Returns IPython's (display, HTML) pair, or None if IPython is not installed."""
+    try:
+        from IPython.display import display, HTML
+    except ImportError:
+        return None
+    return display, HTML
 
 
 # --- Helper function to parse timestamp ---
 def _parse_timestamp(timestamp_str: Any, col_name: str) -> Optional[datetime]:
     """Safely parses a timestamp string into a datetime object."""
+    # Precomputed datetimes (see chatlab.normalize_timestamps) need no parsing
+    if isinstance(timestamp_str, datetime):
+        return None if timestamp_str is pd.NaT else timestamp_str
     if pd.isna(timestamp_str):
         return None
     try:
-        # Attempt parsing common formats, add more if needed
-        # Try ISO format first
-        return datetime.fromisoformat(str(timestamp_str).replace('Z', '+00:00'))
+        # Uses the format last seen in this column, trying the others only if it fails
+        return parse_timestamp(timestamp_str, col_name)
     except ValueError:
-        try:
-            # Try another common format
-            return datetime.strptime(str(timestamp_str), '%Y-%m-%d %H:%M:%S')
-        except ValueError:
-             try:
-                 # Try just time if that's relevant (adjust format)
-                 return datetime.strptime(str(timestamp_str), '%H:%M:%S')
-             except ValueError:
-                # Fallback or more formats...
-                print(f"Warning: Could not parse timestamp '{timestamp_str}' for column '{col_name}'.", file=sys.stderr)
-                return None
+        turn_logger.warning('timestamp', "Could not parse timestamp '%s' for column '%s'.", timestamp_str, col_name)
+        return None
     except Exception as e:
-         print(f"Error parsing timestamp '{timestamp_str}': {e}", file=sys.stderr)
+         turn_logger.warning('timestamp', "Error parsing timestamp '%s': %s", timestamp_str, e)
          return None
 
 
 
-def _process_single_conversation(
+def _render_conversation_parts(
         df: pd.DataFrame,
         conv_id: str,
-        theme: str = 'light',
-        custom_css_path: Optional[Union[str, Path]] = None,
-        save_mode: str = "base_html", # save_mode is used below now
+        save_mode: str = "base_html",
         user_avatar_svg: Optional[str] = None,
-        assistant_avatar_svg: Optional[str] = None
-) -> Optional[Dict[str, str]]:
+        assistant_avatar_svg: Optional[str] = None,
+        errors: Optional[ErrorSummary] = None,
+        metadata_html: Optional[str] = None,
+        avatar_mode: str = 'inline',
+        virtualize_turns: Optional[int] = None
+) -> Optional[Dict[str, Any]]:
     """
-    Process a single conversation and return HTML content for both base and annotation modes.
-    Corrected timestamp/duration logic AND function calls.
+    Render the page-independent parts of a conversation: the metadata section
+    and the turn rows (annotation rows only if save_mode is 'annotation').
+
+    Conversations with at least `virtualize_turns` turns get no annotation rows
+    and are flagged 'virtual': their annotation page is built from the base rows
+    by the virtualized view (see generate_full_html).
+
+    Returns a dict with 'metadata_html', 'base_rows_html', 'base_rows' (list),
+    'annotation_rows_html', 'virtual' and 'avatars', or None if the conversation
+    could not be rendered (the reason is recorded in `errors`, or logged as a
+    warning if no ErrorSummary is passed).
     """
+    if errors is None:
+        with ErrorSummary(logger, 'conversations', rate_limited=_TURN_LOGGERS) as errors:
+            return _render_conversation_parts(df, conv_id, save_mode=save_mode, user_avatar_svg=user_avatar_svg,
+                                              assistant_avatar_svg=assistant_avatar_svg, errors=errors,
+                                              metadata_html=metadata_html, avatar_mode=avatar_mode,
+                                              virtualize_turns=virtualize_turns)
     # --- 1. Data Retrieval & Validation ---
     #print(f"\n[DEBUG] Processing conv_id: {conv_id}") # Keep DEBUG prints for now
     conv_id_col = colnames['conv']['conv_id']
@@ -73,94 +100,95 @@ def _process_single_conversation(
     redacted_col = colnames['turn']['redacted']
     code_block_col = colnames['turn']['code_block']
 
-    try:
-        matching_rows = df.loc[df[conv_id_col] == conv_id]
-        if len(matching_rows) == 0:
-       #     print(f"[DEBUG] Error: Conv ID '{conv_id}' not found in DataFrame.", file=sys.stderr) # Added debug context
+    with stage('render.lookup'):
+        try:
+            matching_rows = df.loc[df[conv_id_col] == conv_id]
+            if len(matching_rows) == 0:
+                errors.add('not found', conv_id)
+                return None
+            row = matching_rows.iloc[0]
+        except KeyError:
+            errors.add(f"missing '{conv_id_col}' column", conv_id)
+            return None
+        except Exception as e:
+            errors.add('row lookup failed', conv_id, e)
             return None
-        row = matching_rows.iloc[0]
-    except KeyError:
-     #   print(f"[DEBUG] Error: '{conv_id_col}' column missing in DataFrame.", file=sys.stderr) # Added debug context
-        return None
-    except Exception as e:
-      #  print(f"[DEBUG] Error accessing row for '{conv_id}': {e}", file=sys.stderr) # Added debug context
-        return None
 
     # --- 2. Load and Prepare Conversation Turns ---
     conversation_col = colnames['conv']['conversation']
     if conversation_col not in row.index:
-     #   print(f"[DEBUG] Error: '{conversation_col}' column missing in row for '{conv_id}'.", file=sys.stderr)
+        errors.add(f"missing '{conversation_col}' column", conv_id)
         return None
 
     conversation_data = row[conversation_col]
-   # print(f"[DEBUG] Raw conversation_data type for '{conv_id}': {type(conversation_data)}")
+    logger.debug("Raw conversation_data type for '%s': %s", conv_id, type(conversation_data))
 
     try:
         # ... (existing null check logic) ...
-        if pd.isna(conversation_data).any() if hasattr(conversation_data, 'any') else pd.isna(conversation_data):
-      #       print(f"[DEBUG] Error: '{conversation_col}' is null or empty for '{conv_id}'.", file=sys.stderr)
+        if isinstance(conversation_data, list):
+            pass  # Turns rebuilt from a store arrive as a plain list
+        elif pd.isna(conversation_data).any() if hasattr(conversation_data, 'any') else pd.isna(conversation_data):
+             errors.add('empty conversation', conv_id)
              return None
     except Exception as e:
-        print(f"[DEBUG] Warning: Could not reliably check for null/missing data in '{conversation_col}' for '{conv_id}': {e}", file=sys.stderr)
+        logger.debug("Could not reliably check for null/missing data in '%s' for '%s': %s", conversation_col, conv_id, e)
         # Continue processing cautiously
 
-    turns = None
-    try:
-        # --- Existing parsing logic ---
-      #  print(f"[DEBUG] Attempting to parse/convert conversation data...")
-        if isinstance(conversation_data, str):
-            print("[DEBUG] Data is string, trying json.loads...")
-            try:
-                turns = json.loads(conversation_data)
-            except json.JSONDecodeError:
-                print("[DEBUG] json.loads failed, trying ast.literal_eval...")
-                import ast
+    with stage('render.parse'):
+        turns = None
+        try:
+            # --- Existing parsing logic ---
+          #  print(f"[DEBUG] Attempting to parse/convert conversation data...")
+            if isinstance(conversation_data, (str, bytes)):
+                # JSON via the fastest installed decoder, then Python literals; cached per string
                 try:
-                    turns = ast.literal_eval(conversation_data)
-                except (SyntaxError, ValueError) as e_ast:
-                    print(f"[DEBUG] ast.literal_eval failed: {e_ast}", file=sys.stderr)
-                    raise TypeError("Could not parse conversation string format.") from e_ast
-        elif isinstance(conversation_data, list):
-          #  print("[DEBUG] Data is already a list.")
-            turns = conversation_data
-        elif hasattr(conversation_data, 'tolist'):
-          #  print("[DEBUG] Data has 'tolist' method, calling it...")
-            turns = conversation_data.tolist()
-        elif isinstance(conversation_data, np.ndarray):
-           #  print("[DEBUG] Data is numpy array, calling tolist()...")
-             turns = conversation_data.tolist()
-        else:
-           # print(f"[DEBUG] Data type {type(conversation_data)} not explicitly handled, trying fallback...")
-            try:
-                turns_str = str(conversation_data)
-                turns = json.loads(turns_str)
-            except Exception as e_fallback:
-                 print(f"[DEBUG] Fallback str/json conversion failed: {e_fallback}", file=sys.stderr)
-                 raise TypeError(f"Unsupported conversation format: {type(conversation_data)}") from e_fallback
+                    turns = decode_conversation(conversation_data)
+                except (SyntaxError, ValueError) as e_decode:
+                    logger.debug("Decoding conversation string failed: %s", e_decode)
+                    raise TypeError("Could not parse conversation string format.") from e_decode
+            elif isinstance(conversation_data, list):
+              #  print("[DEBUG] Data is already a list.")
+                turns = conversation_data
+            elif hasattr(conversation_data, 'tolist'):
+              #  print("[DEBUG] Data has 'tolist' method, calling it...")
+                turns = conversation_data.tolist()
+            elif isinstance(conversation_data, np.ndarray):
+               #  print("[DEBUG] Data is numpy array, calling tolist()...")
+                 turns = conversation_data.tolist()
+            else:
+               # print(f"[DEBUG] Data type {type(conversation_data)} not explicitly handled, trying fallback...")
+                try:
+                    turns_str = str(conversation_data)
+                    turns = decode_conversation(turns_str)
+                except Exception as e_fallback:
+                     logger.debug("Fallback str/json conversion failed: %s", e_fallback)
+                     raise TypeError(f"Unsupported conversation format: {type(conversation_data)}") from e_fallback
 
 
-        # --- Validation after attempting parse/conversion ---
-        if turns is None or not isinstance(turns, list) or not all(isinstance(t, dict) for t in turns):
-           print(f"[DEBUG] Failed to get valid list of dicts for turns in {conv_id}.", file=sys.stderr)
-           return None
-     #   print(f"[DEBUG] Successfully parsed/converted conversation data into list of {len(turns)} turns.")
+            # --- Validation after attempting parse/conversion ---
+            if turns is None or not isinstance(turns, list) or not all(isinstance(t, dict) for t in turns):
+               errors.add('invalid turns', conv_id)
+               return None
+         #   print(f"[DEBUG] Successfully parsed/converted conversation data into list of {len(turns)} turns.")
 
-    except Exception as e:
-        print(f"[DEBUG] Error during conversation parsing/conversion for '{conv_id}': {e}", file=sys.stderr)
-        # import traceback; traceback.print_exc() # Uncomment for full traceback if needed
-        return None
+        except Exception as e:
+            errors.add('parse failed', conv_id, e)
+            return None
 
     # --- Pre-process to find relevant timestamps ---
-    assistant_timestamps = {}
-    for i, turn in enumerate(turns):
-        if turn.get(role_col) == 'assistant':
-            ts_str = turn.get(timestamp_col)
-            parsed_ts = _parse_timestamp(ts_str, timestamp_col) if ts_str is not None else None
-            if parsed_ts:
-                 assistant_timestamps[i] = parsed_ts
+    with stage('render.timestamps'):
+        assistant_timestamps = {}
+        for i, turn in enumerate(turns):
+            if turn.get(role_col) == 'assistant':
+                ts_str = turn.get(timestamp_col)
+                parsed_ts = _parse_timestamp(ts_str, timestamp_col) if ts_str is not None else None
+                if parsed_ts:
+                     assistant_timestamps[i] = parsed_ts
 
     # --- 3. Prepare Metadata (Conversation Level) ---
-    metadata_html = get_metadata_html(conv_id, row)
+    if metadata_html is None:
+        with stage('render.metadata'):
+            metadata_html = get_metadata_html(conv_id, row)
 
     # --- 4. Prepare Avatars ---
     avatars = get_avatars(user_avatar_svg, assistant_avatar_svg)
@@ -174,6 +202,9 @@ def _process_single_conversation(
     base_grid_rows_html_parts = []
     annotation_grid_rows_html_parts = []
     include_annotations_flag = (save_mode == "annotation")
+    virtual = include_annotations_flag and virtualize_turns is not None and len(turns) >= virtualize_turns
+    if virtual:
+        include_annotations_flag = False  # The virtualized view adds annotation cells in the browser
 
     first_user_turn_index = -1
     for i, turn in enumerate(turns):
@@ -181,113 +212,224 @@ def _process_single_conversation(
               first_user_turn_index = i
               break
 
-    for i, turn in enumerate(turns):
-        if not isinstance(turn, dict):
-            continue
-
-        turn_number = i + 1
-        current_role = turn.get(role_col)
-
-        timestamp_to_display_val = None
-        timestamp_for_duration_start_val = None
-        show_duration_flag = False
-
-        if current_role == 'user':
-            next_assistant_idx = -1
-            for k in sorted(assistant_timestamps.keys()):
-                if k > i:
-                    next_assistant_idx = k
-                    break
-            if next_assistant_idx != -1:
-                timestamp_to_display_val = assistant_timestamps[next_assistant_idx]
-
-            if i > first_user_turn_index:
-                prev_assistant_idx = -1
-                for k in sorted(assistant_timestamps.keys(), reverse=True):
-                    if k < i:
-                         prev_assistant_idx = k
-                         break
-                if prev_assistant_idx != -1 and timestamp_to_display_val:
-                    timestamp_for_duration_start_val = assistant_timestamps[prev_assistant_idx]
-                    show_duration_flag = True
-
-        try:
-            base_html_part = get_full_grid_row_html(
-                turn=turn,
-                turn_number=turn_number,
-                avatars=avatars,
-                col_names=turn_col_names,
-                timestamp_to_display=timestamp_to_display_val,
-                timestamp_for_duration_start=timestamp_for_duration_start_val,
-                show_duration=show_duration_flag,
-                include_annotations=False
-            )
-            base_grid_rows_html_parts.append(base_html_part)
-        except Exception as e_html_base:
-             print(f"[DEBUG] Error generating base HTML for turn {turn_number} of '{conv_id}': {e_html_base}", file=sys.stderr)
-
-        if include_annotations_flag:
-             try:
-                  anno_html_part = get_full_grid_row_html(
-                      turn=turn,
-                      turn_number=turn_number,
-                      avatars=avatars,
-                      col_names=turn_col_names,
-                      timestamp_to_display=timestamp_to_display_val,
-                      timestamp_for_duration_start=timestamp_for_duration_start_val,
-                      show_duration=show_duration_flag,
-                      include_annotations=True
-                  )
-                  annotation_grid_rows_html_parts.append(anno_html_part)
-             except Exception as e_html_anno:
-                  print(f"[DEBUG] Error generating annotation HTML for turn {turn_number} of '{conv_id}': {e_html_anno}", file=sys.stderr)
-
+    with stage('render.rows'):
+        for i, turn in enumerate(turns):
+            if not isinstance(turn, dict):
+                continue
+
+            turn_number = i + 1
+            current_role = turn.get(role_col)
+
+            timestamp_to_display_val = None
+            timestamp_for_duration_start_val = None
+            show_duration_flag = False
+
+            if current_role == 'user':
+                next_assistant_idx = -1
+                for k in sorted(assistant_timestamps.keys()):
+                    if k > i:
+                        next_assistant_idx = k
+                        break
+                if next_assistant_idx != -1:
+                    timestamp_to_display_val = assistant_timestamps[next_assistant_idx]
+
+                if i > first_user_turn_index:
+                    prev_assistant_idx = -1
+                    for k in sorted(assistant_timestamps.keys(), reverse=True):
+                        if k < i:
+                             prev_assistant_idx = k
+                             break
+                    if prev_assistant_idx != -1 and timestamp_to_display_val:
+                        timestamp_for_duration_start_val = assistant_timestamps[prev_assistant_idx]
+                        show_duration_flag = True
 
+            try:
+                base_html_part = get_full_grid_row_html(
+                    turn=turn,
+                    turn_number=turn_number,
+                    avatars=avatars,
+                    col_names=turn_col_names,
+                    timestamp_to_display=timestamp_to_display_val,
+                    timestamp_for_duration_start=timestamp_for_duration_start_val,
+                    show_duration=show_duration_flag,
+                    include_annotations=False,
+                    avatar_mode=avatar_mode
+                )
+                base_grid_rows_html_parts.append(base_html_part)
+            except Exception as e_html_base:
+                 errors.add('turn render failed', conv_id, f"turn {turn_number}: {e_html_base}")
+
+            if include_annotations_flag:
+                 try:
+                      anno_html_part = get_full_grid_row_html(
+                          turn=turn,
+                          turn_number=turn_number,
+                          avatars=avatars,
+                          col_names=turn_col_names,
+                          timestamp_to_display=timestamp_to_display_val,
+                          timestamp_for_duration_start=timestamp_for_duration_start_val,
+                          show_duration=show_duration_flag,
+                          include_annotations=True,
+                          avatar_mode=avatar_mode
+                      )
+                      annotation_grid_rows_html_parts.append(anno_html_part)
+                 except Exception as e_html_anno:
+                      errors.add('annotation render failed', conv_id, f"turn {turn_number}: {e_html_anno}")
+
+
+    count('turns_rendered', len(base_grid_rows_html_parts))
     base_chat_rows_html = "\n".join(base_grid_rows_html_parts)
     annotation_chat_rows_html = "\n".join(annotation_grid_rows_html_parts) if include_annotations_flag else base_chat_rows_html
 
+    return {
+        'metadata_html': metadata_html,
+        'base_rows_html': base_chat_rows_html,
+        'base_rows': base_grid_rows_html_parts,
+        'annotation_rows_html': annotation_chat_rows_html,
+        'virtual': virtual,
+        'avatars': avatars,
+    }
+
+
+def _process_single_conversation(
+        df: pd.DataFrame,
+        conv_id: str,
+        theme: str = 'light',
+        custom_css_path: Optional[Union[str, Path]] = None,
+        save_mode: str = "base_html", # save_mode is used below now
+        user_avatar_svg: Optional[str] = None,
+        assistant_avatar_svg: Optional[str] = None,
+        errors: Optional[ErrorSummary] = None,
+        metadata_html: Optional[str] = None,
+        shared_assets: Optional[Dict[str, Optional[str]]] = None,
+        virtualize_turns: Optional[int] = None
+) -> Optional[Dict[str, str]]:
+    """
+    Process a single conversation and return HTML content for both base and annotation modes.
+    Corrected timestamp/duration logic AND function calls.
+
+    Problems are recorded in `errors` (if given) instead of being printed, so a
+    batch reports them once at the end. `metadata_html` can be passed when it
+    was already built for a batch (see get_metadata_html_batch).
+
+    If `shared_assets` (hrefs from write_shared_assets) is given, the page for
+    `save_mode` links to those files instead of inlining CSS, JS and avatars.
+    Annotation pages of conversations with at least `virtualize_turns` turns use
+    the virtualized view.
+    """
+    # With shared assets, avatars are CSS classes defined once instead of per-turn data URIs
+    parts = _render_conversation_parts(
+        df=df,
+        conv_id=conv_id,
+        save_mode=save_mode,
+        user_avatar_svg=user_avatar_svg,
+        assistant_avatar_svg=assistant_avatar_svg,
+        errors=errors,
+        metadata_html=metadata_html,
+        avatar_mode='class' if shared_assets else 'inline',
+        virtualize_turns=virtualize_turns
+    )
+    if parts is None:
+        return None
+    metadata_html = parts['metadata_html']
+    base_chat_rows_html = parts['base_rows_html']
+    annotation_chat_rows_html = parts['annotation_rows_html']
+    avatars = parts['avatars']
 
     # --- 6. Load Custom CSS ---
     custom_css_content = None
     if custom_css_path:
         custom_css_content = _load_file_content(Path(custom_css_path), fallback_content="")
         if not custom_css_content:
-            print(f"Warning: Could not load custom CSS from '{custom_css_path}'. Using theme '{theme}'.", file=sys.stderr)
+            turn_logger.warning('custom_css', "Could not load custom CSS from '%s'. Using theme '%s'.", custom_css_path, theme)
             custom_css_content = None
 
     # --- 7. Generate Full HTML (Using correct signature) ---
-    base_html = generate_full_html(
-        metadata_html=metadata_html,
-        chat_rows_html=base_chat_rows_html,
-        theme=theme,
-        custom_css_content=custom_css_content,
-        include_js=False,
-        include_annotations=False
-    )
+    # The page that gets saved links the shared files; the other one stays self-contained
+    base_links, annotation_links = {}, {}
+    inline_avatar_css = None
+    if shared_assets:
+        links = {'stylesheet_href': shared_assets.get('css'), 'script_src': shared_assets.get('js')}
+        if save_mode == "annotation":
+            annotation_links = links
+        else:
+            base_links = links
+        inline_avatar_css = get_avatar_css({'user': avatars['user'], 'assistant': avatars['assistant'],
+                                            'fallback': avatars['fallback_user']})
+
+    with stage('render.page'):
+        base_html = generate_full_html(
+            metadata_html=metadata_html,
+            chat_rows_html=base_chat_rows_html,
+            theme=theme,
+            custom_css_content=custom_css_content,
+            include_js=False,
+            include_annotations=False,
+            extra_css=None if base_links else inline_avatar_css,
+            **base_links
+        )
 
-    annotation_html = generate_full_html(
-        metadata_html=metadata_html,
-        chat_rows_html=annotation_chat_rows_html, # Use annotation HTML here
-        theme=theme,
-        custom_css_content=custom_css_content,
-        include_js=True,
-        include_annotations=True
-    )
+        annotation_html = generate_full_html(
+            metadata_html=metadata_html,
+            chat_rows_html=annotation_chat_rows_html, # Use annotation HTML here
+            theme=theme,
+            custom_css_content=custom_css_content,
+            include_js=True,
+            include_annotations=True,
+            extra_css=None if annotation_links else inline_avatar_css,
+            virtual_rows=parts['base_rows'] if parts['virtual'] else None,
+            page_id=conv_id,
+            **annotation_links
+        )
 
 
-  #  print(f"[DEBUG] Successfully processed and generated HTML for conv_id: {conv_id}")
     return {
         'base_html': base_html,
         'annotation_html': annotation_html
     }
 
+def _output_filename(cid_str: str, theme: str, save_mode: str,
+                     save: Union[bool, str] = True, tag: Optional[str] = None) -> str:
+    """File name of a saved conversation, e.g. '{conv_id}[_{save}]_{theme}_{static|annot}[_{tag}].html'."""
+    # Get theme and save mode tags for filename
+    theme_tag = "dark" if theme == "dark" else "light"
+    save_mode_tag = "annot" if save_mode == "annotation" else "static"
+
+    # Build filename with theme and save mode tags
+    filename_parts = [cid_str, theme_tag, save_mode_tag]
+
+    # Add user tag if provided
+    if tag is not None:
+        # Basic sanitization for tag
+        safe_tag = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in tag)
+        filename_parts.append(safe_tag)
+
+    # Combine parts with underscores
+    filename = "_".join(filename_parts) + ".html"
+
+    # If save is a string, use it as a filename part after sanitizing
+    if isinstance(save, str):
+        # Basic sanitization for save string
+        safe_save = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in save)
+        # Insert save after cid but before theme/mode tags
+        filename_parts = [cid_str, safe_save, theme_tag, save_mode_tag]
+        if tag is not None:
+            filename_parts.append(safe_tag)
+        filename = "_".join(filename_parts) + ".html"
+
+    # Basic sanitization for filename part from cid_str
+    safe_cid_str = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in cid_str)
+    return filename.replace(cid_str, safe_cid_str)  # Replace original cid with sanitized one
+
+
 # ... (keep _parse_timestamp helper and visualize_conversation function) ...
 
 
 # --- Existing visualize_conversation function remains largely the same ---
 # It should now correctly call the updated _process_single_conversation
+@instrumented
 def visualize_conversation(
-        df: pd.DataFrame,
+        df: Union[pd.DataFrame, ConversationStore, ConversationLookup],
         conv_id: Union[str, List[str], pd.DataFrame, pd.Series],
         theme: str = 'light',
         custom_css_path: Optional[Union[str, Path]] = None,
@@ -297,7 +439,10 @@ def visualize_conversation(
         display: bool = True,
         user_avatar_svg: Optional[str] = None,
         assistant_avatar_svg: Optional[str] = None,
-        tag: Optional[str] = None
+        tag: Optional[str] = None,
+        assets: str = "inline",
+        minify: bool = False,
+        virtualize_turns: Optional[int] = None
 ) -> None:  # Return type is None
     """
     Generates HTML visualization for conversations with options for display and saving.
@@ -305,8 +450,9 @@ def visualize_conversation(
 
     Parameters:
     -----------
-    df : pd.DataFrame
-        DataFrame containing conversation data
+    df : pd.DataFrame, ConversationStore or ConversationLookup
+        DataFrame containing conversation data. If a ConversationStore or
+        ConversationLookup is given, only the requested conversations are read from it.
     conv_id : str, list[str], DataFrame, or Series
         - If str: A single conversation ID to visualize
         - If list[str]: Multiple conversation IDs to process
@@ -332,6 +478,18 @@ def visualize_conversation(
         Custom SVG content for assistant avatar
     tag : str or None
         Optional tag to add to the end of the filename
+    assets : str
+        'inline': Every saved file embeds its CSS, JavaScript and avatar images
+        'external': Write the stylesheet, script and avatars once to
+        save_dir/chatlab_assets and link them from every saved file; avatars
+        are referenced through CSS classes. Much smaller exports for large batches.
+    minify : bool
+        Strip indentation, blank lines and CSS comments from saved files
+    virtualize_turns : int or None
+        In 'annotation' mode, conversations with at least this many turns are
+        saved with a virtualized view: turns are embedded once and only rows near
+        the viewport are in the DOM, with annotations kept in a JavaScript model
+        (saved to localStorage). None (the default) always uses the regular view.
 
     Returns:
     --------
@@ -340,23 +498,27 @@ def visualize_conversation(
     # Normalize save_mode to lowercase
     save_mode = save_mode.lower()
     if save_mode not in ["base_html", "annotation"]:
-        print(f"Warning: Invalid save_mode '{save_mode}'. Using 'base_html'.", file=sys.stderr)
+        logger.warning("Invalid save_mode '%s'. Using 'base_html'.", save_mode)
         save_mode = "base_html"
 
     # Normalize theme to lowercase
     theme = theme.lower()
     if theme not in ["light", "dark"]:
-        print(f"Warning: Invalid theme '{theme}'. Using 'light'.", file=sys.stderr)
+        logger.warning("Invalid theme '%s'. Using 'light'.", theme)
         theme = "light"
 
+    assets = assets.lower()
+    if assets not in ["inline", "external"]:
+        logger.warning("Invalid assets '%s'. Using 'inline'.", assets)
+        assets = "inline"
+
     # Handle save_dir
     if save_dir is not None:
         save_dir_path = Path(save_dir)
         try:
             save_dir_path.mkdir(parents=True, exist_ok=True)
         except Exception as e:
-            print(f"Error creating directory '{save_dir}': {e}", file=sys.stderr)
-            print("Files will be saved to current working directory.", file=sys.stderr)
+            logger.error("Error creating directory '%s': %s. Files will be saved to current working directory.", save_dir, e)
             save_dir_path = Path.cwd()
     else:
         save_dir_path = Path.cwd()
@@ -379,7 +541,7 @@ def visualize_conversation(
             if conv_ids:
                 display_id = random.choice(conv_ids)
         else:
-            print(f"Error: '{conv_id_col}' column not found in provided DataFrame.", file=sys.stderr)
+            logger.error("'%s' column not found in provided DataFrame.", conv_id_col)
             return None
     elif isinstance(conv_id, pd.Series):
         # Check if the series contains conv_ids (e.g., result of df[conv_id_col])
@@ -390,26 +552,58 @@ def visualize_conversation(
             conv_ids = [str(conv_id.iloc[0])]
         else:
             # Fallback or error if series content is ambiguous
-            print(f"Error: Could not reliably extract conversation ID(s) from the provided Series.", file=sys.stderr)
+            logger.error("Could not reliably extract conversation ID(s) from the provided Series.")
             return None
 
         if conv_ids:
             display_id = random.choice(conv_ids)
     else:
-        print(f"Error: conv_id must be str, list[str], DataFrame, or Series. Got {type(conv_id)}", file=sys.stderr)
+        logger.error("conv_id must be str, list[str], DataFrame, or Series. Got %s", type(conv_id))
         return None
     # --- End: Define conv_ids based on input type ---
 
     # Now check if conv_ids was successfully populated
     if not conv_ids:
-        print("Error: No valid conversation IDs found or extracted.", file=sys.stderr)
+        logger.error("No valid conversation IDs found or extracted.")
         return None  # Keep return None
 
+    # Read just the requested conversations from a store or lookup
+    if isinstance(df, ConversationStore):
+        df = df.conversation_rows(conv_ids)
+    elif isinstance(df, ConversationLookup):
+        df = df.rows(conv_ids)
+
     # Process all conversations
     processed_results = {}
+    # Per-conversation problems are collected here and logged once below
+    errors = ErrorSummary(logger, 'conversations', rate_limited=_TURN_LOGGERS)
+    errors.total = len(conv_ids)
     # Use the pre-selected display_id if needed later
     actual_display_id = display_id  # Store the randomly chosen ID if we need it for display
 
+    # Shared files for external-asset exports are written once, before any page
+    shared_assets = None
+    if save and assets == "external":
+        custom_css_content = _load_file_content(Path(custom_css_path), fallback_content="") if custom_css_path else None
+        shared_assets = write_shared_assets(
+            save_dir_path,
+            theme=theme,
+            include_annotations=(save_mode == "annotation"),
+            custom_css_content=custom_css_content or None,
+            user_avatar_svg=user_avatar_svg,
+            assistant_avatar_svg=assistant_avatar_svg,
+            minify=minify
+        )
+
+    # Build the metadata headers for the whole batch at once, column by column
+    metadata = {}
+    if len(conv_ids) > 1 and isinstance(df, pd.DataFrame) and conv_id_col in df.columns:
+        with stage('render.metadata'):
+            requested = df[df[conv_id_col].isin({str(cid) for cid in conv_ids})]
+            requested = requested[~requested[conv_id_col].duplicated()]
+            metadata = dict(zip(requested[conv_id_col].astype(str), get_metadata_html_batch(requested)))
+        df = requested  # Later per-conversation lookups only scan the requested rows
+
     for cid in conv_ids:
         # Call the updated processing function
         result = _process_single_conversation(
@@ -419,85 +613,78 @@ def visualize_conversation(
             custom_css_path=custom_css_path,
             save_mode=save_mode,  # Pass save_mode down if needed by _process
             user_avatar_svg=user_avatar_svg,
-            assistant_avatar_svg=assistant_avatar_svg
+            assistant_avatar_svg=assistant_avatar_svg,
+            errors=errors,
+            metadata_html=metadata.get(str(cid)),
+            shared_assets=shared_assets,
+            virtualize_turns=virtualize_turns
         )
 
         if result:
             processed_results[str(cid)] = result  # Ensure dictionary keys are strings
+            count('conversations_rendered')
+
+    errors.log()
 
     # Handle display
     if display and actual_display_id and str(actual_display_id) in processed_results:
         # Display the version corresponding to the save_mode? Or always base? Stick to base.
         html_content_to_display = processed_results[str(actual_display_id)]['base_html']
-
-        if _IPYTHON_AVAILABLE:
+        if shared_assets:
+            # Saved pages link files relative to save_dir; render a self-contained copy to display
+            display_result = _process_single_conversation(
+                df=df, conv_id=str(actual_display_id), theme=theme, custom_css_path=custom_css_path,
+                save_mode="base_html", user_avatar_svg=user_avatar_svg,
+                assistant_avatar_svg=assistant_avatar_svg, metadata_html=metadata.get(str(actual_display_id)))
+            html_content_to_display = display_result['base_html']
+
+        ipython = _get_ipython_display()
+        if ipython is not None:
+            ipython_display, HTML = ipython
             ipython_display(HTML(html_content_to_display))
             # Add note about interactive features if saving annotation version
             if save_mode == "annotation" and save:
-                print("NOTE: Interactive features (like annotations) will be available in the saved HTML file.")
+                logger.info("Interactive features (like annotations) will be available in the saved HTML file.")
         else:
-            print("Warning: IPython is not installed. Cannot display HTML inline.", file=sys.stderr)
-            print("You can save the HTML to a file using save=True or providing a save path.", file=sys.stderr)
+            logger.warning("IPython is not installed. Cannot display HTML inline. "
+                           "You can save the HTML to a file using save=True or providing a save path.")
     elif display:
-        print(
-            f"Warning: Could not display conversation. Display ID '{actual_display_id}' not found in processed results.",
-            file=sys.stderr)
+        logger.warning("Could not display conversation. Display ID '%s' not found in processed results.",
+                       actual_display_id)
 
     # Handle saving
     if save:
-        # Get theme and save mode tags for filename
-        theme_tag = "dark" if theme == "dark" else "light"
-        save_mode_tag = "annot" if save_mode == "annotation" else "static"
-
         saved_files = []
+        save_errors = ErrorSummary(logger, 'files')
         for cid_str, result in processed_results.items():
             # Determine which HTML version to save
             html_to_save = result['annotation_html'] if save_mode == "annotation" else result['base_html']
+            if minify:
+                html_to_save = minify_html(html_to_save)
 
-            # Build filename with theme and save mode tags
-            filename_parts = [cid_str, theme_tag, save_mode_tag]
-
-            # Add user tag if provided
-            if tag is not None:
-                # Basic sanitization for tag
-                safe_tag = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in tag)
-                filename_parts.append(safe_tag)
-
-            # Combine parts with underscores
-            filename = "_".join(filename_parts) + ".html"
-
-            # If save is a string, use it as a filename part after sanitizing
-            if isinstance(save, str):
-                # Basic sanitization for save string
-                safe_save = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in save)
-                # Insert save after cid but before theme/mode tags
-                filename_parts = [cid_str, safe_save, theme_tag, save_mode_tag]
-                if tag is not None:
-                    filename_parts.append(safe_tag)
-                filename = "_".join(filename_parts) + ".html"
-
-            # Basic sanitization for filename part from cid_str
-            safe_cid_str = "".join(c if c.isalnum() or c in ('-', '_') else '_' for c in cid_str)
-            filename = filename.replace(cid_str, safe_cid_str)  # Replace original cid with sanitized one
-
+            filename = _output_filename(cid_str, theme, save_mode, save, tag)
             save_filepath = save_dir_path / filename
 
             try:
-                with open(save_filepath, 'w', encoding='utf-8') as f:
-                    f.write(html_to_save)
+                with stage('render.write'):
+                    with open(save_filepath, 'w', encoding='utf-8') as f:
+                        bytes_written = f.write(html_to_save)
+                count('files_written')
+                count('bytes_written', bytes_written)
                 saved_files.append(str(save_filepath.resolve()))
             except Exception as e:
-                print(f"Error saving to '{save_filepath}': {e}", file=sys.stderr)
+                save_errors.add('save failed', save_filepath, e)
 
+        save_errors.log(logging.ERROR)
         if saved_files:
             if len(saved_files) == 1:
-                print(f"Saved to: {saved_files[0]}")
+                logger.info("Saved to: %s", saved_files[0])
             else:
-                print(f"Saved {len(saved_files)} files to {save_dir_path}")
+                logger.info("Saved %d files to %s", len(saved_files), save_dir_path)
             if save_mode == "annotation":
-                print("Note: Files saved with full annotation features.")
-        elif processed_results:  # Only print error if we expected to save something
-            print("No files were saved due to errors. See above for details.")
+                logger.info("Files saved with full annotation features.")
+        elif processed_results:  # Only report if we expected to save something
+            logger.error("No files were saved due to errors. See above for details.")
 
     # Return None as per the function's design
     return None
\ No newline at end of file
@@ -0,0 +1,219 @@
+# chatlab/visualization/browser.py
+import base64
+import gzip
+import html
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .html_generator import get_metadata_html_batch, get_page_css, get_avatar_css
+from .resources import get_avatars, load_browser_assets
+from . import _render_conversation_parts, _TURN_LOGGERS
+from ..colnames import colnames
+from ..store import ConversationStore
+from ..lookup import ConversationLookup
+from ..log_utils import ErrorSummary
+from ..profiling import instrumented, stage, count
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = 'data'
+
+# Conversation-level fields listed in the browser index (when present), besides conv_id
+INDEX_FIELDS = ('source', 'model', 'language', 'turns', 'n_words', 'start')
+
+
+def _json_value(value: Any) -> Any:
+    """Converts an index cell to a JSON-serializable value."""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if hasattr(value, 'item'):
+        return value.item()
+    return value if isinstance(value, (int, float, str, bool)) else str(value)
+
+
+def _write_data_file(path: Path, name: str, payload: Any, compress: bool) -> int:
+    """Write a data file that hands payload to window.chatlabData(); returns bytes written."""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    if compress:
+        encoded = base64.b64encode(gzip.compress(data.encode('utf-8'), compresslevel=6)).decode('ascii')
+        script = f'window.chatlabData({json.dumps(name)},"{encoded}",true);\n'
+    else:
+        # Escape '</' so the payload could also be inlined in a <script> element
+        data = data.replace('</', '<\\/')
+        script = f'window.chatlabData({json.dumps(name)},{data},false);\n'
+    content = script.encode('utf-8')
+    path.write_bytes(content)
+    count('files_written')
+    count('bytes_written', len(content))
+    return len(content)
+
+
+def _viewer_html(title: str, theme: str, avatars: Dict[str, str]) -> str:
+    browser_css, browser_js = load_browser_assets()
+    css = '\n'.join([
+        get_page_css(theme, include_annotations=False),
+        get_avatar_css({'user': avatars['user'], 'assistant': avatars['assistant'],
+                        'fallback': avatars['fallback_user']}),
+        browser_css,
+    ])
+    config = json.dumps({'dataDir': DATA_DIR}).replace('</', '<\\/')
+    return f'''<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{html.escape(title)}</title>
+    <style>
+    {css}
+    </style>
+</head>
+<body class="{theme}-theme browser">
+    <div class="browser-sidebar">
+        <input id="browser-search" class="browser-search" type="search" placeholder="Filter conversations...">
+        <div id="browser-count" class="browser-count"></div>
+        <div id="browser-list" class="browser-list">
+            <div id="browser-list-spacer"></div>
+            <div id="browser-list-items" class="browser-list-items"></div>
+        </div>
+    </div>
+    <div id="browser-main" class="browser-main"></div>
+    <script id="browser-config" type="application/json">{config}</script>
+    <script>{browser_js}</script>
+</body>
+</html>'''
+
+
+@instrumented
+def export_browser(
+        df: Union[pd.DataFrame, ConversationStore, ConversationLookup],
+        conv_ids: Optional[Union[List[str], pd.Series]] = None,
+        save_dir: Union[str, Path] = 'chatlab_browser',
+        theme: str = 'light',
+        title: str = 'Conversations',
+        chunk_size: int = 200,
+        compress: bool = True,
+        user_avatar_svg: Optional[str] = None,
+        assistant_avatar_svg: Optional[str] = None
+) -> Path:
+    """
+    Export many conversations as one browsable viewer instead of one HTML file each.
+
+    Writes save_dir/index.html (the viewer: a searchable, virtually scrolled list
+    of conversations next to a reading pane) and save_dir/data/, holding the
+    index and the pre-rendered conversations in chunks of chunk_size. The
+    viewer loads a chunk only when one of its conversations is opened, so it
+    stays fast for thousands of conversations and works straight from disk
+    (file:// URLs); copy the whole directory to move it.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame, ConversationStore or ConversationLookup
+        Conversation data. Stores and lookups are read one chunk at a time.
+    conv_ids : list[str], Series or None
+        Conversations to export, in display order. Defaults to all conversations
+        in df (required for a ConversationLookup).
+    save_dir : str or Path
+        Output directory; created if needed.
+    theme : str
+        'light' or 'dark'
+    title : str
+        Page title of the viewer.
+    chunk_size : int, default=200
+        Conversations per data file.
+    compress : bool, default=True
+        gzip + base64 encode the data files. Decompressing needs a browser with
+        DecompressionStream (all current ones); use False for older browsers.
+    user_avatar_svg, assistant_avatar_svg : str or None
+        Custom SVG content for the avatars.
+
+    Returns:
+    --------
+    Path
+        Path of the written index.html.
+    """
+    conv_id_col = colnames['conv']['conv_id']
+    theme = theme.lower()
+    if theme not in ('light', 'dark'):
+        logger.warning("Invalid theme '%s'. Using 'light'.", theme)
+        theme = 'light'
+
+    if conv_ids is None:
+        if isinstance(df, ConversationLookup):
+            raise ValueError("conv_ids is required when exporting from a ConversationLookup")
+        if isinstance(df, ConversationStore):
+            conv_ids = df.read_conversations(columns=[conv_id_col])[conv_id_col].tolist()
+        else:
+            conv_ids = df[conv_id_col].tolist()
+    conv_ids = list(dict.fromkeys(str(cid) for cid in conv_ids))
+
+    save_dir = Path(save_dir)
+    data_dir = save_dir / DATA_DIR
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    if isinstance(df, pd.DataFrame):
+        # Row position of each conversation, so chunks are selected without rescanning df
+        id_series = df[conv_id_col].astype(str)
+        first_rows = pd.Series(np.arange(len(df)), index=id_series.to_numpy())[~id_series.duplicated().to_numpy()]
+
+    avatars = get_avatars(user_avatar_svg, assistant_avatar_svg)
+    index_fields = [('conv_id', conv_id_col)]
+    index_rows = []
+    errors = ErrorSummary(logger, 'conversations', rate_limited=_TURN_LOGGERS)
+    errors.total = len(conv_ids)
+    total_bytes = 0
+
+    for chunk_number, start in enumerate(range(0, len(conv_ids), chunk_size)):
+        chunk_ids = conv_ids[start:start + chunk_size]
+        with stage('browser.read'):
+            if isinstance(df, ConversationStore):
+                rows = df.conversation_rows(chunk_ids)
+            elif isinstance(df, ConversationLookup):
+                rows = df.rows(chunk_ids)
+            else:
+                rows = df.iloc[first_rows.reindex(chunk_ids).dropna().astype(int).to_numpy()]
+            rows = rows[~rows[conv_id_col].duplicated()]
+
+        if chunk_number == 0:
+            index_fields += [(field, colnames['conv'].get(field, field)) for field in INDEX_FIELDS
+                             if colnames['conv'].get(field, field) in rows.columns]
+
+        with stage('render.metadata'):
+            metadata = dict(zip(rows[conv_id_col].astype(str), get_metadata_html_batch(rows)))
+        row_ids = rows[conv_id_col].astype(str).tolist()
+        field_values = {column: dict(zip(row_ids, rows[column].tolist())) for _, column in index_fields[1:]}
+
+        records = {}
+        for cid in chunk_ids:
+            parts = _render_conversation_parts(
+                df=rows, conv_id=cid, errors=errors, metadata_html=metadata.get(cid), avatar_mode='class')
+            if parts is None:
+                continue
+            records[cid] = {'metadata': parts['metadata_html'], 'rows': parts['base_rows_html']}
+            index_rows.append([cid] + [_json_value(field_values[column][cid]) for _, column in index_fields[1:]]
+                              + [chunk_number])
+            count('conversations_rendered')
+
+        with stage('browser.write'):
+            total_bytes += _write_data_file(data_dir / f'chunk-{chunk_number:05d}.js',
+                                            f'chunk-{chunk_number:05d}', records, compress)
+
+    errors.log()
+    index = {'columns': [field for field, _ in index_fields] + ['chunk'], 'rows': index_rows}
+    with stage('browser.write'):
+        total_bytes += _write_data_file(data_dir / 'index.js', 'index', index, compress)
+        index_path = save_dir / 'index.html'
+        page = _viewer_html(title, theme, avatars)
+        index_path.write_text(page, encoding='utf-8')
+        count('files_written')
+        count('bytes_written', len(page))
+
+    logger.info("Exported %d conversations to %s (%.1f MB of data)",
+                len(index_rows), index_path, total_bytes / 2**20)
+    return index_path
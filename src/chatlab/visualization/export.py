@@ -0,0 +1,458 @@
+# chatlab/visualization/export.py
+import asyncio
+import io
+import logging
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .html_generator import get_metadata_html_batch
+from .shared_assets import build_shared_assets, write_shared_assets, minify_html
+from .resources import _load_file_content
+from . import _process_single_conversation, _output_filename, _TURN_LOGGERS
+from ..colnames import colnames
+from ..store import ConversationStore
+from ..lookup import ConversationLookup
+from ..log_utils import ErrorSummary
+from ..profiling import stage, count
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FORMATS = ('tar', 'tar.gz', 'zip')
+
+
+class ExportProgress:
+    """
+    State of an export_conversations() run.
+
+    Passed to the progress callback after every written chunk and returned
+    when the export finishes.
+
+    Attributes:
+    -----------
+    total : int
+        Conversations requested.
+    rendered, written, failed : int
+        Conversations rendered, saved, and skipped because rendering or
+        writing them failed.
+    bytes_written : int
+        Size of the saved pages (uncompressed, for archives).
+    paths : list[str]
+        Saved files, or member names when writing to an archive.
+    elapsed : float
+        Seconds since the export started.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.rendered = 0
+        self.written = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.paths: List[str] = []
+        self._start = time.perf_counter()
+        self.finished_seconds: Optional[float] = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.finished_seconds is not None:
+            return self.finished_seconds
+        return time.perf_counter() - self._start
+
+    @property
+    def done(self) -> int:
+        return self.written + self.failed
+
+    def __repr__(self) -> str:
+        return (f"ExportProgress({self.done}/{self.total} done, {self.written} written, "
+                f"{self.failed} failed, {self.bytes_written / 2**20:.1f} MB, {self.elapsed:.1f}s)")
+
+
+def _log_progress() -> Callable[[ExportProgress], None]:
+    """Default progress callback: logs at INFO every 10% of the conversations."""
+    reported = [0]
+
+    def report(progress: ExportProgress) -> None:
+        tenth = progress.done * 10 // max(progress.total, 1)
+        if tenth > reported[0]:
+            reported[0] = tenth
+            logger.info("Exported %d/%d conversations (%.0f%%, %.1f MB, %.1fs)", progress.done, progress.total,
+                        100 * progress.done / max(progress.total, 1), progress.bytes_written / 2**20, progress.elapsed)
+
+    return report
+
+
+# --- Output sinks. Each is used from one thread at a time, except the
+# --- directory sink, which the writers share.
+
+class _DirectorySink:
+    def __init__(self, save_dir: Path):
+        self.save_dir = save_dir
+
+    def write(self, name: str, data: bytes) -> str:
+        path = self.save_dir / name
+        path.write_bytes(data)
+        return str(path)
+
+    def close(self) -> None:
+        pass
+
+
+class _TarSink:
+    def __init__(self, target: Union[Path, BinaryIO], compress: bool):
+        if isinstance(target, Path):
+            self.tar = tarfile.open(target, 'w:gz' if compress else 'w')
+        else:
+            # Stream mode: the target does not need to be seekable (e.g. a socket or pipe)
+            self.tar = tarfile.open(fileobj=target, mode='w|gz' if compress else 'w|')
+        self.mtime = time.time()
+
+    def write(self, name: str, data: bytes) -> str:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = self.mtime
+        info.mode = 0o644
+        self.tar.addfile(info, io.BytesIO(data))
+        return name
+
+    def close(self) -> None:
+        self.tar.close()
+
+
+class _ZipSink:
+    def __init__(self, target: Union[Path, BinaryIO]):
+        # zipfile also writes to non-seekable streams, using data descriptors
+        self.zip = zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED)
+
+    def write(self, name: str, data: bytes) -> str:
+        self.zip.writestr(name, data)
+        return name
+
+    def close(self) -> None:
+        self.zip.close()
+
+
+def _archive_format(archive: Union[str, Path, BinaryIO], archive_format: Optional[str]) -> str:
+    if archive_format is None:
+        name = str(archive) if isinstance(archive, (str, Path)) else str(getattr(archive, 'name', ''))
+        name = name.lower()
+        if name.endswith(('.tar.gz', '.tgz')):
+            archive_format = 'tar.gz'
+        elif name.endswith('.tar'):
+            archive_format = 'tar'
+        elif name.endswith('.zip'):
+            archive_format = 'zip'
+        else:
+            raise ValueError("Cannot infer the archive format; pass archive_format ('tar', 'tar.gz' or 'zip')")
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"archive_format must be one of {ARCHIVE_FORMATS}, got {archive_format!r}")
+    return archive_format
+
+
+def _open_sink(save_dir: Path, archive: Optional[Union[str, Path, BinaryIO]], archive_format: Optional[str]):
+    if archive is None:
+        save_dir.mkdir(parents=True, exist_ok=True)
+        return _DirectorySink(save_dir)
+    archive_format = _archive_format(archive, archive_format)
+    target = Path(archive) if isinstance(archive, (str, Path)) else archive
+    if isinstance(target, Path):
+        target.parent.mkdir(parents=True, exist_ok=True)
+    if archive_format == 'zip':
+        return _ZipSink(target)
+    return _TarSink(target, compress=(archive_format == 'tar.gz'))
+
+
+def _render_chunk(rows: pd.DataFrame, conv_ids: List[str],
+                  options: Dict[str, Any]) -> Tuple[List[Tuple[str, Optional[bytes]]], Dict[str, list]]:
+    """
+    Render the pages of one chunk of conversations; runs in the executor.
+
+    Module-level (and returning plain data) so it can also run in a process pool.
+    Returns (conv_id, encoded page or None) pairs and the problems encountered.
+    """
+    conv_id_col = colnames['conv']['conv_id']
+    errors = ErrorSummary(logger, 'conversations', rate_limited=_TURN_LOGGERS)
+    with stage('render.metadata'):
+        metadata = dict(zip(rows[conv_id_col].astype(str), get_metadata_html_batch(rows)))
+    page_key = 'annotation_html' if options['save_mode'] == 'annotation' else 'base_html'
+
+    pages = []
+    for cid in conv_ids:
+        result = _process_single_conversation(
+            df=rows,
+            conv_id=cid,
+            theme=options['theme'],
+            custom_css_path=options['custom_css_path'],
+            save_mode=options['save_mode'],
+            user_avatar_svg=options['user_avatar_svg'],
+            assistant_avatar_svg=options['assistant_avatar_svg'],
+            errors=errors,
+            metadata_html=metadata.get(cid),
+            shared_assets=options['shared_assets'],
+            virtualize_turns=options['virtualize_turns']
+        )
+        if result is None:
+            pages.append((cid, None))
+            continue
+        page = result[page_key]
+        if options['minify']:
+            page = minify_html(page)
+        pages.append((cid, page.encode('utf-8')))
+        count('conversations_rendered')
+    return pages, errors.errors
+
+
+def _write_chunk(sink, files: List[Tuple[str, bytes]]) -> Tuple[List[str], int, List[Tuple[str, str]]]:
+    """Write (name, data) pairs to the sink; returns the paths, bytes written and failures."""
+    paths, failures = [], []
+    total_bytes = 0
+    with stage('render.write'):
+        for name, data in files:
+            try:
+                paths.append(sink.write(name, data))
+            except Exception as e:
+                failures.append((name, str(e)))
+                continue
+            total_bytes += len(data)
+            count('files_written')
+            count('bytes_written', len(data))
+    return paths, total_bytes, failures
+
+
+async def export_conversations(
+        df: Union[pd.DataFrame, ConversationStore, ConversationLookup],
+        conv_ids: Optional[Union[List[str], pd.Series]] = None,
+        save_dir: Union[str, Path] = 'chatlab_export',
+        archive: Optional[Union[str, Path, BinaryIO]] = None,
+        archive_format: Optional[str] = None,
+        theme: str = 'light',
+        save_mode: str = 'base_html',
+        custom_css_path: Optional[Union[str, Path]] = None,
+        user_avatar_svg: Optional[str] = None,
+        assistant_avatar_svg: Optional[str] = None,
+        tag: Optional[str] = None,
+        assets: str = 'inline',
+        minify: bool = False,
+        virtualize_turns: Optional[int] = None,
+        executor: Optional[Union[str, Executor]] = None,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 32,
+        queue_size: int = 8,
+        max_concurrent_writes: int = 4,
+        progress: Optional[Union[bool, Callable[[ExportProgress], None]]] = None
+) -> ExportProgress:
+    """
+    Asynchronously save many conversations as HTML pages.
+
+    Conversations are rendered in chunks of chunk_size in an executor while
+    already rendered chunks are written, so rendering and file I/O overlap
+    instead of alternating. Rendered chunks wait in a queue of at most
+    queue_size chunks, which bounds memory: rendering pauses when the writers
+    fall behind. Pages are named as by visualize_conversation(save=True).
+
+    Use `await export_conversations(...)` in a notebook or other running event
+    loop and `asyncio.run(export_conversations(...))` elsewhere.
+
+    Parameters:
+    -----------
+    df : pd.DataFrame, ConversationStore or ConversationLookup
+        Conversation data. Stores and lookups are read one chunk at a time.
+    conv_ids : list[str], Series or None
+        Conversations to export. Defaults to all conversations in df (required
+        for a ConversationLookup).
+    save_dir : str or Path
+        Output directory; created if needed. Ignored when archive is given.
+    archive : str, Path, binary file object or None
+        Write all pages (and shared assets) into one tar or zip archive instead
+        of individual files. File objects need not be seekable, so pages can be
+        streamed to a pipe or socket; they are left open.
+    archive_format : str or None
+        'tar', 'tar.gz' or 'zip'. Inferred from the archive's file name if None.
+    theme, save_mode, custom_css_path, user_avatar_svg, assistant_avatar_svg, tag :
+        As for visualize_conversation.
+    assets : str
+        'inline' or 'external', as for visualize_conversation. External assets
+        are written once, next to the pages or into the archive.
+    minify : bool
+        Whitespace-minify the saved pages.
+    virtualize_turns : int or None
+        As for visualize_conversation.
+    executor : None, 'thread', 'process' or concurrent.futures.Executor
+        Where pages are rendered. Threads (the default) overlap rendering with
+        writing; rendering itself holds the GIL, so use 'process' to render on
+        several cores for large exports. Executors passed in are not shut down.
+    max_workers : int or None
+        Workers of the executor created for 'thread'/'process', and number of
+        chunks rendered concurrently. Defaults to the number of CPUs.
+    chunk_size : int, default=32
+        Conversations rendered per executor task.
+    queue_size : int, default=8
+        Rendered chunks that may wait to be written.
+    max_concurrent_writes : int, default=4
+        Chunks written concurrently to save_dir. Archives are written sequentially.
+    progress : bool, callable or None
+        Called with the ExportProgress after every written chunk. True logs
+        progress at INFO level every 10%.
+
+    Returns:
+    --------
+    ExportProgress
+        Final counts and the saved paths (archive member names for archives).
+
+    Examples:
+    ---------
+    >>> result = await clb.export_conversations(df, save_dir='pages', executor='process', progress=True)
+    >>> result = asyncio.run(clb.export_conversations(store, archive='pages.tar.gz', save_mode='annotation'))
+    """
+    conv_id_col = colnames['conv']['conv_id']
+    save_mode = save_mode.lower()
+    if save_mode not in ('base_html', 'annotation'):
+        logger.warning("Invalid save_mode '%s'. Using 'base_html'.", save_mode)
+        save_mode = 'base_html'
+    theme = theme.lower()
+    if theme not in ('light', 'dark'):
+        logger.warning("Invalid theme '%s'. Using 'light'.", theme)
+        theme = 'light'
+    assets = assets.lower()
+    if assets not in ('inline', 'external'):
+        logger.warning("Invalid assets '%s'. Using 'inline'.", assets)
+        assets = 'inline'
+    if chunk_size < 1 or queue_size < 1 or max_concurrent_writes < 1:
+        raise ValueError("chunk_size, queue_size and max_concurrent_writes must be at least 1")
+
+    if conv_ids is None:
+        if isinstance(df, ConversationLookup):
+            raise ValueError("conv_ids is required when exporting from a ConversationLookup")
+        if isinstance(df, ConversationStore):
+            conv_ids = df.read_conversations(columns=[conv_id_col])[conv_id_col].tolist()
+        else:
+            conv_ids = df[conv_id_col].tolist()
+    conv_ids = list(dict.fromkeys(str(cid) for cid in conv_ids))
+    chunks = [conv_ids[start:start + chunk_size] for start in range(0, len(conv_ids), chunk_size)]
+
+    if isinstance(df, pd.DataFrame):
+        # Row position of each conversation, so chunks are selected without rescanning df
+        id_series = df[conv_id_col].astype(str)
+        first_rows = pd.Series(np.arange(len(df)), index=id_series.to_numpy())[~id_series.duplicated().to_numpy()]
+
+    state = ExportProgress(len(conv_ids))
+    if progress is True:
+        progress = _log_progress()
+    elif progress is False:
+        progress = None
+    errors = ErrorSummary(logger, 'conversations', rate_limited=_TURN_LOGGERS)
+    errors.total = len(conv_ids)
+
+    loop = asyncio.get_running_loop()
+    n_workers = max_workers or os.cpu_count() or 1
+    owned_executor = None
+    if executor is None or executor == 'thread':
+        executor = owned_executor = ThreadPoolExecutor(max_workers=n_workers, thread_name_prefix='chatlab-render')
+    elif executor == 'process':
+        executor = owned_executor = ProcessPoolExecutor(max_workers=n_workers)
+    elif not isinstance(executor, Executor):
+        raise ValueError(f"executor must be None, 'thread', 'process' or an Executor, got {executor!r}")
+    # File I/O gets its own threads so it never waits behind rendering
+    io_executor = ThreadPoolExecutor(max_workers=max_concurrent_writes, thread_name_prefix='chatlab-write')
+
+    save_dir = Path(save_dir)
+    sink = None
+    try:
+        sink = await loop.run_in_executor(io_executor, _open_sink, save_dir, archive, archive_format)
+
+        shared_assets = None
+        if assets == 'external':
+            custom_css_content = _load_file_content(Path(custom_css_path), fallback_content="") if custom_css_path else None
+            asset_options = dict(theme=theme, include_annotations=(save_mode == 'annotation'),
+                                 custom_css_content=custom_css_content or None, user_avatar_svg=user_avatar_svg,
+                                 assistant_avatar_svg=assistant_avatar_svg, minify=minify)
+            if archive is None:
+                shared_assets = await loop.run_in_executor(
+                    io_executor, lambda: write_shared_assets(save_dir, **asset_options))
+            else:
+                asset_files, shared_assets = build_shared_assets(**asset_options)
+                await loop.run_in_executor(io_executor, _write_chunk, sink, list(asset_files.items()))
+
+        options = dict(theme=theme, custom_css_path=custom_css_path, save_mode=save_mode,
+                       user_avatar_svg=user_avatar_svg, assistant_avatar_svg=assistant_avatar_svg,
+                       shared_assets=shared_assets, virtualize_turns=virtualize_turns, minify=minify)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        pending_chunks = iter(chunks)
+        read_lock = asyncio.Lock()  # Stores and lookups are read one chunk at a time
+
+        async def read_rows(chunk_ids: List[str]) -> pd.DataFrame:
+            if isinstance(df, ConversationStore):
+                async with read_lock:
+                    rows = await loop.run_in_executor(io_executor, df.conversation_rows, chunk_ids)
+            elif isinstance(df, ConversationLookup):
+                async with read_lock:
+                    rows = await loop.run_in_executor(io_executor, df.rows, chunk_ids)
+            else:
+                rows = df.iloc[first_rows.reindex(chunk_ids).dropna().astype(int).to_numpy()]
+            return rows[~rows[conv_id_col].duplicated()]
+
+        async def render_worker() -> None:
+            # Chunks are handed out from a shared iterator; the event loop runs one worker at a time
+            for chunk_ids in pending_chunks:
+                rows = await read_rows(chunk_ids)
+                pages, chunk_errors = await loop.run_in_executor(executor, _render_chunk, rows, chunk_ids, options)
+                for category, items in chunk_errors.items():
+                    for item_id, error in items:
+                        errors.add(category, item_id, error)
+                await queue.put(pages)
+
+        async def render_all(n_writers: int) -> None:
+            await asyncio.gather(*(render_worker() for _ in range(min(n_workers, len(chunks)) or 1)))
+            for _ in range(n_writers):
+                await queue.put(None)
+
+        async def write_worker() -> None:
+            while True:
+                pages = await queue.get()
+                if pages is None:
+                    return
+                files = [(_output_filename(cid, theme, save_mode, True, tag), data)
+                         for cid, data in pages if data is not None]
+                paths, chunk_bytes, failures = await loop.run_in_executor(io_executor, _write_chunk, sink, files)
+                for name, error in failures:
+                    errors.add('save failed', name, error)
+                state.rendered += len(files)
+                state.written += len(paths)
+                state.failed += len(pages) - len(paths)
+                state.bytes_written += chunk_bytes
+                state.paths.extend(paths)
+                if progress is not None:
+                    progress(state)
+
+        n_writers = 1 if archive is not None else max_concurrent_writes
+        tasks = [asyncio.ensure_future(render_all(n_writers))]
+        tasks += [asyncio.ensure_future(write_worker()) for _ in range(n_writers)]
+        with stage('export_conversations'):
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # A failed writer would otherwise leave the renderers blocked on a full queue
+                for task in tasks:
+                    task.cancel()
+                raise
+    finally:
+        if sink is not None:
+            await loop.run_in_executor(io_executor, sink.close)
+        io_executor.shutdown(wait=False)
+        if owned_executor is not None:
+            owned_executor.shutdown(wait=False, cancel_futures=True)
+
+    state.finished_seconds = state.elapsed
+    errors.log()
+    target = archive if archive is not None else save_dir
+    logger.info("Exported %d of %d conversations to %s (%.1f MB) in %.1fs",
+                state.written, state.total, target, state.bytes_written / 2**20, state.elapsed)
+    return state
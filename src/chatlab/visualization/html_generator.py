@@ -1,24 +1,132 @@
 # chatlab/visualization/html_generator.py
 import html
+import json
+import logging
 from pathlib import Path
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, List, Optional, Union
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta # Added for timestamp/duration
 import re # Import regex library for placeholder handling
+from .resources import load_css, load_js, load_virtual_js
+from ..colnames import colnames  # Import the colnames dictionary
+from ..profiling import stage
+from ..log_utils import RateLimitedLogger
+
+logger = logging.getLogger(__name__)
+# Per-turn problems are rate limited so one bad batch cannot flood stderr
+turn_logger = RateLimitedLogger(logger)
+
 try:
     import markdown # Import the markdown library
     MARKDOWN_AVAILABLE = True
 except ImportError:
     MARKDOWN_AVAILABLE = False
-    print("WARNING: 'markdown' library not found. pip install markdown for full formatting. Falling back to basic escaping.")
+    logger.warning("'markdown' library not found. pip install markdown for full formatting. Falling back to basic escaping.")
 
-from .resources import load_css, load_js
-from ..colnames import colnames  # Import the colnames dictionary
 
 
+# --- Metadata fields, shared by get_metadata_html and get_metadata_html_batch ---
+_METADATA_TIME_FORMAT = '%d.%m.%Y, %H:%M:%S'
+_METADATA_DIVIDER = '<hr class="metadata-divider">'
+_SOURCE_LINKS = {
+    'sg': '<a href="https://huggingface.co/datasets/anon8231489123/ShareGPT_Vicuna_unfiltered" target="_blank">ShareGPT</a>',
+    'wc': '<a href="https://huggingface.co/datasets/allenai/WildChat-1M" target="_blank">Wildchat-1M</a>',
+}
+# Errors from parsing or doing arithmetic on values of unexpected types
+_VALUE_ERRORS = (TypeError, ValueError, OverflowError)
+
+
+def _metadata_field(label: str, text: str) -> str:
+    return f'<p><strong>{label}:</strong> {text}</p>'
+
+
+def _escaped_field(label: str, value: Any) -> str:
+    return _metadata_field(label, html.escape(str(value)))
+
+
+def _source_field(value: Any) -> str:
+    """The source, linked to the dataset for the known ones."""
+    if isinstance(value, str) and value in _SOURCE_LINKS:
+        return _metadata_field('Source', _SOURCE_LINKS[value])
+    return _escaped_field('Source', value)
+
+
+def _user_field(user: Any, freq: Any = None) -> str:
+    """The user, with their number of conversations if freq is given."""
+    text = html.escape(str(user))
+    if freq is not None:
+        text += f' ({html.escape(str(freq))} conversation{"s" if freq != 1 else ""})'
+    return _metadata_field('User', text)
+
+
+def _turns_field(turns: Any, n_code: Any = None, n_toxic: Any = None, n_redacted: Any = None) -> str:
+    """The number of turns, with the code/toxic/redacted counts that are given."""
+    extra_info = [f'{label}: {value}' for label, value in (('code', n_code), ('toxic', n_toxic), ('redacted', n_redacted))
+                  if value is not None]
+    extra_text = f' ({", ".join(extra_info)})' if extra_info else ''
+    return _metadata_field('Turns', f'{html.escape(str(turns))}{extra_text}')
+
+
+def _timestamp_field(label: str, value: Any) -> str:
+    """A timestamp as day.month.year, or the raw value if it cannot be parsed."""
+    try:
+        return _metadata_field(label, pd.to_datetime(value).strftime(_METADATA_TIME_FORMAT))
+    except _VALUE_ERRORS:
+        return _escaped_field(label, value)
+
+
+def _format_metadata_duration(seconds: float) -> str:
+    """Formats a conversation duration in seconds, e.g. '1d, 2h, 0m, 5s'."""
+    days, remainder = divmod(seconds, 86400)
+    hours, remainder = divmod(remainder, 3600)
+    minutes, seconds = divmod(remainder, 60)
+
+    duration_parts = []
+    if days > 0:
+        duration_parts.append(f"{int(days)}d")
+    if hours > 0 or days > 0:
+        duration_parts.append(f"{int(hours)}h")
+    if minutes > 0 or hours > 0 or days > 0:
+        duration_parts.append(f"{int(minutes)}m")
+    duration_parts.append(f"{int(seconds)}s")
+    return ", ".join(duration_parts)
+
+
+def _duration_field(start: Any, end: Any, seconds: Optional[float] = None) -> str:
+    """The duration from start to end (or of the given seconds), '' if it cannot be computed."""
+    try:
+        if seconds is None:
+            seconds = (pd.to_datetime(end) - pd.to_datetime(start)).total_seconds()
+        return _metadata_field('Duration', _format_metadata_duration(seconds))
+    except _VALUE_ERRORS:
+        return ''
+
+
+def _words_field(n_words: Any, n_words_user: Any = None, n_words_gpt: Any = None, turns: Any = None) -> str:
+    """The number of words, with user and gpt averages per turn if their counts and turns are given."""
+    text = html.escape(str(n_words))
+    if n_words_user is not None and n_words_gpt is not None and turns is not None:
+        try:
+            turns = float(turns)
+            if turns > 0:
+                user_avg = round(float(n_words_user) / (turns * 0.5))
+                gpt_avg = round(float(n_words_gpt) / (turns * 0.5))
+                text += f' (<em>user avg</em>: {user_avg}, <em>gpt avg</em>: {gpt_avg})'
+        except _VALUE_ERRORS:
+            pass  # Skip averages if there's an error
+    return _metadata_field('n words', text)
+
+
+def _metadata_container(conv_id: str, source: str, model: str, user: str, country: str, state: str,
+                        turns: str, start: str, end: str, duration: str, words: str, language: str) -> str:
+    """Joins the field fragments of one conversation, leaving out the empty ones."""
+    parts = ['<div class="metadata">', f'<h2>{html.escape(conv_id)}</h2>', _METADATA_DIVIDER,
+             source, model, _METADATA_DIVIDER, user, country, state, _METADATA_DIVIDER,
+             turns, start, end, duration, words, language, '</div>']
+    return '\n'.join(part for part in parts if part)
+
 
-# --- Existing get_metadata_html function remains the same ---
 def get_metadata_html(conv_id: str, df_row: Any) -> str:
     """
     Generate HTML for the metadata section with simplified sequential format.
@@ -34,189 +142,124 @@ def get_metadata_html(conv_id: str, df_row: Any) -> str:
     # Get column name mappings
     conv_cols = colnames['conv']
 
-    # Helper function to check if a field exists and is not null
-    def field_exists(field_name):
+    def value(field_name):
+        """The field's value, or None if it is missing or null."""
         col_name = conv_cols.get(field_name, field_name)  # Use mapped name if available, original otherwise
-        exists = False
-
-        if has_index and col_name in df_row.index:
+        if has_index:
+            if col_name not in df_row.index:
+                return None
+            field_value = df_row[col_name]
             try:
                 # Handle various null types
-                if isinstance(df_row[col_name], (list, dict, np.ndarray)) or not pd.isna(df_row[col_name]):
-                    exists = True
-            except:
+                if isinstance(field_value, (list, dict, np.ndarray)) or not pd.isna(field_value):
+                    return field_value
+            except (TypeError, ValueError):
                 # If we can't check nullness, assume it exists
-                exists = True
-        elif not has_index and col_name in df_row:
-            value = df_row.get(col_name)
-            if value is not None and not (isinstance(value, float) and np.isnan(value)):
-                exists = True
-
-        return exists, col_name
-
-    # Helper function to get field value
-    def get_field_value(field_name):
-        _, col_name = field_exists(field_name)
-        return df_row[col_name]
-
-    # Start the metadata container
-    html_parts = ['<div class="metadata">']
-
-    # Add conversation ID as title
-    html_parts.append(f'<h2>{html.escape(conv_id)}</h2>')
-
-    # Add first horizontal rule
-    html_parts.append('<hr class="metadata-divider">')
-
-    # --- Add fields in prescribed order, checking for existence ---
-
-    # 1. Source field
-    source_exists, source_col = field_exists('source')
-    if source_exists:
-        source_value = get_field_value('source')
-        if source_value == 'sg':
-            html_parts.append(
-                '<p><strong>Source:</strong> <a href="https://huggingface.co/datasets/anon8231489123/ShareGPT_Vicuna_unfiltered" target="_blank">ShareGPT</a></p>')
-        elif source_value == 'wc':
-            html_parts.append(
-                '<p><strong>Source:</strong> <a href="https://huggingface.co/datasets/allenai/WildChat-1M" target="_blank">Wildchat-1M</a></p>')
-        else:
-            html_parts.append(f'<p><strong>Source:</strong> {html.escape(str(source_value))}</p>')
-
-    # 2. Model field
-    model_exists, model_col = field_exists('model')
-    if model_exists:
-        html_parts.append(f'<p><strong>Model:</strong> {html.escape(str(get_field_value("model")))}</p>')
-
-    # Add second horizontal rule before user info
-    html_parts.append('<hr class="metadata-divider">')
-
-    # 3. User field with frequency if available
-    user_exists, user_col = field_exists('user_id')
-    if user_exists:
-        user_text = f'{html.escape(str(get_field_value("user_id")))}'
-
-        user_freq_exists, user_freq_col = field_exists('user_freq')
-        if user_freq_exists:
-            user_freq = get_field_value('user_freq')
-            user_text += f' ({html.escape(str(user_freq))} conversation{"s" if user_freq != 1 else ""})'
-
-        html_parts.append(f'<p><strong>User:</strong> {user_text}</p>')
-
-    # 4. Country field
-    country_exists, country_col = field_exists('country')
-    if country_exists:
-        html_parts.append(f'<p><strong>Country:</strong> {html.escape(str(get_field_value("country")))}</p>')
-
-    # 5. State field
-    state_exists, state_col = field_exists('state')
-    if state_exists:
-        html_parts.append(f'<p><strong>State:</strong> {html.escape(str(get_field_value("state")))}</p>')
-
-    # Add third horizontal rule before stats
-    html_parts.append('<hr class="metadata-divider">')
-
-    # 6. Turns with optional details
-    turns_exists, turns_col = field_exists('turns')
-    if turns_exists:
-        turns_text = f'{html.escape(str(get_field_value("turns")))}'
-        extra_info = []
-
-        n_code_exists, n_code_col = field_exists('n_code')
-        n_toxic_exists, n_toxic_col = field_exists('n_toxic')
-        n_redacted_exists, n_redacted_col = field_exists('n_redacted')
-
-        if n_code_exists:
-            extra_info.append(f'code: {get_field_value("n_code")}')
-
-        if n_toxic_exists:
-            extra_info.append(f'toxic: {get_field_value("n_toxic")}')
-
-        if n_redacted_exists:
-            extra_info.append(f'redacted: {get_field_value("n_redacted")}')
-
-        if extra_info:
-            turns_text += f' ({", ".join(extra_info)})'
-
-        html_parts.append(f'<p><strong>Turns:</strong> {turns_text}</p>')
-
-    # 7. Start timestamp
-    start_exists, start_col = field_exists('start')
-    if start_exists:
-        try:
-            timestamp = pd.to_datetime(get_field_value('start'))
-            formatted_time = timestamp.strftime('%d.%m.%Y, %H:%M:%S')
-            html_parts.append(f'<p><strong>Start:</strong> {formatted_time}</p>')
-        except:
-            html_parts.append(f'<p><strong>Start:</strong> {html.escape(str(get_field_value("start")))}</p>')
-
-    # 8. End timestamp
-    end_exists, end_col = field_exists('end')
-    if end_exists:
-        try:
-            timestamp = pd.to_datetime(get_field_value('end'))
-            formatted_time = timestamp.strftime('%d.%m.%Y, %H:%M:%S')
-            html_parts.append(f'<p><strong>End:</strong> {formatted_time}</p>')
-        except:
-            html_parts.append(f'<p><strong>End:</strong> {html.escape(str(get_field_value("end")))}</p>')
-
-    # 9. Duration (if both timestamps exist)
-    if start_exists and end_exists:
-        try:
-            start_time = pd.to_datetime(get_field_value('start'))
-            end_time = pd.to_datetime(get_field_value('end'))
-            duration = end_time - start_time
-
-            # Format duration as specified
-            seconds = duration.total_seconds()
-            days, remainder = divmod(seconds, 86400)
-            hours, remainder = divmod(remainder, 3600)
-            minutes, seconds = divmod(remainder, 60)
-
-            duration_parts = []
-            if days > 0:
-                duration_parts.append(f"{int(days)}d")
-            if hours > 0 or days > 0:
-                duration_parts.append(f"{int(hours)}h")
-            if minutes > 0 or hours > 0 or days > 0:
-                duration_parts.append(f"{int(minutes)}m")
-            duration_parts.append(f"{int(seconds)}s")
-
-            formatted_duration = ", ".join(duration_parts)
-            html_parts.append(f'<p><strong>Duration:</strong> {formatted_duration}</p>')
-        except:
-            pass  # Skip duration if there's an error
-
-    # 10. Word counts
-    n_words_exists, n_words_col = field_exists('n_words')
-    if n_words_exists:
-        words_text = f'{html.escape(str(get_field_value("n_words")))}'
-
-        # Add average word counts if available
-        n_words_user_exists, n_words_user_col = field_exists('n_words_user')
-        n_words_gpt_exists, n_words_gpt_col = field_exists('n_words_gpt')
-
-        if n_words_user_exists and n_words_gpt_exists and turns_exists:
-            try:
-                turns = float(get_field_value('turns'))
-                if turns > 0:
-                    user_avg = round(float(get_field_value('n_words_user')) / (turns * 0.5))
-                    gpt_avg = round(float(get_field_value('n_words_gpt')) / (turns * 0.5))
-                    words_text += f' (<em>user avg</em>: {user_avg}, <em>gpt avg</em>: {gpt_avg})'
-            except:
-                pass  # Skip averages if there's an error
-
-        html_parts.append(f'<p><strong>n words:</strong> {words_text}</p>')
+                return field_value
+            return None
+        field_value = df_row.get(col_name)
+        if field_value is None or (isinstance(field_value, float) and np.isnan(field_value)):
+            return None
+        return field_value
+
+    def field(field_name, render, *args):
+        field_value = value(field_name)
+        return render(*args, field_value) if field_value is not None else ''
+
+    start, end, turns, n_words = value('start'), value('end'), value('turns'), value('n_words')
+    user = value('user_id')
+    return _metadata_container(
+        conv_id,
+        source=field('source', _source_field),
+        model=field('model', _escaped_field, 'Model'),
+        user=_user_field(user, value('user_freq')) if user is not None else '',
+        country=field('country', _escaped_field, 'Country'),
+        state=field('state', _escaped_field, 'State'),
+        turns=_turns_field(turns, value('n_code'), value('n_toxic'), value('n_redacted')) if turns is not None else '',
+        start=_timestamp_field('Start', start) if start is not None else '',
+        end=_timestamp_field('End', end) if end is not None else '',
+        duration=_duration_field(start, end) if start is not None and end is not None else '',
+        words=_words_field(n_words, value('n_words_user'), value('n_words_gpt'), turns) if n_words is not None else '',
+        language=field('language', _escaped_field, 'Language'),
+    )
+
+
+def get_metadata_html_batch(df: pd.DataFrame) -> pd.Series:
+    """
+    Generate the metadata section for every row of a DataFrame at once.
 
-    # 11. Language
-    language_exists, language_col = field_exists('language')
-    if language_exists:
-        html_parts.append(f'<p><strong>Language:</strong> {html.escape(str(get_field_value("language")))}</p>')
+    Produces exactly the HTML of get_metadata_html(str(conv_id), row) for each
+    row, with the same field helpers, but missing-value checks run once per
+    column and datetime columns are formatted and subtracted vectorized.
 
-    # Close the metadata container
-    html_parts.append('</div>')
+    Parameters:
+    -----------
+    df: Conversation-level DataFrame (typically only the rows being rendered)
 
-    return '\n'.join(html_parts)
+    Returns:
+    --------
+    pd.Series
+        Metadata HTML, indexed like df.
+    """
+    conv_cols = colnames['conv']
+    n = len(df)
+    missing = [None] * n
+
+    def values(field_name):
+        """The field's values as Python objects, None where missing or null."""
+        col_name = conv_cols.get(field_name, field_name)
+        if col_name not in df.columns:
+            return missing
+        column = df[col_name]
+        return column.astype(object).where(column.notna(), None).to_numpy()
+
+    def fields(render, *columns):
+        """render(*row values) per row, '' where the first column is missing."""
+        return [render(*row) if row[0] is not None else '' for row in zip(*columns)]
+
+    def datetimes(field_name):
+        col_name = conv_cols.get(field_name, field_name)
+        if col_name in df.columns and pd.api.types.is_datetime64_any_dtype(df[col_name].dtype):
+            return df[col_name]
+        return None
+
+    def timestamps(field_name, label):
+        column = datetimes(field_name)
+        if column is None:
+            return fields(lambda value: _timestamp_field(label, value), values(field_name))
+        formatted = column.dt.strftime(_METADATA_TIME_FORMAT).to_numpy()
+        return [_metadata_field(label, text) if ok else '' for ok, text in zip(column.notna().to_numpy(), formatted)]
+
+    start, end, turns = values('start'), values('end'), values('turns')
+
+    # Durations of datetime columns are subtracted at once
+    seconds = [None] * n
+    start_times, end_times = datetimes('start'), datetimes('end')
+    if start_times is not None and end_times is not None:
+        try:
+            seconds = (end_times - start_times).dt.total_seconds().to_numpy()
+        except _VALUE_ERRORS:
+            pass
+    durations = [_duration_field(s, e, sec) if s is not None and e is not None else ''
+                 for s, e, sec in zip(start, end, seconds)]
+
+    sections = dict(
+        source=fields(_source_field, values('source')),
+        model=fields(lambda value: _escaped_field('Model', value), values('model')),
+        user=fields(_user_field, values('user_id'), values('user_freq')),
+        country=fields(lambda value: _escaped_field('Country', value), values('country')),
+        state=fields(lambda value: _escaped_field('State', value), values('state')),
+        turns=fields(_turns_field, turns, values('n_code'), values('n_toxic'), values('n_redacted')),
+        start=timestamps('start', 'Start'),
+        end=timestamps('end', 'End'),
+        duration=durations,
+        words=fields(_words_field, values('n_words'), values('n_words_user'), values('n_words_gpt'), turns),
+        language=fields(lambda value: _escaped_field('Language', value), values('language')),
+    )
+    conv_ids = df[conv_cols['conv_id']].astype(object).to_numpy()
+    result = [_metadata_container(str(conv_id), **{name: section[i] for name, section in sections.items()})
+              for i, conv_id in enumerate(conv_ids)]
+    return pd.Series(result, index=df.index, dtype=object)
 
 
 # --- Helper function for duration ---
@@ -253,12 +296,17 @@ def get_full_grid_row_html(
     timestamp_to_display: Optional[datetime] = None,
     timestamp_for_duration_start: Optional[datetime] = None,
     show_duration: bool = False,
-    include_annotations: bool = True
+    include_annotations: bool = True,
+    avatar_mode: str = 'inline'
 ) -> str:
     """
     Generate HTML for a single conversation turn grid row.
     Applies Markdown formatting to assistant turns using a robust
     placeholder strategy (with non-Markdown characters) for code blocks.
+
+    With avatar_mode='inline' the avatar is an <img> with a data URI from
+    `avatars`; with avatar_mode='class' it is an element styled by a CSS class
+    (see get_avatar_css), so the image is defined once per page or stylesheet.
     """
     # --- Get data for the current turn ---
     # Use .get with defaults for safety
@@ -266,12 +314,16 @@ def get_full_grid_row_html(
     message_col = col_names.get('message', 'content')
     toxic_col = col_names.get('toxic', 'toxic')
     redacted_col = col_names.get('redacted', 'redacted')
+    code_block_col = col_names.get('code_block', 'code_block')
 
     role = turn.get(role_col, '')
     raw_content = str(turn.get(message_col, '')) # Ensure it's a string
     is_toxic = turn.get(toxic_col, False)
     is_redacted = turn.get(redacted_col, False)
-    has_code_block_flag = '```' in raw_content
+    # Prefer the precomputed flag (see add_turn_features); scan the text only if absent
+    has_code_block_flag = turn.get(code_block_col)
+    if not isinstance(has_code_block_flag, (bool, np.bool_)):
+        has_code_block_flag = '```' in raw_content
 
     # --- Metadata Row Content Generation ---
     metadata_left_content = ""
@@ -317,9 +369,11 @@ def get_full_grid_row_html(
 
         html_output = ""
         try:
-             html_output = markdown.markdown(text_with_placeholders, extensions=['fenced_code', 'tables'])
+             with stage('render.markdown'):
+                  html_output = markdown.markdown(text_with_placeholders, extensions=['fenced_code', 'tables'])
         except Exception as md_error:
-             print(f"Warning: Markdown processing failed for assistant turn {turn_number}: {md_error}. Falling back to basic escaping.")
+             turn_logger.warning('markdown', "Markdown processing failed for assistant turn %d: %s. Falling back to basic escaping.",
+                                 turn_number, md_error)
              # Fallback logic (same as user turn logic below)
              escaped_full_content = html.escape(raw_content)
              processed_parts = []
@@ -347,7 +401,7 @@ def get_full_grid_row_html(
                   elif placeholder in final_content:
                        final_content = final_content.replace(placeholder, formatted_code_block)
                   else:
-                       print(f"Warning: Placeholder '{placeholder}' not found in html_output for replacement.")
+                       turn_logger.warning('placeholder', "Placeholder '%s' not found in html_output for replacement.", placeholder)
 
     else:
         # User turn or Markdown library not available: Use basic escaping
@@ -366,15 +420,20 @@ def get_full_grid_row_html(
         final_content = "".join(processed_parts)
 
     # --- Avatar Source ---
-    # Use .get for safer dictionary access
-    avatar_src = avatars.get(role, avatars.get('fallback_user')) # Use fallback if role unknown
+    if avatar_mode == 'class':
+        avatar_class = role if role in ('user', 'assistant') else 'fallback'
+        avatar_html = f'<span class="avatar-icon avatar-{avatar_class}" role="img" aria-label="{role} avatar"></span>'
+    else:
+        # Use .get for safer dictionary access
+        avatar_src = avatars.get(role, avatars.get('fallback_user')) # Use fallback if role unknown
+        avatar_html = f'<img src="{avatar_src}" alt="{role} avatar">'
 
     # --- Generate HTML Structure ---
     turn_content_html = f'''
         <div class="turn {role}">
             <div class="turn-prefix">
                  <div class="turn-number">{turn_number}</div>
-                 <div class="avatar"><img src="{avatar_src}" alt="{role} avatar"></div>
+                 <div class="avatar">{avatar_html}</div>
             </div>
             <div class="turn-main-content">
                  {metadata_row_html}
@@ -401,23 +460,18 @@ def get_full_grid_row_html(
         return f'<div class="grid-col-message">{turn_content_html}</div>'
 
 
-def generate_full_html(
-        metadata_html: str,
-        chat_rows_html: str,
+def get_page_css(
         theme: str = 'light',
         custom_css_content: Optional[str] = None,
-        include_js: bool = True,
         include_annotations: bool = True
 ) -> str:
     """
-    Generate the complete HTML document.
+    Build the stylesheet of a conversation page: theme (or custom) CSS plus
+    metadata and layout rules for the chosen mode.
     """
     # Load theme CSS or custom CSS
     css_content = custom_css_content if custom_css_content else load_css(theme)
 
-    # Load JavaScript if needed
-    js_content = load_js() if include_js else ""
-
     # --- CSS for conversation metadata section ---
     # These styles apply only to the top-level metadata section
     conv_metadata_css = """
@@ -526,6 +580,80 @@ def generate_full_html(
     {layout_specific_css}
     """
 
+    return combined_css
+
+
+# Extra rules for the virtualized annotation view
+VIRTUAL_CSS = """
+    .virtual-spacer { grid-column: 1 / -1; }
+    """
+
+
+def get_avatar_css(avatar_urls: Dict[str, str]) -> str:
+    """
+    CSS classes for avatars rendered with avatar_mode='class'.
+
+    Parameters:
+    -----------
+    avatar_urls: Mapping of 'user', 'assistant' and 'fallback' to image URLs
+        (relative file paths or data URIs)
+    """
+    rules = ['.avatar .avatar-icon { width: 40px; height: 40px; border-radius: 50%; display: block; '
+             'background-size: cover; background-position: center; background-repeat: no-repeat; }']
+    for name, url in avatar_urls.items():
+        rules.append(f'.avatar .avatar-{name} {{ background-image: url("{url}"); }}')
+    return '\n'.join(rules)
+
+
+def generate_full_html(
+        metadata_html: str,
+        chat_rows_html: str,
+        theme: str = 'light',
+        custom_css_content: Optional[str] = None,
+        include_js: bool = True,
+        include_annotations: bool = True,
+        stylesheet_href: Optional[str] = None,
+        script_src: Optional[str] = None,
+        extra_css: Optional[str] = None,
+        virtual_rows: Optional[List[str]] = None,
+        page_id: Optional[str] = None
+) -> str:
+    """
+    Generate the complete HTML document.
+
+    If stylesheet_href / script_src are given, the page links to shared
+    external files instead of inlining the CSS / JavaScript. extra_css is
+    appended to the inline stylesheet (e.g. avatar classes).
+
+    With include_annotations and virtual_rows (the message-column HTML of each
+    turn, as from get_full_grid_row_html(include_annotations=False)), the turns
+    are embedded once as JSON and virtual.js materializes only the rows near
+    the viewport. page_id keys the saved annotations in localStorage.
+    """
+    virtual = include_annotations and virtual_rows is not None
+    if virtual:
+        extra_css = (extra_css or '') + VIRTUAL_CSS
+    if stylesheet_href:
+        head_css = f'<link rel="stylesheet" href="{html.escape(stylesheet_href)}">'
+        if extra_css:
+            head_css += f'\n    <style>\n    {extra_css}\n    </style>'
+    else:
+        combined_css = get_page_css(theme, custom_css_content, include_annotations)
+        if extra_css:
+            combined_css += f"{extra_css}\n"
+        head_css = f"""<style>
+    {combined_css}
+    </style>"""
+
+    # Inline or link the JavaScript if needed
+    if include_js and include_annotations:
+        script_html = (f'<script src="{html.escape(script_src)}"></script>' if script_src
+                       else f'<script>{load_js()}</script>')
+        if virtual and not script_src:
+            script_html += f'\n    <script>{load_virtual_js()}</script>'
+    else:
+        script_html = ''
+
     # Create the general annotation box HTML with editable content
     general_annotation_html = ""
     if include_annotations:
@@ -541,6 +669,16 @@ def generate_full_html(
     if include_annotations:
         body_class += " annotation-active"
 
+    if virtual:
+        # Only the data goes in the page; '</' is escaped so it cannot close the script element
+        virtual_data = json.dumps({'id': page_id, 'rows': virtual_rows}).replace('</', '<\\/')
+        chat_section_html = f'''<div class="conversation-section chat-section virtual-chat" id="virtual-chat"></div>
+    <script id="virtual-turns" type="application/json">{virtual_data}</script>'''
+    else:
+        chat_section_html = f'''<div class="{'conversation-section chat-section' if include_annotations else 'conversation-block'}">
+        {chat_rows_html}
+    </div>'''
+
     # Create HTML structure with two separate but aligned sections
     full_html = f'''<!DOCTYPE html>
 <html lang="en">
@@ -548,9 +686,7 @@ def generate_full_html(
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Conversation Visualization</title>
-    <style>
-    {combined_css}
-    </style>
+    {head_css}
 </head>
 <body class="{body_class}">
     <div class="{'conversation-section info-section' if include_annotations else 'conversation-block'}">
@@ -565,13 +701,11 @@ def generate_full_html(
         {f'<div class="grid-col-annotation">{general_annotation_html}</div>' if include_annotations else ''}
     </div>
 
-    <div class="{'conversation-section chat-section' if include_annotations else 'conversation-block'}">
-        {chat_rows_html}
-    </div>
+    {chat_section_html}
 
     {f'<div id="dragHandle" class="resizer-handle"></div>' if include_annotations else ''}
 
-    {f'<script>{js_content}</script>' if include_js and include_annotations else ''}
+    {script_html}
 </body>
 </html>'''
 
@@ -1,18 +1,33 @@
 # chatlab/visualization/resources.py
 import base64
-import sys
+import functools
+import logging
 from pathlib import Path
-import importlib.resources
 from ..utils import get_package_root # Import from parent directory utility
 
+logger = logging.getLogger(__name__)
+
 # --- Default Assets ---
 DEFAULT_USER_SVG_FALLBACK = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100" width="40" height="40"><circle cx="50" cy="50" r="45" fill="#4A90E2"/><text x="50" y="65" font-size="40" fill="#FFFFFF" text-anchor="middle">U</text></svg>"""
 DEFAULT_ASSISTANT_SVG_FALLBACK = """<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100" width="40" height="40"><circle cx="50" cy="50" r="45" fill="#50E3C2"/><text x="50" y="65" font-size="40" fill="#000000" text-anchor="middle">A</text></svg>"""
 
-PACKAGE_ROOT = get_package_root()
-ASSETS_DIR = PACKAGE_ROOT / 'assets'
-STATIC_DIR = ASSETS_DIR / 'static'
-IMAGES_DIR = ASSETS_DIR / 'images'
+@functools.lru_cache(maxsize=None)
+def _asset_dirs() -> dict[str, Path]:
+    """Resolves the asset directories once, on first use instead of at import time."""
+    package_root = get_package_root()
+    assets_dir = package_root / 'assets'
+    return {
+        'PACKAGE_ROOT': package_root,
+        'ASSETS_DIR': assets_dir,
+        'STATIC_DIR': assets_dir / 'static',
+        'IMAGES_DIR': assets_dir / 'images',
+    }
+
+def __getattr__(name: str):
+    # Keeps PACKAGE_ROOT, ASSETS_DIR, STATIC_DIR and IMAGES_DIR importable as module constants
+    if name in ('PACKAGE_ROOT', 'ASSETS_DIR', 'STATIC_DIR', 'IMAGES_DIR'):
+        return _asset_dirs()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def _load_file_content(file_path: Path, fallback_content: str = "", encoding='utf-8') -> str:
     """Loads text content from a file, using fallback if not found/error."""
@@ -24,28 +39,37 @@ def _load_file_content(file_path: Path, fallback_content: str = "", encoding='ut
         if file_path.exists():
              return file_path.read_text(encoding=encoding)
         else:
-             print(f"Warning: File not found at '{file_path}'. Using fallback.", file=sys.stderr)
+             logger.warning("File not found at '%s'. Using fallback.", file_path)
              return fallback_content
     except Exception as e:
-        print(f"Warning: Error reading file '{file_path}': {e}. Using fallback.", file=sys.stderr)
+        logger.warning("Error reading file '%s': %s. Using fallback.", file_path, e)
         return fallback_content
 
 def load_css(theme: str = 'light') -> str:
     """Loads the CSS content for the specified theme."""
     if theme == 'dark':
-        return _load_file_content(STATIC_DIR / 'visualize_dark.css', '')
+        return _load_file_content(_asset_dirs()['STATIC_DIR'] / 'visualize_dark.css', '')
     else:
         if theme != 'light':
-             print(f"Warning: Invalid theme '{theme}'. Using 'light'.", file=sys.stderr)
-        return _load_file_content(STATIC_DIR / 'visualize_light.css', '')
+             logger.warning("Invalid theme '%s'. Using 'light'.", theme)
+        return _load_file_content(_asset_dirs()['STATIC_DIR'] / 'visualize_light.css', '')
 
 def load_js() -> str:
     """Loads the JavaScript content."""
-    return _load_file_content(STATIC_DIR / 'visualize.js', '')
+    return _load_file_content(_asset_dirs()['STATIC_DIR'] / 'visualize.js', '')
+
+def load_virtual_js() -> str:
+    """Loads the JavaScript of the virtualized annotation view."""
+    return _load_file_content(_asset_dirs()['STATIC_DIR'] / 'virtual.js', '')
+
+def load_browser_assets() -> tuple[str, str]:
+    """Loads the (CSS, JavaScript) of the multi-conversation browser."""
+    static_dir = _asset_dirs()['STATIC_DIR']
+    return _load_file_content(static_dir / 'browser.css', ''), _load_file_content(static_dir / 'browser.js', '')
 
 def load_svg_content(filename: str, fallback_svg: str) -> str:
     """Loads SVG content from the images directory."""
-    svg_path = IMAGES_DIR / filename
+    svg_path = _asset_dirs()['IMAGES_DIR'] / filename
     # Use internal _load_file_content which handles fallback
     return _load_file_content(svg_path, fallback_svg)
 
@@ -55,7 +79,7 @@ def svg_to_base64(svg_content: str) -> str:
         encoded = base64.b64encode(svg_content.encode('utf-8')).decode('utf-8')
         return f"data:image/svg+xml;base64,{encoded}"
     except Exception as e:
-        print(f"Error encoding SVG to base64: {e}. Returning empty string.", file=sys.stderr)
+        logger.error("Error encoding SVG to base64: %s. Returning empty string.", e)
         return "data:image/svg+xml;base64,"
 
 def get_avatars(user_svg_override: str | None = None, assistant_svg_override: str | None = None) -> dict[str, str]:
@@ -0,0 +1,143 @@
+# chatlab/visualization/shared_assets.py
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from .html_generator import get_page_css, get_avatar_css
+from .resources import load_js, load_virtual_js, load_svg_content, DEFAULT_USER_SVG_FALLBACK, DEFAULT_ASSISTANT_SVG_FALLBACK
+from ..profiling import count
+
+# Subdirectory of save_dir holding the shared files of an external-assets export
+ASSETS_SUBDIR = 'chatlab_assets'
+
+# Blocks whose whitespace is significant (or not worth touching) during minification
+_PRESERVED_BLOCK = re.compile(r'(<(pre|textarea|script)\b.*?</\2>)', re.DOTALL | re.IGNORECASE)
+_STYLE_BLOCK = re.compile(r'(<style\b[^>]*>)(.*?)(</style>)', re.DOTALL | re.IGNORECASE)
+_CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+
+
+def minify_css(css: str) -> str:
+    """Remove comments and collapse whitespace in a stylesheet."""
+    css = _CSS_COMMENT.sub('', css)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    return css.replace(';}', '}').strip()
+
+
+def _strip_lines(text: str) -> str:
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def minify_html(page: str) -> str:
+    """
+    Whitespace-minify a generated page without changing how it renders.
+
+    Indentation and blank lines are removed line by line; line breaks are kept,
+    since between inline elements they render as a space. <pre>, <textarea>
+    and <script> blocks are left untouched and inline stylesheets are passed
+    through minify_css().
+    """
+    page = _STYLE_BLOCK.sub(lambda m: m.group(1) + minify_css(m.group(2)) + m.group(3), page)
+    parts = _PRESERVED_BLOCK.split(page)
+    # split() with two groups yields [text, block, tag name, text, block, tag name, ...]
+    result = []
+    for i in range(0, len(parts), 3):
+        result.append(_strip_lines(parts[i]))
+        if i + 1 < len(parts):
+            result.append(parts[i + 1])
+    return '\n'.join(part for part in result if part)
+
+
+def _hashed_name(stem: str, suffix: str, data: bytes) -> str:
+    return f"{stem}.{hashlib.sha1(data).hexdigest()[:10]}{suffix}"
+
+
+def build_shared_assets(
+        theme: str = 'light',
+        include_annotations: bool = False,
+        custom_css_content: Optional[str] = None,
+        user_avatar_svg: Optional[str] = None,
+        assistant_avatar_svg: Optional[str] = None,
+        minify: bool = False
+) -> Tuple[Dict[str, bytes], Dict[str, Optional[str]]]:
+    """
+    Build the shared files of an external-assets export without writing them.
+
+    Returns the files (path relative to save_dir -> content) and the 'css' and
+    'js' hrefs pages link to. See write_shared_assets for the parameters.
+    """
+    files: Dict[str, bytes] = {}
+
+    def add(stem: str, suffix: str, content: str) -> str:
+        data = content.encode('utf-8')
+        filename = _hashed_name(stem, suffix, data)
+        files[f"{ASSETS_SUBDIR}/{filename}"] = data
+        return filename
+
+    avatar_files = {
+        'user': add('user_avatar', '.svg',
+                    user_avatar_svg or load_svg_content('user_avatar.svg', DEFAULT_USER_SVG_FALLBACK)),
+        'assistant': add('assistant_avatar', '.svg',
+                         assistant_avatar_svg or load_svg_content('gpt_avatar.svg', DEFAULT_ASSISTANT_SVG_FALLBACK)),
+        'fallback': add('fallback_avatar', '.svg', DEFAULT_USER_SVG_FALLBACK),
+    }
+
+    # Avatar URLs are relative to the stylesheet, which sits next to them
+    css = get_page_css(theme, custom_css_content, include_annotations) + '\n' + get_avatar_css(avatar_files)
+    if minify:
+        css = minify_css(css)
+    hrefs = {'css': f"{ASSETS_SUBDIR}/{add('chatlab', '.css', css)}", 'js': None}
+    if include_annotations:
+        # The virtualized view's script only acts on pages that use it
+        script = load_js() + '\n' + load_virtual_js()
+        hrefs['js'] = f"{ASSETS_SUBDIR}/{add('chatlab', '.js', script)}"
+    return files, hrefs
+
+
+def write_shared_assets(
+        save_dir: Union[str, Path],
+        theme: str = 'light',
+        include_annotations: bool = False,
+        custom_css_content: Optional[str] = None,
+        user_avatar_svg: Optional[str] = None,
+        assistant_avatar_svg: Optional[str] = None,
+        minify: bool = False
+) -> Dict[str, Optional[str]]:
+    """
+    Write the stylesheet, script and avatar images shared by exported pages.
+
+    Files go to save_dir/chatlab_assets and are named after a hash of their
+    content, so repeated exports (or exports with other themes or modes into
+    the same directory) reuse existing files and never overwrite ones that
+    other pages link to.
+
+    Parameters:
+    -----------
+    save_dir : str or Path
+        Directory the HTML pages are saved to.
+    theme, include_annotations, custom_css_content :
+        Select the page stylesheet, as for generate_full_html.
+    user_avatar_svg, assistant_avatar_svg : str or None
+        Custom SVG content for the avatars.
+    minify : bool, default=False
+        Minify the stylesheet.
+
+    Returns:
+    --------
+    dict
+        'css' and 'js' hrefs relative to save_dir ('js' is None without annotations).
+    """
+    files, hrefs = build_shared_assets(theme, include_annotations, custom_css_content,
+                                       user_avatar_svg, assistant_avatar_svg, minify)
+    save_dir = Path(save_dir)
+    (save_dir / ASSETS_SUBDIR).mkdir(parents=True, exist_ok=True)
+    for relative_path, data in files.items():
+        path = save_dir / relative_path
+        if not path.exists():
+            tmp_path = path.with_suffix(path.suffix + '.tmp')
+            tmp_path.write_bytes(data)
+            tmp_path.replace(path)
+            count('files_written')
+            count('bytes_written', len(data))
+    return hrefs
@@ -0,0 +1,174 @@
+"""
+Equivalence of the arrow and polars engines with the pandas engine.
+
+Every call is run with the pandas engine on a pandas frame, then with the
+other engines, both selected per call on the same pandas frame and picked
+from the input type (Arrow tables, Polars frames and lazy frames).
+"""
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import chatlab as clb
+from chatlab.engines import set_engine, get_engine, to_pandas
+from chatlab.utils import apply_filters
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+CONV_COLUMNS = ['conv_id', 'source', 'model', 'language', 'country', 'turns', 'n_words', 'n_code', 'toxic']
+TURN_COLUMNS = ['conv_id', 'turn_num', 'role', 'content']
+
+FILTERS = [
+    {},
+    {'source': 'wc'},
+    {'language': ['English', 'Chinese']},
+    {'turns': 2},
+    {'turns': (3, None)},
+    {'n_words': (None, 200), 'n_code': 0},
+    {'turns': (2, 6), 'language': 'English', 'toxic': False},
+    {'language': 'no such language'},
+    {'no_such_column': 'ignored'},
+]
+
+SEARCHES = [
+    ('python', {}),
+    ('Python', {'case_sensitive': False}),
+    (r'^hi', {'regex': True}),
+    (r'\d{4}', {'regex': True, 'role': 'assistant'}),
+    # Lookbehind: RE2 and Rust's regex reject it, so arrow and polars fall back to pandas
+    (r'(?<=def )\w+', {'regex': True}),
+    ('the', {'role': ['user'], 'turn_num': (2, None)}),
+    ('no such text anywhere', {}),
+    # Non-ASCII text: \d, \w and \b match ASCII only on every engine, as in RE2
+    (r'\d{4}', {'regex': True}),
+    (r'na\wve', {'regex': True}),
+    (r'\bve\b', {'regex': True}),
+    ('ÉCOLE', {'case_sensitive': False}),
+]
+
+# Turns with non-ASCII digits and letters, added to the sample's turns
+UNICODE_TURNS = [
+    {'conv_id': 'unicode_1', 'turn_num': 1, 'role': 'user', 'content': 'رقم ٣٤٥٦ please'},
+    {'conv_id': 'unicode_1', 'turn_num': 2, 'role': 'assistant', 'content': 'A naïve école answer'},
+    {'conv_id': 'unicode_2', 'turn_num': 1, 'role': 'user', 'content': 'über naïve'},
+]
+
+
+@pytest.fixture(scope='module')
+def sample():
+    return pd.read_parquet(SAMPLE_PATH)
+
+
+@pytest.fixture(scope='module')
+def conversations(sample):
+    return sample[CONV_COLUMNS].reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def turns(sample):
+    turns = clb.unpack_turns(sample, backend='pandas')[TURN_COLUMNS]
+    extra = pd.DataFrame(UNICODE_TURNS).astype(turns.dtypes.to_dict())
+    return pd.concat([turns, extra], ignore_index=True)
+
+
+@pytest.fixture(autouse=True)
+def pandas_engine():
+    previous = get_engine()
+    set_engine('pandas')
+    yield
+    set_engine(previous)
+
+
+def _polars():
+    return pytest.importorskip('polars')
+
+
+def _variants(frame: pd.DataFrame, engine: str):
+    """(label, data, call kwargs) running the given engine on the frame."""
+    yield f'{engine} backend on pandas', frame, {'backend': engine}
+    if engine == 'arrow':
+        yield 'arrow table', pa.Table.from_pandas(frame, preserve_index=False), {}
+    elif engine == 'polars':
+        pl = _polars()
+        yield 'polars frame', pl.from_pandas(frame), {}
+        yield 'polars lazy frame', pl.from_pandas(frame).lazy(), {}
+
+
+def _normalize(frame: pd.DataFrame) -> pd.DataFrame:
+    """Columns in name order, fresh index, missing values as None, for comparison."""
+    frame = to_pandas(frame)
+    frame = frame[sorted(frame.columns)].reset_index(drop=True)
+    return frame.astype(object).where(frame.notna(), None)
+
+
+@pytest.mark.parametrize('engine', ['arrow', 'polars'])
+@pytest.mark.parametrize('filters', FILTERS, ids=repr)
+def test_apply_filters(conversations, engine, filters):
+    expected = apply_filters(conversations, backend='pandas', **filters)
+    for label, data, kwargs in _variants(conversations, engine):
+        result = apply_filters(data, **kwargs, **filters)
+        assert type(result) is type(data), label
+        assert to_pandas(result)['conv_id'].tolist() == expected['conv_id'].tolist(), label
+
+
+@pytest.mark.parametrize('engine', ['arrow', 'polars'])
+@pytest.mark.parametrize('filters', FILTERS, ids=repr)
+def test_filter_subset(conversations, engine, filters):
+    expected = clb.filter_subset(conversations, return_all=True, backend='pandas', **filters)
+    for label, data, kwargs in _variants(conversations, engine):
+        result = clb.filter_subset(data, return_all=True, **kwargs, **filters)
+        assert result == expected, label
+        single = clb.filter_subset(data, **kwargs, **filters)
+        assert (single is None) if expected is None else (single in expected), label
+
+
+@pytest.mark.parametrize('engine', ['arrow', 'polars'])
+@pytest.mark.parametrize('text, options', SEARCHES, ids=[text for text, _ in SEARCHES])
+def test_search_text_matches(turns, engine, text, options):
+    expected = clb.search_text_matches(turns, text, return_all=True, verbose=False, backend='pandas', **options)
+    for label, data, kwargs in _variants(turns, engine):
+        result = clb.search_text_matches(data, text, return_all=True, verbose=False, **kwargs, **options)
+        assert result == expected, label
+        single = clb.search_text_matches(data, text, verbose=False, **kwargs, **options)
+        if expected is None:
+            assert single is None, label
+        else:
+            conv_id, turn_nums = single
+            expected_turns = clb.search_text_matches(turns[turns['conv_id'] == conv_id], text, verbose=False,
+                                                     backend='pandas', **options)[1]
+            assert conv_id in expected and turn_nums == expected_turns, label
+
+
+@pytest.mark.parametrize('engine', ['arrow', 'polars'])
+def test_unpack_turns(sample, engine):
+    expected = _normalize(clb.unpack_turns(sample, backend='pandas'))
+    nested = sample[['conv_id', 'conversation']]
+    table = pa.Table.from_pandas(nested, preserve_index=False)
+    variants = [(f'{engine} backend on pandas', nested, {'backend': engine})]
+    if engine == 'arrow':
+        variants.append(('arrow table', table, {}))
+    else:
+        pl = _polars()
+        variants += [('polars frame', pl.from_arrow(table), {}), ('polars lazy frame', pl.from_arrow(table).lazy(), {})]
+    for label, data, kwargs in variants:
+        result = clb.unpack_turns(data, **kwargs)
+        if not isinstance(data, pd.DataFrame):
+            assert type(result) is type(data), label
+        pd.testing.assert_frame_equal(_normalize(result), expected, check_dtype=False, obj=label)
+
+
+def test_backend_is_not_a_filter(conversations):
+    # A data column named like an engine keyword other than backend is still a filter
+    frame = conversations.assign(engine=['a' if i % 2 else 'b' for i in range(len(conversations))])
+    expected = frame.loc[frame['engine'] == 'a', 'conv_id'].tolist()
+    assert clb.filter_subset(frame, return_all=True, engine='a') == expected
+    assert clb.filter_subset(frame, return_all=True, engine='a', backend='arrow') == expected
+
+
+def test_unknown_backend(conversations):
+    with pytest.raises(ValueError):
+        apply_filters(conversations, backend='spark', source='wc')
+    with pytest.raises(ValueError):
+        set_engine('spark')
@@ -0,0 +1,46 @@
+"""
+FacetIndex against filter_subset, and isolation of its cached facets.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import chatlab as clb
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+COLUMNS = ['conv_id', 'source', 'model', 'language', 'country', 'turns', 'n_words', 'toxic']
+
+FILTERS = [
+    {},
+    {'source': 'wc'},
+    {'language': ['English', 'Chinese'], 'turns': (3, None)},
+    {'n_words': (None, 200), 'toxic': False},
+    {'language': 'no such language'},
+]
+
+
+@pytest.fixture(scope='module')
+def conversations():
+    return pd.read_parquet(SAMPLE_PATH)[COLUMNS]
+
+
+@pytest.mark.parametrize('filters', FILTERS, ids=repr)
+def test_conv_ids_match_filter_subset(conversations, filters):
+    index = clb.FacetIndex(conversations)
+    index.facets(**filters)
+    assert index.conv_ids() == (clb.filter_subset(conversations, return_all=True, **filters) or [])
+
+
+def test_facets_are_copies(conversations):
+    index = clb.FacetIndex(conversations, columns=['language', 'turns'])
+    first = index.facets(source='wc')
+    expected = {name: table.copy() for name, table in first.items()}
+    first['language']['count'] = 0
+    first['turns'].drop(first['turns'].index, inplace=True)
+
+    index.facets(source='sg')
+    again = index.facets(source='wc')  # served from the cache
+    for name, table in expected.items():
+        pd.testing.assert_frame_equal(again[name], table)
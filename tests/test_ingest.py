@@ -0,0 +1,55 @@
+"""
+ingest_files on stores with and without a manifest.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import chatlab as clb
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+COLUMNS = ['conv_id', 'source', 'model', 'language', 'turns', 'conversation']
+
+
+@pytest.fixture
+def directory(tmp_path):
+    sample = pd.read_parquet(SAMPLE_PATH)[COLUMNS]
+    directory = tmp_path / 'raw'
+    directory.mkdir()
+    for i, chunk in enumerate([sample.iloc[:10], sample.iloc[10:20]]):
+        chunk.to_json(directory / f'part{i}.json', orient='records', lines=True)
+    return directory
+
+
+def _write_third_file(directory):
+    sample = pd.read_parquet(SAMPLE_PATH)[COLUMNS]
+    sample.iloc[20:25].to_json(directory / 'part2.json', orient='records', lines=True)
+
+
+def test_ingest_is_incremental(directory, tmp_path):
+    first = clb.ingest_files(directory, tmp_path / 'store')
+    assert first.added == ['part0.json', 'part1.json'] and first.store.n_conversations == 20
+    _write_third_file(directory)
+    second = clb.ingest_files(directory, tmp_path / 'store')
+    assert second.added == ['part2.json'] and second.unchanged == ['part0.json', 'part1.json']
+    assert second.store.n_conversations == 25
+
+
+def test_store_without_manifest_is_refused(directory, tmp_path):
+    store = clb.concat_files(str(directory), store=tmp_path / 'store')
+    with pytest.raises(ValueError, match='seed_manifest'):
+        clb.ingest_files(directory, store)
+    assert clb.open_store(tmp_path / 'store').n_conversations == 20
+
+
+def test_seed_manifest(directory, tmp_path):
+    clb.concat_files(str(directory), store=tmp_path / 'store')
+    seeded = clb.ingest_files(directory, tmp_path / 'store', seed_manifest=True)
+    assert seeded.unchanged == ['part0.json', 'part1.json'] and not seeded.updated
+    assert seeded.store.n_conversations == 20
+
+    _write_third_file(directory)
+    result = clb.ingest_files(directory, tmp_path / 'store')
+    assert result.added == ['part2.json'] and result.store.n_conversations == 25
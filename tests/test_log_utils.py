@@ -0,0 +1,28 @@
+"""
+Rate-limited warnings per batch and verbose output without logging configuration.
+"""
+import logging
+
+from chatlab.log_utils import ErrorSummary, RateLimitedLogger, VerboseLogger
+
+
+def test_rate_limit_is_per_batch(caplog):
+    logger = logging.getLogger('chatlab.tests.rate_limit')
+    limiter = RateLimitedLogger(logger, limit=2)
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        for _ in range(2):
+            with ErrorSummary(logger, 'items', rate_limited=[limiter]):
+                for _ in range(5):
+                    limiter.warning('bad', 'bad item')
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages.count('bad item') == 4
+    assert messages.count("3 further warnings suppressed: 'bad' x3") == 2
+    assert limiter.suppressed() == {}
+
+
+def test_verbose_logger_leaves_logger_state_alone(capsys):
+    logger = logging.getLogger('chatlab.tests.verbose')
+    state = (logger.level, logger.propagate, list(logger.handlers))
+    VerboseLogger(logger).info('found %d files', 3)
+    assert 'found 3 files' in capsys.readouterr().err
+    assert (logger.level, logger.propagate, list(logger.handlers)) == state
@@ -0,0 +1,33 @@
+"""
+ConversationLookup built from stores, against ConversationStore.conversation_rows.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import chatlab as clb
+from chatlab.lookup import ConversationLookup
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+
+@pytest.fixture(scope='module')
+def sample():
+    return pd.read_parquet(SAMPLE_PATH, columns=['conv_id', 'source', 'turns', 'conversation']).head(30)
+
+
+def _contents(row):
+    return [turn['content'] for turn in row['conversation']]
+
+
+@pytest.mark.parametrize('repeat', [False, True], ids=['unique ids', 'repeated id'])
+@pytest.mark.parametrize('format', ['ipc', 'parquet'])
+def test_lookup_matches_store(sample, tmp_path, repeat, format):
+    df = pd.concat([sample, sample.iloc[[3]]], ignore_index=True) if repeat else sample
+    store = clb.write_store(df, tmp_path / 'store')
+    lookup = ConversationLookup.build(store, format=format)
+    assert len(lookup) == len(df)
+    for conv_id in sample['conv_id']:
+        expected = store.conversation_rows([conv_id]).iloc[0]
+        assert _contents(lookup.get(conv_id)) == _contents(expected), conv_id
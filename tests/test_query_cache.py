@@ -0,0 +1,58 @@
+"""
+The query cache: in-memory keys by frame and version, disk tier by content.
+"""
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+import chatlab as clb
+from chatlab import query_cache
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+
+@pytest.fixture
+def conversations():
+    return pd.read_parquet(SAMPLE_PATH, columns=['conv_id', 'source', 'turns'])
+
+
+@pytest.fixture(autouse=True)
+def no_cache_afterwards():
+    yield
+    query_cache.disable_query_cache()
+
+
+def test_hits_and_bump_version(conversations):
+    query_cache.enable_query_cache()
+    expected = clb.filter_subset(conversations, return_all=True, source='wc')
+    assert clb.filter_subset(conversations, return_all=True, source='wc') == expected
+    assert query_cache.query_cache_info()['hits'] == 1
+
+    conversations.loc[conversations['source'] == 'wc', 'source'] = 'edited'
+    clb.bump_version(conversations)
+    assert clb.filter_subset(conversations, return_all=True, source='wc') is None
+
+
+def test_equal_frames_do_not_share_memory_entries(conversations):
+    query_cache.enable_query_cache()
+    clb.filter_subset(conversations, return_all=True, source='wc')
+    other = conversations.copy()
+    other['source'] = 'sg'
+    assert clb.filter_subset(other, return_all=True, source='wc') is None
+
+
+def test_disk_tier_is_keyed_by_content(tmp_path):
+    turns = clb.unpack_turns(pd.read_parquet(SAMPLE_PATH))
+    query_cache.enable_query_cache(disk_path=tmp_path)
+    expected = clb.search_text_matches(turns, 'python', return_all=True, verbose=False)
+
+    # A new session and an equal frame: served from disk
+    query_cache.enable_query_cache(disk_path=tmp_path)
+    assert clb.search_text_matches(turns.copy(), 'python', return_all=True, verbose=False) == expected
+    assert query_cache.query_cache_info()['disk_hits'] == 1
+
+    # Different content: not served from disk
+    changed = turns.assign(content=turns['content'].str.replace('python', 'ruby', case=False))
+    assert clb.search_text_matches(changed, 'python', return_all=True, verbose=False) is None
+    assert query_cache.query_cache_info()['disk_hits'] == 1
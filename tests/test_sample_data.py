@@ -0,0 +1,16 @@
+"""
+Copies returned by load_sample_data are independent of its cache.
+"""
+from chatlab.sample_data import load_sample_data
+
+
+def test_copy_does_not_share_nested_turns():
+    first = load_sample_data()
+    original = first['conversation'].iloc[0][0]['content']
+    first['conversation'].iloc[0][0]['content'] = 'MUTATED'
+    first.loc[first.index[0], 'turns'] = -1
+
+    again = load_sample_data()
+    assert again['conversation'].iloc[0][0]['content'] == original
+    assert again['turns'].iloc[0] != -1
+    assert load_sample_data(copy=False)['conversation'].iloc[0][0]['content'] == original
@@ -0,0 +1,34 @@
+"""
+Bulk timestamp parsing against parsing value by value.
+"""
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from chatlab.timestamps import parse_timestamp, parse_timestamps
+
+MIXED = [f'2024-01-{day:02d} 10:00:00' for day in range(1, 31)] + ['13:05:07', '2024-02-01T08:30:00']
+
+
+@pytest.mark.parametrize('values', [
+    MIXED,
+    ['2024-01-01T10:00:00', '2024-01-02T11:00:00Z', None, float('nan')],
+    ['13:05:07', '2024-01-01 10:00:00', 'not a timestamp'],
+], ids=['mixed formats', 'iso', 'unparsable'])
+def test_bulk_matches_per_value(values):
+    expected = []
+    for value in values:
+        try:
+            expected.append(parse_timestamp(value, 'test'))
+        except ValueError:
+            expected.append(None)
+    result = parse_timestamps(values)
+    assert [None if ts is None else pd.Timestamp(ts) for ts in result] == \
+           [None if ts is None else pd.Timestamp(ts) for ts in expected]
+
+
+def test_values_in_another_format_are_not_dropped():
+    result = parse_timestamps(MIXED)
+    assert result[30] == datetime(1900, 1, 1, 13, 5, 7)
+    assert result[31] is not None
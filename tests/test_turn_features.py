@@ -0,0 +1,22 @@
+"""
+Vectorized turn features against their per-message Python definitions.
+"""
+import pandas as pd
+
+from chatlab.turn_features import add_turn_features
+
+MESSAGES = [
+    'plain words here',
+    'a\x0bb c​d',
+    'tabs\tand\nnewlines\r\nand\x0cfeeds',
+    'unicode spaces and　ideographic line',
+    'separators\x1cand\x1fnext\x85line',
+    '   ',
+    '',
+]
+
+
+def test_n_words_matches_str_split():
+    turns = pd.DataFrame({'role': 'user', 'content': MESSAGES})
+    result = add_turn_features(turns)
+    assert result['n_words'].tolist() == [len(text.split()) for text in MESSAGES]
@@ -0,0 +1,25 @@
+"""
+update_user_features against recomputing the whole corpus.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import chatlab as clb
+
+SAMPLE_PATH = Path(__file__).parent / 'sample_data.parquet'
+
+
+def test_update_matches_full_recompute():
+    conversations = pd.read_parquet(SAMPLE_PATH, columns=['conv_id', 'user_id_n', 'time_first', 'time_last'])
+    # Few users with long histories, one user only in the update and one row without a user
+    conversations['user_id_n'] = (np.arange(len(conversations)) % 20).astype(str)
+    conversations.loc[190, 'user_id_n'] = 'new user'
+    conversations.loc[195, 'user_id_n'] = None
+    old, new = conversations.iloc[:180], conversations.iloc[180:]
+
+    base = clb.add_user_features(old, user_id_colname='user_id_n')
+    updated = clb.update_user_features(base, new, user_id_colname='user_id_n')
+    expected = clb.add_user_features(conversations.reset_index(drop=True), user_id_colname='user_id_n')
+    pd.testing.assert_frame_equal(updated, expected)